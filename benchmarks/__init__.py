@@ -0,0 +1,5 @@
+"""
+Offline benchmarks for LLMASP.
+
+Run ``python -m benchmarks.run --help`` from the repository root.
+"""
@@ -0,0 +1,178 @@
+"""
+Local stand-in for an OpenAI-compatible chat completions endpoint.
+
+The server answers every request after a configurable latency, with a completion computed
+by a responder from the request messages. Streaming requests are answered with server-sent
+events, one chunk per word.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+
+Responder = Callable[[List[Dict[str, str]]], str]
+
+
+def marketplace_responder(products: List[str]) -> Responder:
+    """
+    Canned answers for the marketplace specification.
+
+    Extraction prompts give the atoms to extract between [OUTPUT] and [/OUTPUT]; they are
+    answered with requests of a product of the catalog, chosen deterministically from the
+    prompt. Any other prompt gets a short sentence.
+    """
+    def respond(messages: List[Dict[str, str]]) -> str:
+        content = messages[-1]["content"]
+        templates = re.findall(r"\[OUTPUT\](.*?)\[/OUTPUT\]", content, re.DOTALL)
+        if not templates:
+            return "You can buy the requested products from our warehouses."
+        seed = sum(map(ord, content))
+        product = products[seed % len(products)]
+        atoms = []
+        for template in templates:
+            if 'product_request("product", quantity)' in template:
+                atoms.append(f'product_request("{product}",{1 + seed % 3}).')
+            if 'product_request("product").' in template:
+                atoms.append(f'product_request("{product}").')
+        return "[OUTPUT]" + " ".join(atoms) + "[/OUTPUT]"
+    return respond
+
+
+class MockOpenAIServer:
+    """
+    Threaded HTTP server implementing POST /v1/chat/completions.
+
+    Args:
+        responder: Function computing the completion from the request messages
+        latency: Delay before answering, in seconds
+        jitter: Maximum random delay added to latency, in seconds
+        host: Interface to bind
+        port: Port to bind, 0 for a free one
+    """
+
+    def __init__(
+        self,
+        responder: Optional[Responder] = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.responder = responder or (lambda messages: "ok")
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                return
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.latency + random.uniform(0, server.jitter))
+                completion = server.responder(body["messages"])
+                usage = {
+                    "prompt_tokens": sum(len(m["content"].split()) for m in body["messages"]),
+                    "completion_tokens": len(completion.split()),
+                }
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                if body.get("stream"):
+                    try:
+                        self._stream(body, completion, usage)
+                    except (BrokenPipeError, ConnectionResetError):
+                        # The client closed the stream early
+                        pass
+                else:
+                    self._send_json({
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": body.get("model", "mock"),
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": completion},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": usage,
+                    })
+
+            def _send_json(self, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, body, completion, usage):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                words = re.findall(r"\S+\s*", completion)
+                chunks = [{"role": "assistant", "content": word} for word in words]
+                for index, delta in enumerate(chunks + [{}]):
+                    chunk = {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "mock"),
+                        "choices": [{
+                            "index": 0,
+                            "delta": delta,
+                            "finish_reason": None if delta else "stop",
+                        }],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    chunk = {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "mock"),
+                        "choices": [],
+                        "usage": usage,
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> "MockOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
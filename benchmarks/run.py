@@ -0,0 +1,252 @@
+"""
+Offline benchmarks of the LLMASP pipeline.
+
+Every scenario runs against a MockOpenAIServer and a synthetic database of the requested
+size, so results only depend on the machine and on the code under test. For each scenario
+the throughput, the latency percentiles, the peak memory and the prompt tokens per operation
+(as counted by the mock server, one token per word) are reported, as a table or as JSON lines
+(--json) to be compared across revisions.
+
+Example:
+    python -m benchmarks.run --facts 1000 10000 --iterations 20 --latency 0.05
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from typing import Callable, List, Optional
+
+import yaml
+
+from benchmarks.mock_server import MockOpenAIServer, marketplace_responder
+from benchmarks.synthetic_db import product_names, write_database, write_facts
+from llmasp.asp import Solver
+from llmasp.llm import LLMASP, LLMHandler
+from llmasp.llm.llmasp import HISTORY_MODES
+from llmasp.tracing import Trace
+
+
+SPECIFICATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "llmasp", "specifications")
+APPLICATION = os.path.join(SPECIFICATIONS, "application_marketplace.yml")
+BEHAVIOR = os.path.join(SPECIFICATIONS, "behavior_translator_v2.yml")
+SCENARIOS = ["natural_to_asp", "solve", "run_single_pass", "run_multi_pass"]
+DATABASE_FORMATS = ["yaml", "lp", "lp.gz"]
+USER_INPUT = "I would like some cooking ideas for a dessert with apples and for a main plate with meat."
+
+
+@dataclass
+class Result:
+    """Measurements of a scenario."""
+    scenario: str
+    facts: int
+    iterations: int
+    throughput: float
+    p50: float
+    p90: float
+    p99: float
+    mean: float
+    peak_memory_mb: Optional[float]
+    max_rss_mb: float
+    prompt_tokens: Optional[float] = None
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentile q (0-100) of values, by linear interpolation."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def max_rss_mb() -> float:
+    """Peak resident set size of the process, in megabytes."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2 ** 20 if sys.platform == "darwin" else rss / 2 ** 10
+
+
+def measure(scenario: str, facts: int, step: Callable[[], object], iterations: int, warmup: int, trace_memory: bool) -> Result:
+    """
+    Time iterations calls of step, after warmup untimed calls.
+
+    If step returns a Trace, the mean number of prompt tokens of the traces is reported.
+    """
+    for _ in range(warmup):
+        step()
+    if trace_memory:
+        tracemalloc.start()
+    latencies = []
+    tokens = []
+    begin = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        trace = step()
+        latencies.append(time.perf_counter() - start)
+        if isinstance(trace, Trace):
+            tokens.append(trace.prompt_tokens)
+    elapsed = time.perf_counter() - begin
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return Result(
+        scenario=scenario,
+        facts=facts,
+        iterations=iterations,
+        throughput=iterations / elapsed,
+        p50=percentile(latencies, 50),
+        p90=percentile(latencies, 90),
+        p99=percentile(latencies, 99),
+        mean=statistics.mean(latencies),
+        peak_memory_mb=peak,
+        max_rss_mb=max_rss_mb(),
+        prompt_tokens=statistics.mean(tokens) if tokens else None,
+    )
+
+
+def write_application(directory: str, database: str) -> str:
+    """Write a copy of the marketplace application using database, and return its path."""
+    with open(APPLICATION, "r") as f:
+        application = yaml.safe_load(f)
+    application["database"] = database
+    if not database.endswith(".yml"):
+        application["database_cache"] = os.path.join(directory, "cache")
+    path = os.path.join(directory, "application.yml")
+    with open(path, "w") as f:
+        yaml.safe_dump(application, f, sort_keys=False)
+    return path
+
+
+def scenario_step(scenario: str, llmasp: LLMASP, facts: int, use_history: bool = False) -> Callable[[], object]:
+    """The operation timed by a scenario, returning the trace of the LLM calls if any."""
+    def traced(function):
+        def step():
+            trace = Trace()
+            function(trace)
+            return trace
+        return step
+
+    if scenario == "natural_to_asp":
+        return traced(lambda trace: llmasp.natural_to_asp(USER_INPUT, trace=trace))
+    if scenario == "solve":
+        products = product_names(facts)
+        request = f'product_request("{products[0]}",2). product_request("{products[-1]}").'
+        program = f"{request}\n{llmasp.database}\n{llmasp.config['knowledge_base']}"
+        return lambda: llmasp.solver.solve(program)
+    single_pass = scenario == "run_single_pass"
+    return traced(lambda trace: llmasp.run(USER_INPUT, single_pass=single_pass, use_history=use_history, trace=trace))
+
+
+def run_benchmarks(
+    scenarios: List[str],
+    sizes: List[int],
+    iterations: int = 10,
+    warmup: int = 1,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    trace_memory: bool = True,
+    database_format: str = "yaml",
+    use_history: bool = False,
+    history_mode: str = "full",
+) -> List[Result]:
+    """
+    Run every scenario on a synthetic database of every size.
+
+    Args:
+        scenarios: Names of the scenarios, see SCENARIOS
+        sizes: Approximate numbers of facts of the databases
+        iterations: Number of timed iterations of each scenario
+        warmup: Number of untimed iterations run first
+        latency: Latency of the mock LLM server, in seconds
+        jitter: Maximum random latency added to every LLM response, in seconds
+        trace_memory: Whether to measure the peak memory allocated by Python with tracemalloc
+        database_format: Format of the database files, see DATABASE_FORMATS
+        use_history: Whether the run scenarios give the extraction history to postprocessing
+        history_mode: History mode of LLMASP, see HISTORY_MODES
+
+    Returns:
+        Results of every scenario and size
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            if database_format == "yaml":
+                database = os.path.join(directory, f"db_{size}.yml")
+                write_database(database, size)
+            else:
+                database = os.path.join(directory, f"db_{size}.{database_format}")
+                write_facts(database, size)
+            application = write_application(directory, database)
+            responder = marketplace_responder(product_names(size))
+            with MockOpenAIServer(responder, latency=latency, jitter=jitter) as server:
+                llm = LLMHandler("mock", server.url, api_key="mock", max_retries=0)
+                llmasp = LLMASP(application, BEHAVIOR, llm, Solver(), history_mode=history_mode)
+                for scenario in scenarios:
+                    step = scenario_step(scenario, llmasp, size, use_history)
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        results.append(measure(scenario, size, step, iterations, warmup, trace_memory))
+    return results
+
+
+def format_table(results: List[Result]) -> str:
+    """Render results as a text table."""
+    header = (
+        f"{'scenario':<16} {'facts':>8} {'ops/s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} "
+        f"{'peak MB':>8} {'rss MB':>8} {'prompt tok':>10}"
+    )
+    lines = [header, "-" * len(header)]
+    for r in results:
+        peak = f"{r.peak_memory_mb:.1f}" if r.peak_memory_mb is not None else "-"
+        tokens = f"{r.prompt_tokens:.0f}" if r.prompt_tokens is not None else "-"
+        lines.append(
+            f"{r.scenario:<16} {r.facts:>8} {r.throughput:>9.2f} {r.p50 * 1000:>9.1f} "
+            f"{r.p90 * 1000:>9.1f} {r.p99 * 1000:>9.1f} {peak:>8} {r.max_rss_mb:>8.1f} {tokens:>10}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="benchmarks.run", description="Offline benchmarks of LLMASP")
+    parser.add_argument("-s", "--scenario", nargs="+", choices=SCENARIOS, default=SCENARIOS, help="scenarios to run")
+    parser.add_argument("-f", "--facts", nargs="+", type=int, default=[1000], help="approximate sizes of the synthetic databases")
+    parser.add_argument("-n", "--iterations", type=int, default=10, help="timed iterations of each scenario")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed iterations run first")
+    parser.add_argument("--latency", type=float, default=0.0, help="latency of the mock LLM server, in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum random latency added to the mock LLM server")
+    parser.add_argument("--database-format", choices=DATABASE_FORMATS, default="yaml", help="format of the synthetic databases")
+    parser.add_argument("--use-history", action="store_true", help="give the extraction history to postprocessing")
+    parser.add_argument("--history-mode", choices=HISTORY_MODES, default="full", help="history mode of LLMASP")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="do not measure the peak Python memory (faster)")
+    parser.add_argument("--json", action="store_true", help="print one JSON line per result")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        args.scenario,
+        args.facts,
+        iterations=args.iterations,
+        warmup=args.warmup,
+        latency=args.latency,
+        jitter=args.jitter,
+        trace_memory=not args.no_tracemalloc,
+        database_format=args.database_format,
+        use_history=args.use_history,
+        history_mode=args.history_mode,
+    )
+    if args.json:
+        for result in results:
+            print(json.dumps(asdict(result)))
+    else:
+        print(format_table(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Synthetic, scaled versions of the marketplace database (specifications/db.yml).
+"""
+
+import gzip
+import random
+from typing import Iterator, List
+
+
+def product_names(n_facts: int) -> List[str]:
+    """Names of the products of a database of about n_facts facts."""
+    return [f"product_{i}" for i in range(max(1, n_facts * 2 // 13))]
+
+
+def generate_facts(n_facts: int, seed: int = 0) -> Iterator[str]:
+    """
+    Yield about n_facts facts with the predicates of the marketplace database.
+
+    Every warehouse belongs to its own seller, every product has calories and is stored,
+    with a price, in two warehouses, and every recipe has three ingredients.
+    """
+    rng = random.Random(seed)
+    products = product_names(n_facts)
+    warehouses = [f"Warehouse {i}" for i in range(max(2, len(products) // 50))]
+    recipes = [f"Recipe {i}" for i in range(max(1, len(products) // 10))]
+
+    for index, warehouse in enumerate(warehouses):
+        seller = f"Seller {index}"
+        yield f'seller("{seller}").'
+        yield f'warehouse("{warehouse}").'
+        yield f'seller_warehouse("{seller}", "{warehouse}").'
+        yield f'warehouse_shipping_cost("{warehouse}", {rng.randint(1, 9)}).'
+        yield f'warehouse_shipping_fee("{warehouse}", {rng.randint(1, 9)}).'
+    for product in products:
+        yield f'product("{product}").'
+        yield f'product_calories("{product}",{rng.randint(1, 500)}).'
+        for warehouse in rng.sample(warehouses, 2):
+            yield f'product_in_warehouse("{product}", "{warehouse}", {rng.randint(1, 50)}).'
+            yield f'product_price("{product}", "{warehouse}", {rng.randint(1, 20)}).'
+    for recipe in recipes:
+        yield f'recipe("{recipe}").'
+        for product in rng.sample(products, min(3, len(products))):
+            yield f'recipe_ingredient("{recipe}", "{product}", {rng.randint(1, 5)}).'
+
+
+def write_database(path: str, n_facts: int, seed: int = 0) -> None:
+    """Write a database file in the format of specifications/db.yml."""
+    with open(path, "w") as f:
+        f.write("database: |\n")
+        for fact in generate_facts(n_facts, seed):
+            f.write(f"  {fact}\n")
+
+
+def write_facts(path: str, n_facts: int, seed: int = 0) -> None:
+    """Write a fact file, compressed with gzip if path ends with .gz."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt") as f:
+        for fact in generate_facts(n_facts, seed):
+            f.write(f"{fact}\n")
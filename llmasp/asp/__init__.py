@@ -1,4 +1,9 @@
 """
 ASP solver package for LLMASP.
 """
-from llmasp.asp.solver import Solver
\ No newline at end of file
+from llmasp.asp.answer_set import AnswerSet
+from llmasp.asp.facts import FactParser
+from llmasp.asp.solver import Solver, IncrementalSolver
+from llmasp.asp.pool import SolverPool
+from llmasp.asp.slicing import DatabaseSlicer
+from llmasp.asp.tuning import SolverSettings
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""
+Structured representation of the answer sets computed by the solvers.
+"""
+
+from clingo import Symbol
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+Signature = Tuple[str, int]
+
+
+class AnswerSet:
+    """
+    Atoms of a model grouped by predicate name and arity, built directly from clingo symbols.
+
+    Atoms of each predicate are kept in the order of clingo symbols, which is also the order
+    of the facts returned by to_facts().
+    """
+
+    __slots__ = ("_atoms",)
+
+    def __init__(self, atoms: Optional[Dict[Signature, List[Symbol]]] = None):
+        self._atoms: Dict[Signature, List[Symbol]] = atoms or {}
+
+    @staticmethod
+    def of_symbols(symbols: Iterable[Symbol]) -> "AnswerSet":
+        """Create an answer set from the atoms of a model."""
+        atoms: Dict[Signature, List[Symbol]] = {}
+        for symbol in symbols:
+            atoms.setdefault((symbol.name, len(symbol.arguments)), []).append(symbol)
+        return AnswerSet({signature: sorted(atoms[signature]) for signature in sorted(atoms)})
+
+    @property
+    def predicates(self) -> List[Signature]:
+        """Signatures (name, arity) of the predicates with at least one atom."""
+        return list(self._atoms)
+
+    def atoms(self, name: str, arity: Optional[int] = None) -> List[Symbol]:
+        """Atoms of the predicate with the given name, and arity if given."""
+        return [
+            symbol
+            for (predicate, predicate_arity), symbols in self._atoms.items()
+            if predicate == name and (arity is None or predicate_arity == arity)
+            for symbol in symbols
+        ]
+
+    def arguments(self, name: str, arity: Optional[int] = None) -> List[Tuple[Symbol, ...]]:
+        """Arguments of the atoms of the predicate with the given name, and arity if given."""
+        return [tuple(symbol.arguments) for symbol in self.atoms(name, arity)]
+
+    def group_facts(self) -> Dict[str, List[str]]:
+        """Facts grouped by predicate name."""
+        grouped: Dict[str, List[str]] = {}
+        for (name, _), symbols in self._atoms.items():
+            grouped.setdefault(name, []).extend(f"{symbol}." for symbol in symbols)
+        return grouped
+
+    def to_facts(self) -> List[str]:
+        """Facts of the answer set, as returned by Solver.solve when structured is False."""
+        return [f"{symbol}." for symbol in self]
+
+    def __iter__(self) -> Iterator[Symbol]:
+        for symbols in self._atoms.values():
+            yield from symbols
+
+    def __len__(self) -> int:
+        return sum(len(symbols) for symbols in self._atoms.values())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, AnswerSet):
+            return self._atoms == other._atoms
+        return NotImplemented
+
+    def __getstate__(self):
+        return self._atoms
+
+    def __setstate__(self, state):
+        self._atoms = state
+
+    def __repr__(self) -> str:
+        return f"AnswerSet({self.to_facts()})"
@@ -0,0 +1,165 @@
+"""
+Loading of large fact databases.
+
+A database is given by the path of:
+
+- a YAML file with a database key holding the facts (e.g. specifications/db.yml),
+- a plain fact file (.lp),
+- a compressed fact file (.lp.gz, .lp.bz2, .lp.xz),
+- a directory of shards, i.e. fact files, compressed or not, loaded in name order.
+
+Fact files are not read into Python: the database program is made of #include directives,
+so that clingo streams the files while parsing and the program sent with every request only
+contains a few lines. Compressed files, and YAML databases if a cache directory is given, are
+written once as plain fact files in the cache directory, keyed by path, modification time and
+size of the source.
+"""
+
+import bz2
+import gzip
+import hashlib
+import lzma
+import os
+import shutil
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+
+FACT_EXTENSIONS = (".lp",)
+COMPRESSED_EXTENSIONS: Dict[str, Callable] = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "llmasp-database")
+
+
+def _split_compression(path: str) -> Tuple[str, Optional[str]]:
+    """Return the path without its compression extension, and the compression extension."""
+    root, extension = os.path.splitext(path)
+    if extension in COMPRESSED_EXTENSIONS:
+        return root, extension
+    return path, None
+
+
+def is_yaml(path: str) -> bool:
+    """Whether path is a YAML database file, i.e. a file that is not a fact file."""
+    return os.path.isfile(path) and not _split_compression(path)[0].endswith(FACT_EXTENSIONS)
+
+
+def database_files(path: str) -> List[str]:
+    """
+    Files of the database at path: the shards of a directory in name order, or path itself.
+
+    Raises:
+        FileNotFoundError: If path does not exist
+    """
+    if os.path.isdir(path):
+        return [
+            os.path.join(path, name)
+            for name in sorted(os.listdir(path))
+            if _split_compression(name)[0].endswith(FACT_EXTENSIONS)
+            and os.path.isfile(os.path.join(path, name))
+        ]
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return [path]
+
+
+def stamp(path: Optional[str]) -> Optional[Tuple]:
+    """
+    Modification times and sizes of the files of the database at path, None if there is none.
+
+    The stamp changes whenever a file of the database is modified, added or removed.
+    """
+    if path is None:
+        return None
+    try:
+        return tuple((file, os.stat(file).st_mtime_ns, os.stat(file).st_size) for file in database_files(path))
+    except OSError:
+        return None
+
+
+def _cache_path(path: str, cache_dir: str) -> str:
+    """Path of the plain fact file cached for the source file at path."""
+    status = os.stat(path)
+    key = f"{os.path.abspath(path)}\0{status.st_mtime_ns}\0{status.st_size}"
+    name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{name}.lp")
+
+
+def _write_cached(target: str, write: Callable) -> str:
+    """Write target atomically with write(file), unless it was cached already."""
+    if os.path.exists(target):
+        return target
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as f:
+            write(f)
+        os.replace(temporary, target)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return target
+
+
+def decompress(path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    """Return the path of a plain copy of a compressed fact file, decompressed in chunks once."""
+    _, compression = _split_compression(path)
+
+    def write(f):
+        with COMPRESSED_EXTENSIONS[compression](path, "rb") as source:
+            shutil.copyfileobj(source, f, 1 << 20)
+
+    return _write_cached(_cache_path(path, cache_dir), write)
+
+
+def yaml_database(path: str) -> str:
+    """
+    Return the database of a YAML database file.
+
+    Raises:
+        KeyError: If the file has no database key
+    """
+    with open(path, "r") as f:
+        return yaml.safe_load(f)["database"]
+
+
+def cache_yaml_database(path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    """Return the path of a fact file with the database of a YAML file, written once."""
+    return _write_cached(_cache_path(path, cache_dir), lambda f: f.write(yaml_database(path).encode("utf-8")))
+
+
+def include(files: List[str]) -> str:
+    """Program including the given fact files."""
+    lines = []
+    for file in files:
+        escaped = os.path.abspath(file).replace("\\", "\\\\").replace('"', '\\"')
+        lines.append(f'#include "{escaped}".')
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def load_database(path: str, cache_dir: Optional[str] = None) -> str:
+    """
+    Return the database program of the database at path.
+
+    The facts of a YAML database are returned as they are, unless cache_dir is given; in
+    every other case the program only includes the fact files of the database.
+
+    Args:
+        path: Path of a YAML database, fact file, compressed fact file or directory of shards
+        cache_dir: Directory of the plain fact files written for compressed and YAML databases
+
+    Raises:
+        FileNotFoundError: If path does not exist
+        KeyError: If a YAML database has no database key
+    """
+    if is_yaml(path):
+        if cache_dir is None:
+            return yaml_database(path)
+        return include([cache_yaml_database(path, cache_dir)])
+    files = []
+    for file in database_files(path):
+        if _split_compression(file)[1] is not None:
+            file = decompress(file, cache_dir or DEFAULT_CACHE_DIR)
+        files.append(file)
+    return include(files)
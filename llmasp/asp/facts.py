@@ -0,0 +1,226 @@
+"""
+Parsing of the facts written by the LLM in extraction answers.
+
+Answers are free text where ground atoms such as product_request("apple",2) appear among
+other words. The parser scans the text once, builds the clingo symbols of the atoms it finds
+and checks them against the signatures of the predicates declared by the specification, so
+that a malformed or unexpected atom is dropped with a diagnostic instead of making the whole
+program fail to parse.
+"""
+
+import string
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Set, Tuple
+
+from clingo import Function, Number, String, Symbol, Tuple_
+
+from llmasp.asp.answer_set import Signature
+
+
+_LETTERS = frozenset(string.ascii_letters)
+_DIGITS = frozenset(string.digits)
+_WORD = frozenset(string.ascii_letters + string.digits + "_")
+_IDENTIFIER = frozenset(string.ascii_letters + string.digits + "_'")
+_ESCAPES = {"n": "\n", "t": "\t", '"': '"', "\\": "\\"}
+
+
+class _Incomplete(Exception):
+    """The text ends inside an atom."""
+    pass
+
+
+class _Invalid(Exception):
+    """The text of an atom is not a ground atom; position is where scanning resumes."""
+
+    def __init__(self, message: str, position: int):
+        super().__init__(message)
+        self.position = position
+
+
+@dataclass
+class ParsedFacts:
+    """
+    Atoms found in a text.
+
+    Attributes:
+        symbols: Atoms, without duplicates, in the order of the text
+        diagnostics: Reasons of the atoms that were dropped
+    """
+    symbols: List[Symbol] = field(default_factory=list)
+    diagnostics: List[str] = field(default_factory=list)
+
+    @property
+    def facts(self) -> List[str]:
+        """Atoms as facts, e.g. 'product_request("apple",2).'."""
+        return [f"{symbol}." for symbol in self.symbols]
+
+
+class _Scanner:
+    """Recursive descent parser of the ground terms starting at a position of a text."""
+
+    def __init__(self, text: str, position: int):
+        self.text = text
+        self.position = position
+
+    def _peek(self) -> str:
+        while self.position < len(self.text) and self.text[self.position].isspace():
+            self.position += 1
+        if self.position >= len(self.text):
+            raise _Incomplete()
+        return self.text[self.position]
+
+    def arguments(self) -> List[Symbol]:
+        """Parse the parenthesized arguments of a function, the position being at '('."""
+        self.position += 1
+        if self._peek() == ")":
+            self.position += 1
+            return []
+        arguments = [self.term()]
+        while True:
+            c = self._peek()
+            self.position += 1
+            if c == ")":
+                return arguments
+            if c != ",":
+                raise _Invalid(f"expected ',' or ')' instead of {c!r}", self.position - 1)
+            arguments.append(self.term())
+
+    def term(self) -> Symbol:
+        c = self._peek()
+        if c == '"':
+            return self._string()
+        if c in _DIGITS or c == "-":
+            return self._number()
+        if c == "(":
+            arguments = self.arguments()
+            return arguments[0] if len(arguments) == 1 else Tuple_(arguments)
+        if c in _LETTERS and c.islower():
+            start = self.position
+            while self.position < len(self.text) and self.text[self.position] in _IDENTIFIER:
+                self.position += 1
+            name = self.text[start:self.position]
+            if self.position < len(self.text) and self.text[self.position] == "(":
+                return Function(name, self.arguments())
+            if self.position >= len(self.text):
+                raise _Incomplete()
+            return Function(name)
+        if c in _LETTERS or c == "_":
+            raise _Invalid("variables are not allowed in facts", self.position)
+        raise _Invalid(f"unexpected {c!r}", self.position)
+
+    def _string(self) -> Symbol:
+        chars = []
+        position = self.position + 1
+        while position < len(self.text):
+            c = self.text[position]
+            if c == '"':
+                self.position = position + 1
+                return String("".join(chars))
+            if c == "\\":
+                position += 1
+                if position >= len(self.text):
+                    break
+                c = _ESCAPES.get(self.text[position], "\\" + self.text[position])
+            chars.append(c)
+            position += 1
+        raise _Incomplete()
+
+    def _number(self) -> Symbol:
+        start = self.position
+        if self.text[self.position] == "-":
+            self.position += 1
+        digits = self.position
+        while self.position < len(self.text) and self.text[self.position] in _DIGITS:
+            self.position += 1
+        if self.position >= len(self.text):
+            raise _Incomplete()
+        if self.position == digits:
+            raise _Invalid("expected a number after '-'", self.position)
+        if self.text[self.position] == "." and self.text[self.position + 1:self.position + 2] in _DIGITS:
+            raise _Invalid(f"{self.text[start:self.position + 2]}... is not an integer", self.position + 1)
+        return Number(int(self.text[start:self.position]))
+
+
+class FactParser:
+    """
+    Single pass parser of the ground atoms of a text.
+
+    An atom is a name starting with a lowercase letter, directly followed by its
+    parenthesized arguments: numbers, strings, constants, nested functions or tuples.
+
+    Args:
+        signatures: Signatures (name, arity) of the predicates that may be extracted;
+            atoms of other predicates are dropped. None accepts every predicate.
+    """
+
+    def __init__(self, signatures: Optional[Iterable[Signature]] = None):
+        self.signatures = frozenset(signatures) if signatures is not None else None
+
+    def parse(self, text: str) -> ParsedFacts:
+        """Return the atoms of text."""
+        return self.scan(text)[0]
+
+    def scan(
+        self,
+        text: str,
+        start: int = 0,
+        final: bool = True,
+        seen: Optional[Set[Symbol]] = None
+    ) -> Tuple[ParsedFacts, int]:
+        """
+        Return the atoms of text from position start, and the position where scanning stopped.
+
+        Args:
+            text: Text to scan
+            start: Position where scanning starts
+            final: Whether text is complete; otherwise scanning stops before an atom that
+                may continue, so that it is scanned again once more text is received
+            seen: Atoms found before, skipped as duplicates; atoms found are added to it
+        """
+        parsed = ParsedFacts()
+        seen = set() if seen is None else seen
+        position, length = start, len(text)
+        while position < length:
+            c = text[position]
+            if c not in _LETTERS or (position > 0 and text[position - 1] in _WORD):
+                position += 1
+                continue
+            end = position
+            while end < length and text[end] in _IDENTIFIER:
+                end += 1
+            if end >= length and not final:
+                return parsed, position
+            if end >= length or text[end] != "(":
+                position = end
+                continue
+            name = text[position:end]
+            if not name[0].islower():
+                parsed.diagnostics.append(f"Invalid predicate name {name!r}")
+                position = end
+                continue
+            scanner = _Scanner(text, end)
+            try:
+                symbol = Function(name, scanner.arguments())
+            except _Incomplete:
+                if not final:
+                    return parsed, position
+                parsed.diagnostics.append(f"Incomplete atom: {text[position:].strip()!r}")
+                return parsed, length
+            except _Invalid as e:
+                parsed.diagnostics.append(f"Invalid atom {text[position:e.position + 1]!r}: {e}")
+                position = max(e.position, end + 1)
+                continue
+            position = scanner.position
+            signature = (symbol.name, len(symbol.arguments))
+            if self.signatures is not None and signature not in self.signatures:
+                parsed.diagnostics.append(f"Undeclared predicate {symbol.name}/{signature[1]}: {symbol}")
+            elif symbol not in seen:
+                seen.add(symbol)
+                parsed.symbols.append(symbol)
+        return parsed, position
+
+
+def signature(atom: str) -> Optional[Signature]:
+    """Signature of the atom of a specification entry, e.g. ('budget', 1) for budget(amount)., None if there is none."""
+    symbols = FactParser().parse(atom).symbols
+    return (symbols[0].name, len(symbols[0].arguments)) if symbols else None
@@ -0,0 +1,256 @@
+"""
+Pool of solver worker processes for multi-core ASP solving.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+from typing import Dict, List, Tuple, Any, Iterable, Optional, Union
+
+from clingo import Symbol, parse_term
+
+from llmasp.asp.answer_set import AnswerSet
+from llmasp.asp.solver import IncrementalSolver, Context, DEFAULT_ARGUMENTS
+from llmasp.tracing import Trace
+
+
+class SolverPoolError(Exception):
+    """Raised when a worker of the pool fails or does not answer in time."""
+    pass
+
+
+def _to_plain(result: Union[List[str], AnswerSet]) -> Union[List[str], Dict[Tuple[str, int], List[str]]]:
+    """
+    Result of a solve that can be sent through a pipe.
+
+    Clingo symbols are handles into the symbol table of their process, hence the atoms of an
+    AnswerSet are sent as text, grouped by predicate in the order of the answer set.
+    """
+    if not isinstance(result, AnswerSet):
+        return result
+    plain: Dict[Tuple[str, int], List[str]] = {}
+    for symbol in result:
+        plain.setdefault((symbol.name, len(symbol.arguments)), []).append(str(symbol))
+    return plain
+
+
+def _from_plain(result: Union[List[str], Dict[Tuple[str, int], List[str]]]) -> Union[List[str], AnswerSet]:
+    """AnswerSet, or list of facts, of a result received from a worker."""
+    if isinstance(result, dict):
+        return AnswerSet({signature: [parse_term(atom) for atom in atoms] for signature, atoms in result.items()})
+    return result
+
+
+def _worker(connection, static_programs: List[str], arguments: List[str], context: Any) -> None:
+    """Serve solve requests received on connection with a warm IncrementalSolver."""
+    solver = IncrementalSolver(arguments, context=context)
+    for program in static_programs:
+        solver.load(program)
+    solver.solve("")
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        program, arguments, timeout, structured, traced, facts = request
+        trace = Trace() if traced else None
+        try:
+            facts = [parse_term(fact) for fact in facts]
+            result, interrupted, satisfiable = solver.solve(
+                program, arguments=arguments, timeout=timeout, structured=structured, trace=trace, facts=facts
+            )
+            connection.send((True, (_to_plain(result), interrupted, satisfiable), trace.spans if traced else []))
+        except Exception as e:
+            connection.send((False, f"{type(e).__name__}: {e}", []))
+    connection.close()
+
+
+class _Worker:
+    """A worker process and the parent end of its pipe."""
+
+    def __init__(self, process_context, static_programs: List[str], arguments: List[str], context: Any, generation: int = 0):
+        self.generation = generation
+        self.connection, child = process_context.Pipe()
+        self.process = process_context.Process(
+            target=_worker,
+            args=(child, static_programs, arguments, context),
+            daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.solves = 0
+
+    def stop(self) -> None:
+        try:
+            self.connection.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.connection.close()
+
+
+class SolverPool:
+    """
+    Pool of worker processes, each keeping a warm IncrementalSolver with the static program loaded.
+
+    Solve requests are dispatched to idle workers through a queue; callers block until a worker
+    is available. Workers are recycled after max_solves requests, to bound memory growth.
+    Every close() or load() starts a new generation of workers; a worker of an older one,
+    e.g. checked out while the pool was reloaded, is stopped when released instead of reused.
+
+    Args:
+        size: Number of worker processes
+        arguments: Arguments of the clingo controls
+        context: Context providing the functions called by the programs; it must be picklable
+        max_solves: Number of requests served by a worker before it is replaced
+        timeout: Default solving timeout, in seconds
+        grace: Extra time given to a worker to answer after timeout, before it is killed
+    """
+
+    preloads_database = True
+    accepts_symbols = True
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        arguments: List[str] = DEFAULT_ARGUMENTS,
+        context: Any = Context,
+        max_solves: int = 1000,
+        timeout: int = 2,
+        grace: float = 5,
+    ):
+        self.size = size or os.cpu_count() or 1
+        self.arguments = list(arguments)
+        self.context = context
+        self.max_solves = max_solves
+        self.timeout = timeout
+        self.grace = grace
+        self.static_programs: List[str] = []
+        self._process_context = multiprocessing.get_context("spawn")
+        self._idle: queue.Queue = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._generation = 0
+
+    def _spawn(self, generation: int) -> Optional[_Worker]:
+        """Start a worker of generation, None if the pool has moved on to another one."""
+        worker = _Worker(self._process_context, self.static_programs, self.arguments, self.context, generation)
+        with self._lock:
+            if generation == self._generation and self._started:
+                self._workers.append(worker)
+                return worker
+        worker.stop()
+        return None
+
+    def _release(self, worker: Optional[_Worker]) -> None:
+        """Make worker available again, or stop it if it belongs to a previous generation."""
+        if worker is None:
+            return
+        with self._lock:
+            current = worker.generation == self._generation and self._started
+        if current:
+            self._idle.put(worker)
+        else:
+            self._retire(worker)
+
+    def _checkout(self) -> _Worker:
+        """Wait for an idle worker of the current generation."""
+        while True:
+            worker = self._idle.get()
+            with self._lock:
+                if worker.generation == self._generation:
+                    return worker
+            self._retire(worker)
+
+    def _retire(self, worker: _Worker) -> None:
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        worker.stop()
+
+    def start(self) -> None:
+        """Start the worker processes, if not already running."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            generation = self._generation
+        for _ in range(self.size):
+            self._release(self._spawn(generation))
+
+    def close(self) -> None:
+        """Stop every worker process."""
+        with self._lock:
+            workers, self._workers = self._workers, []
+            self._started = False
+            self._generation += 1
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        for worker in workers:
+            worker.stop()
+
+    def load(self, program: str) -> None:
+        """
+        Add a program to the static part loaded by every worker; running workers are restarted.
+        """
+        restart = self._started
+        self.close()
+        self.static_programs.append(program)
+        if restart:
+            self.start()
+
+    def solve(
+        self,
+        program: str,
+        arguments: Optional[List[str]] = None,
+        timeout: Optional[int] = None,
+        context: Any = None,
+        structured: bool = False,
+        trace: Optional[Trace] = None,
+        facts: Optional[Iterable[Symbol]] = None,
+    ) -> Tuple[Union[List[str], AnswerSet], Any, Any]:
+        """
+        Solve program, and the facts given as clingo symbols, on an idle worker, on top of the static part.
+
+        The context of the pool is used by the workers, hence context must be None.
+        The spans recorded by the worker are added to trace, if given.
+        """
+        if context is not None:
+            raise SolverPoolError("The context of a SolverPool is fixed at construction")
+        self.start()
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._checkout()
+        try:
+            worker.connection.send((program, arguments, timeout, structured, trace is not None, [str(fact) for fact in facts or []]))
+            if not worker.connection.poll(timeout + self.grace):
+                raise SolverPoolError(f"Worker did not answer within {timeout + self.grace} seconds")
+            success, result, spans = worker.connection.recv()
+        except BaseException:
+            self._retire(worker)
+            self._release(self._spawn(worker.generation))
+            raise
+
+        worker.solves += 1
+        if worker.solves >= self.max_solves:
+            self._retire(worker)
+            self._release(self._spawn(worker.generation))
+        else:
+            self._release(worker)
+        if trace is not None:
+            for span in spans:
+                trace.add(span)
+        if not success:
+            raise SolverPoolError(result)
+        result, interrupted, satisfiable = result
+        return _from_plain(result), interrupted, satisfiable
+
+    def __enter__(self) -> "SolverPool":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,453 @@
+"""
+Query-driven slicing of the database of an application.
+
+The knowledge base is analysed once with clingo.ast: every rule, constraint, weak constraint
+and show statement becomes a clause made of its head atoms, the positive atoms of its body
+and the other atoms it refers to (negated, or under an aggregate or a condition). Aggregate
+elements and conditional literals become clauses of their own, whose positive atoms are
+those of the enclosing body and of their condition.
+
+A database fact is kept for a request if some clause could fire with it, i.e. if for every
+variable of the fact the values allowed by the other positive atoms of the clause contain
+its argument. The values of every argument position of every predicate are over-approximated
+from the kept facts, the request facts and the rule heads, so that the facts dropped only
+occur in rule instances whose positive body cannot hold: the answer sets restricted to the
+shown atoms are unchanged. Facts of shown predicates, and of predicates used in statements
+that are not analysed (e.g. #heuristic), are always kept.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from clingo import Control, Symbol, SymbolType, ast, parse_term
+
+logger = logging.getLogger(__name__)
+
+# Name, arity and sign of a predicate
+Key = Tuple[str, int, bool]
+# ("var", name), ("const", symbol) or ("any", None)
+Argument = Tuple[str, Any]
+
+_ANY: Argument = ("any", None)
+_IGNORED = {ast.ASTType.Program, ast.ASTType.Definition, ast.ASTType.Script}
+if hasattr(ast.ASTType, "Comment"):
+    _IGNORED.add(ast.ASTType.Comment)
+
+
+class _Unsupported(Exception):
+    """A statement uses a construct that is not analysed."""
+    pass
+
+
+@dataclass
+class _Occurrence:
+    key: Key
+    arguments: Tuple[Argument, ...]
+
+
+@dataclass
+class _Clause:
+    heads: List[_Occurrence] = field(default_factory=list)
+    positive: List[_Occurrence] = field(default_factory=list)
+    other: List[_Occurrence] = field(default_factory=list)
+
+
+def _atoms(node: Any) -> Iterable[ast.AST]:
+    """Symbolic atoms of an AST node."""
+    if isinstance(node, ast.AST):
+        if node.ast_type == ast.ASTType.SymbolicAtom:
+            yield node
+            return
+        for key in node.child_keys:
+            yield from _atoms(getattr(node, key))
+    elif isinstance(node, (list, tuple)) or type(node).__name__ == "ASTSequence":
+        for child in node:
+            yield from _atoms(child)
+
+
+def _has_variables(node: Any) -> bool:
+    if isinstance(node, ast.AST):
+        if node.ast_type == ast.ASTType.Variable:
+            return True
+        return any(_has_variables(getattr(node, key)) for key in node.child_keys)
+    if isinstance(node, (list, tuple)) or type(node).__name__ == "ASTSequence":
+        return any(_has_variables(child) for child in node)
+    return False
+
+
+# Head literals, condition and checked literals of an aggregate element or a conditional literal
+_Element = Tuple[List[ast.AST], List[ast.AST], List[ast.AST]]
+
+
+class _Analyser:
+    """Translation of the statements of a program into clauses."""
+
+    def __init__(self):
+        self.clauses: List[_Clause] = []
+        self.shown: Set[Key] = set()
+        self.has_show = False
+        self.unanalysed: Set[Key] = set()
+        self.constants: Set[str] = set()
+
+    def add(self, statement: ast.AST) -> None:
+        kind = statement.ast_type
+        if kind in _IGNORED:
+            if kind == ast.ASTType.Definition:
+                self.constants.add(statement.name)
+            return
+        if kind == ast.ASTType.ShowSignature:
+            self.has_show = True
+            if statement.name:
+                self.shown.add((statement.name, statement.arity, statement.positive))
+            return
+        try:
+            if kind == ast.ASTType.Rule:
+                self._rule(statement.head, statement.body)
+            elif kind == ast.ASTType.Minimize:
+                self._rule(None, statement.body)
+            elif kind == ast.ASTType.ShowTerm:
+                self.has_show = True
+                self._rule(None, statement.body)
+            elif kind == ast.ASTType.External:
+                self._rule(None, statement.body, heads=[self._occurrence(statement.atom)])
+            else:
+                raise _Unsupported(str(kind))
+        except _Unsupported as e:
+            logger.debug(f"Not analysed: {statement} ({e})")
+            for atom in _atoms(statement):
+                try:
+                    self.unanalysed.add(self._occurrence(atom).key)
+                except _Unsupported:
+                    pass
+
+    def _argument(self, term: ast.AST) -> Argument:
+        if term.ast_type == ast.ASTType.Variable:
+            return _ANY if term.name == "_" else ("var", term.name)
+        if _has_variables(term) or any(name in str(term) for name in self.constants):
+            return _ANY
+        if term.ast_type == ast.ASTType.SymbolicTerm:
+            return ("const", term.symbol)
+        try:
+            return ("const", parse_term(str(term)))
+        except RuntimeError:
+            return _ANY
+
+    def _occurrence(self, atom: ast.AST) -> _Occurrence:
+        term = atom.symbol if atom.ast_type == ast.ASTType.SymbolicAtom else atom
+        positive = True
+        if term.ast_type == ast.ASTType.UnaryOperation and term.operator_type == ast.UnaryOperator.Minus:
+            positive, term = False, term.argument
+        if term.ast_type == ast.ASTType.Function and not term.external:
+            return _Occurrence((term.name, len(term.arguments), positive), tuple(self._argument(a) for a in term.arguments))
+        if term.ast_type == ast.ASTType.SymbolicTerm and term.symbol.type == SymbolType.Function:
+            symbol = term.symbol
+            arguments = tuple(("const", a) for a in symbol.arguments)
+            return _Occurrence((symbol.name, len(symbol.arguments), symbol.positive and positive), arguments)
+        raise _Unsupported(f"atom {atom}")
+
+    def _literals(self, literals: Iterable[ast.AST], clause: _Clause, elements: List[_Element]) -> None:
+        """Add the atoms of plain literals to clause, and collect the conditional elements."""
+        for literal in literals:
+            kind = literal.ast_type
+            if kind == ast.ASTType.Literal:
+                atom = literal.atom
+                if atom.ast_type == ast.ASTType.SymbolicAtom:
+                    occurrence = self._occurrence(atom)
+                    (clause.positive if literal.sign == ast.Sign.NoSign else clause.other).append(occurrence)
+                elif atom.ast_type == ast.ASTType.BodyAggregate:
+                    elements.extend(([], list(element.condition), []) for element in atom.elements)
+                elif atom.ast_type == ast.ASTType.Aggregate:
+                    elements.extend(([], [element.literal, *element.condition], []) for element in atom.elements)
+                elif atom.ast_type not in (ast.ASTType.Comparison, ast.ASTType.BooleanConstant):
+                    raise _Unsupported(f"literal {literal}")
+            elif kind == ast.ASTType.ConditionalLiteral:
+                # The literal must hold for every instance of the condition: it does not restrict it
+                elements.append(([], list(literal.condition), [literal.literal]))
+            else:
+                raise _Unsupported(f"literal {literal}")
+
+    def _heads(self, head: Any, clause: _Clause, elements: List[_Element]) -> None:
+        """Add the atoms of a rule head to clause, and collect the conditional elements."""
+        if head is None:
+            return
+        kind = head.ast_type
+        if kind == ast.ASTType.Literal:
+            if head.atom.ast_type == ast.ASTType.SymbolicAtom:
+                clause.heads.append(self._occurrence(head.atom))
+            elif head.atom.ast_type not in (ast.ASTType.Comparison, ast.ASTType.BooleanConstant):
+                raise _Unsupported(f"head {head}")
+        elif kind in (ast.ASTType.Aggregate, ast.ASTType.Disjunction):
+            elements.extend(([element.literal], list(element.condition), []) for element in head.elements)
+        elif kind == ast.ASTType.HeadAggregate:
+            elements.extend(([element.condition.literal], list(element.condition.condition), []) for element in head.elements)
+        else:
+            raise _Unsupported(f"head {head}")
+
+    def _rule(self, head: Any, body: Iterable[ast.AST], heads: Optional[List[_Occurrence]] = None) -> None:
+        clause = _Clause(heads=list(heads or []))
+        elements: List[_Element] = []
+        self._heads(head, clause, elements)
+        self._literals(body, clause, elements)
+        clauses = [clause]
+        for element_heads, condition, checked in elements:
+            sub = _Clause(positive=list(clause.positive))
+            for literal in element_heads:
+                if literal.atom.ast_type == ast.ASTType.SymbolicAtom:
+                    sub.heads.append(self._occurrence(literal.atom))
+                elif literal.atom.ast_type not in (ast.ASTType.Comparison, ast.ASTType.BooleanConstant):
+                    raise _Unsupported(f"element {literal}")
+            nested: List[_Element] = []
+            self._literals(condition, sub, nested)
+            for literal in checked:
+                if literal.atom.ast_type == ast.ASTType.SymbolicAtom:
+                    sub.other.append(self._occurrence(literal.atom))
+            if nested:
+                raise _Unsupported("nested aggregate")
+            clauses.append(sub)
+        self.clauses.extend(clauses)
+
+
+class DatabaseSlicer:
+    """
+    Selection of the database facts that may matter to the facts of a request.
+
+    The database is grounded once, when the slicer is created, and its facts are indexed by
+    predicate and by the value of every argument. If the database is not made only of facts
+    (e.g. it has choice rules) it cannot be sliced and slice() returns None.
+
+    Args:
+        database: Database program
+        knowledge_base: Knowledge base solved with the database and the request facts
+        context: Context providing the functions called by the database
+    """
+
+    def __init__(self, database: str, knowledge_base: str, context: Any = None):
+        analyser = _Analyser()
+        ast.parse_string(knowledge_base, analyser.add)
+        self._clauses = analyser.clauses
+        self._facts: Dict[Key, List[Symbol]] = {}
+        self.sliceable = self._load(database, context)
+        self.size = sum(len(facts) for facts in self._facts.values())
+        # Facts of shown predicates are part of the answer sets
+        self._keep_all = set(self._facts) if not analyser.has_show else analyser.shown & set(self._facts)
+        self._keep_all |= analyser.unanalysed & set(self._facts)
+        self._index: Dict[Key, List[Dict[Symbol, List[int]]]] = {}
+        for key, facts in self._facts.items():
+            positions: List[Dict[Symbol, List[int]]] = [{} for _ in range(key[1])]
+            for i, fact in enumerate(facts):
+                for position, argument in zip(positions, fact.arguments):
+                    position.setdefault(argument, []).append(i)
+            self._index[key] = positions
+        # Values of every argument position, the bindings of a predicate kept whole
+        self._arguments: Dict[Key, List[FrozenSet[Symbol]]] = {
+            key: [frozenset(position) for position in positions] for key, positions in self._index.items()
+        }
+        self._derived = {head.key for clause in self._clauses for head in clause.heads}
+        self._occurrences: Dict[Key, List[Tuple[_Clause, Optional[int], _Occurrence]]] = {}
+        for clause in self._clauses:
+            for i, occurrence in enumerate(clause.positive):
+                self._occurrences.setdefault(occurrence.key, []).append((clause, i, occurrence))
+            for occurrence in clause.other:
+                self._occurrences.setdefault(occurrence.key, []).append((clause, None, occurrence))
+
+    def _load(self, database: str, context: Any) -> bool:
+        control = Control(["--warn=none"])
+        control.add("base", [], database)
+        control.ground([("base", [])], context=context)
+        for atom in control.symbolic_atoms:
+            if not atom.is_fact:
+                logger.warning(f"The database cannot be sliced, {atom.symbol} is not a fact")
+                self._facts = {}
+                return False
+            symbol = atom.symbol
+            self._facts.setdefault((symbol.name, len(symbol.arguments), symbol.positive), []).append(symbol)
+        return True
+
+    def slice(self, facts: Iterable[Symbol]) -> Optional[List[Symbol]]:
+        """
+        Return the database facts that may matter to the given request facts, None if the
+        database cannot be sliced.
+        """
+        if not self.sliceable:
+            return None
+        request: Dict[Key, List[Symbol]] = {}
+        for symbol in facts:
+            request.setdefault((symbol.name, len(symbol.arguments), symbol.positive), []).append(symbol)
+        # Predicates whose only atoms are database facts, whose kept facts are joined exactly
+        exact = set(self._facts) - self._derived - set(request)
+        # Indices of the kept facts of every predicate, None for all of them
+        kept: Dict[Key, Optional[Set[int]]] = {key: None for key in self._facts}
+        while True:
+            values = self._values(request, kept, exact)
+            selected = {key: self._select(key, values, kept, exact) for key in self._facts}
+            if selected == kept:
+                break
+            kept = selected
+        return [
+            fact
+            for key, facts in self._facts.items()
+            for i, fact in enumerate(facts)
+            if kept[key] is None or i in kept[key]
+        ]
+
+    def _values(
+        self,
+        request: Dict[Key, List[Symbol]],
+        kept: Dict[Key, Optional[Set[int]]],
+        exact: Set[Key]
+    ) -> Dict[Key, List[Optional[Any]]]:
+        """
+        Over-approximation of the values of every argument position of every predicate, None
+        for any value: the kept database facts, the request facts and what the rules derive.
+        A predicate without any atom has no entry.
+        """
+        values: Dict[Key, List[Optional[Any]]] = {}
+        for key, facts in self._facts.items():
+            if kept[key] is None:
+                values[key] = list(self._arguments[key])
+            elif kept[key]:
+                values[key] = [{facts[i].arguments[p] for i in kept[key]} for p in range(key[1])]
+        owned: Set[Key] = set()
+
+        def add(key: Key, arguments: List[Optional[Any]]) -> bool:
+            current = values.get(key)
+            if current is None:
+                values[key] = [None if a is None else set(a) for a in arguments]
+                owned.add(key)
+                return True
+            if key not in owned:
+                current = values[key] = [None if c is None else set(c) for c in current]
+                owned.add(key)
+            changed = False
+            for position, argument in enumerate(arguments):
+                if current[position] is None:
+                    continue
+                if argument is None:
+                    current[position] = None
+                    changed = True
+                elif not argument <= current[position]:
+                    current[position] |= argument
+                    changed = True
+            return changed
+
+        for key, symbols in request.items():
+            add(key, [{s.arguments[p] for s in symbols} for p in range(key[1])])
+        changed = True
+        while changed:
+            changed = False
+            for clause in self._clauses:
+                if not clause.heads:
+                    continue
+                bindings = self._bindings(clause, values, kept, exact)
+                if bindings is None:
+                    continue
+                for head in clause.heads:
+                    arguments = [
+                        {value} if kind == "const" else bindings.get(value) if kind == "var" else None
+                        for kind, value in head.arguments
+                    ]
+                    changed |= add(head.key, arguments)
+        return values
+
+    def _matching(self, occurrence: _Occurrence, bindings: Dict[str, Any], kept: Optional[Set[int]]) -> Optional[List[int]]:
+        """Indices of the kept facts matching an atom given the values of its variables, None if no argument is bound."""
+        constraints = []
+        for position, (kind, value) in enumerate(occurrence.arguments):
+            if kind == "const":
+                constraints.append((position, {value}))
+            elif kind == "var" and value in bindings:
+                constraints.append((position, bindings[value]))
+        if not constraints:
+            return None
+        constraints.sort(key=lambda constraint: len(constraint[1]))
+        (position, allowed), others = constraints[0], constraints[1:]
+        facts, index = self._facts[occurrence.key], self._index[occurrence.key][position]
+        return [
+            i
+            for value in allowed
+            for i in index.get(value, ())
+            if (kept is None or i in kept) and all(facts[i].arguments[q] in s for q, s in others)
+        ]
+
+    def _bindings(
+        self,
+        clause: _Clause,
+        values: Dict[Key, List[Optional[Any]]],
+        kept: Dict[Key, Optional[Set[int]]],
+        exact: Set[Key],
+        skip: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Values allowed for the variables of a clause by its positive atoms, except the one at
+        index skip; a variable without a set of values may take any value. None if the clause
+        cannot fire.
+
+        The values given by the argument positions are intersected, then narrowed down by
+        joining the atoms of database predicates with the facts they match.
+        """
+        candidates: Dict[str, List[Any]] = {}
+        joined = []
+        for i, occurrence in enumerate(clause.positive):
+            if i == skip:
+                continue
+            positions = values.get(occurrence.key)
+            if positions is None:
+                return None
+            # The values of the atoms that are joined are only used once the join is bound
+            join = occurrence.key in exact and sum(kind != "any" for kind, _ in occurrence.arguments) > 1
+            if join:
+                joined.append(occurrence)
+            for (kind, value), allowed in zip(occurrence.arguments, positions):
+                if allowed is None:
+                    continue
+                if kind == "const" and value not in allowed:
+                    return None
+                if kind == "var" and not join:
+                    candidates.setdefault(value, []).append(allowed)
+        bindings: Dict[str, Any] = {}
+        for name, sets in candidates.items():
+            sets.sort(key=len)
+            bindings[name] = sets[0] if len(sets) == 1 else {value for value in sets[0] if all(value in s for s in sets[1:])}
+            if not bindings[name]:
+                return None
+        changed = True
+        while changed:
+            changed = False
+            for occurrence in joined:
+                matching = self._matching(occurrence, bindings, kept[occurrence.key])
+                if matching is None:
+                    continue
+                if not matching:
+                    return None
+                facts = self._facts[occurrence.key]
+                for position, (kind, name) in enumerate(occurrence.arguments):
+                    if kind != "var":
+                        continue
+                    # The matching facts agree with the bound variables, the projection narrows them
+                    projected = {facts[i].arguments[position] for i in matching}
+                    if name not in bindings or len(projected) < len(bindings[name]):
+                        bindings[name] = projected
+                        changed = True
+        return bindings
+
+    def _select(
+        self,
+        key: Key,
+        values: Dict[Key, List[Optional[Any]]],
+        kept: Dict[Key, Optional[Set[int]]],
+        exact: Set[Key]
+    ) -> Optional[Set[int]]:
+        """Indices of the facts of key kept by some clause, among those kept so far."""
+        if key in self._keep_all:
+            return None
+        selected: Set[int] = set()
+        for clause, position, occurrence in self._occurrences.get(key, ()):
+            bindings = self._bindings(clause, values, kept, exact, position)
+            if bindings is None:
+                continue
+            matching = self._matching(occurrence, bindings, kept[key])
+            if matching is None:
+                return kept[key]
+            selected.update(matching)
+        return selected
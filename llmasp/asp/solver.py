@@ -1,10 +1,18 @@
 """
-Solver module for integrating with clingo and dumbo-asp.
+Solver module for integrating with clingo.
 """
 
-from clingo import Control
-from dumbo_asp.primitives.models import Model
-from typing import List, Tuple, Any
+import threading
+import time
+from clingo import Control, Function, Number, Symbol, SymbolType, TruthValue, ast
+from typing import Dict, List, Tuple, Any, Optional, Set, Union, Iterable, Iterator
+
+from llmasp.asp.answer_set import AnswerSet
+from llmasp.tracing import Trace, NULL_TRACE
+
+
+DEFAULT_ARGUMENTS = ["--opt-strategy=usc,k,0,5", "--opt-usc-shrink=rgs"]
+STEP_ATOM = "__llmasp_step"
 
 
 def logger(code, msg):
@@ -20,34 +28,413 @@ class Context:
         return a if a < b else b
 
 
+def _strip_prefix(symbol: Symbol, prefix: str) -> Symbol:
+    """Restore the name of an atom renamed by IncrementalSolver."""
+    if prefix and symbol.name.startswith(prefix):
+        return Function(symbol.name[len(prefix):], symbol.arguments, symbol.positive)
+    return symbol
+
+
+def _answer_set(symbols: Iterable[Symbol], prefix: str = "") -> AnswerSet:
+    """Create the answer set of the shown symbols of a model."""
+    return AnswerSet.of_symbols(_strip_prefix(s, prefix) for s in symbols if s.name != STEP_ATOM)
+
+
+def _solve_control(
+    control: Control,
+    timeout: int,
+    prefix: str = "",
+    structured: bool = False,
+    trace: Trace = NULL_TRACE,
+) -> Tuple[Union[List[str], AnswerSet], Any, Any]:
+    """
+    Solve a grounded control and return the best model found, interrupted and satisfiable.
+
+    Only the best model is kept: for optimisation programs every model reported by clingo
+    improves on the previous one, otherwise the first model is retained.
+    """
+    best: List[Any] = [None, None]
+    handle = None
+
+    def on_model(m):
+        if best[0] is None or (m.cost and m.cost < best[1]):
+            best[0] = m.symbols(shown=True)
+            best[1] = m.cost
+
+    with trace.span("solving") as span:
+        with control.solve(on_model=on_model, async_=True) as handle:
+            handle.wait(timeout)
+            handle.cancel()
+            handle = handle.get()
+        span.attributes.update(interrupted=handle.interrupted, satisfiable=handle.satisfiable)
+        if best[1]:
+            span.attributes["cost"] = best[1]
+
+    model = _answer_set(best[0], prefix) if best[0] is not None else AnswerSet()
+    result = model if structured else model.to_facts()
+
+    return result, handle.interrupted, handle.satisfiable
+
+
+def _enumerate_control(
+    control: Control,
+    models: int = 0,
+    optimal: bool = False,
+    timeout: Optional[float] = None,
+    structured: bool = False,
+) -> Iterator[Union[List[str], AnswerSet]]:
+    """Yield the models of a grounded control, only the proven optimal ones if optimal is True."""
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    count = 0
+    with control.solve(yield_=True, async_=True) as handle:
+        while models == 0 or count < models:
+            handle.resume()
+            remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            if not handle.wait(remaining):
+                handle.cancel()
+                return
+            model = handle.model()
+            if model is None:
+                return
+            if optimal and not model.optimality_proven:
+                continue
+            answer_set = _answer_set(model.symbols(shown=True))
+            count += 1
+            yield answer_set if structured else answer_set.to_facts()
+
+
+class _PredicateRenamer(ast.Transformer):
+    """Add a prefix to the name of the predicates that are not in a given set of signatures."""
+
+    def __init__(self, prefix: str, keep: set):
+        self.prefix = prefix
+        self.keep = keep
+
+    def visit_SymbolicAtom(self, atom):
+        symbol = atom.symbol
+        if symbol.ast_type == ast.ASTType.UnaryOperation:
+            return atom.update(symbol=symbol.update(argument=self._rename(symbol.argument)))
+        return atom.update(symbol=self._rename(symbol))
+
+    def visit_ShowSignature(self, statement):
+        if (statement.name, statement.arity) in self.keep:
+            return statement
+        return statement.update(name=self.prefix + statement.name)
+
+    def _rename(self, term):
+        if term.ast_type == ast.ASTType.Function:
+            if (term.name, len(term.arguments)) not in self.keep:
+                return term.update(name=self.prefix + term.name)
+        elif term.ast_type == ast.ASTType.SymbolicTerm:
+            symbol = term.symbol
+            if (symbol.name, len(symbol.arguments)) not in self.keep:
+                return term.update(symbol=_add_prefix(symbol, self.prefix))
+        return term
+
+
+class _SignatureCollector(ast.Transformer):
+    """Collect the signatures of the symbolic atoms of the visited nodes."""
+
+    def __init__(self):
+        self.signatures: Set[Tuple[str, int]] = set()
+
+    def visit_SymbolicAtom(self, atom):
+        symbol = atom.symbol
+        if symbol.ast_type == ast.ASTType.UnaryOperation:
+            symbol = symbol.argument
+        if symbol.ast_type == ast.ASTType.Function:
+            self.signatures.add((symbol.name, len(symbol.arguments)))
+        elif symbol.ast_type == ast.ASTType.SymbolicTerm and symbol.symbol.type == SymbolType.Function:
+            self.signatures.add((symbol.symbol.name, len(symbol.symbol.arguments)))
+        return atom
+
+
+def defined_predicates(program: str) -> Set[Tuple[str, int]]:
+    """Signatures (name, arity) of the predicates in the heads of the rules of program."""
+    collector = _SignatureCollector()
+
+    def add(statement):
+        if statement.ast_type != ast.ASTType.Rule:
+            return
+        head = statement.head
+        if head.ast_type == ast.ASTType.Literal:
+            literals = [head]
+        elif head.ast_type in (ast.ASTType.Disjunction, ast.ASTType.Aggregate):
+            literals = [element.literal for element in head.elements]
+        elif head.ast_type == ast.ASTType.HeadAggregate:
+            literals = [element.condition.literal for element in head.elements]
+        else:
+            literals = []
+        for literal in literals:
+            collector(literal)
+
+    ast.parse_string(program, add)
+    return collector.signatures
+
+
+def grounded_predicates(program: str, context: Any = Context) -> Set[Tuple[str, int]]:
+    """
+    Signatures (name, arity) of the atoms of program once grounded.
+
+    Unlike the text of program, grounding follows its #include directives, e.g. those of
+    a database loaded from fact files (see llmasp.asp.database).
+    """
+    control = Control(logger=logger)
+    control.add("base", [], program)
+    control.ground([("base", [])], context=context)
+    return {(name, arity) for name, arity, _ in control.symbolic_atoms.signatures}
+
+
+def _add_prefix(symbol: Symbol, prefix: str) -> Symbol:
+    return Function(prefix + symbol.name, symbol.arguments, symbol.positive)
+
+
+def _add_facts(control: Control, facts: Iterable[Symbol], condition: Optional[Symbol] = None) -> None:
+    """Add atoms to control as facts, or as rules with condition as body, without parsing any text."""
+    with control.backend() as backend:
+        body = [backend.add_atom(condition)] if condition is not None else []
+        for symbol in facts:
+            backend.add_rule([backend.add_atom(symbol)], body)
+
+
 class Solver:
     """
-    Solver interface for running ASP programs with clingo and dumbo-asp.
+    Solver interface for running ASP programs with clingo.
+
+    Models are returned as a list of facts, or as an AnswerSet if structured is True.
+    Facts given as clingo symbols, e.g. by a FactParser, are added to the program directly.
     """
 
+    preloads_database = False
+    accepts_symbols = True
+
     def solve(
         self,
         program: str,
-        arguments: List[str] = ["--opt-strategy=usc,k,0,5", "--opt-usc-shrink=rgs"],
+        arguments: List[str] = DEFAULT_ARGUMENTS,
         timeout: int = 2,
         context: Any = Context,
-    ) -> Tuple[List[str], Any, Any]:
-        results: List[Model] = []
-        handle = None
+        structured: bool = False,
+        trace: Optional[Trace] = None,
+        facts: Optional[Iterable[Symbol]] = None,
+    ) -> Tuple[Union[List[str], AnswerSet], Any, Any]:
+        trace = trace or NULL_TRACE
+        with trace.span("grounding"):
+            control = Control(arguments, logger=logger)
+            if facts:
+                _add_facts(control, facts)
+            control.add(f"{program}")
+            control.ground([("base", [])], context=context)
 
-        def on_model(m):
-            results.append(Model.of_atoms(m.symbols(shown=True)))
+        return _solve_control(control, timeout, structured=structured, trace=trace)
 
+    def enumerate(
+        self,
+        program: str,
+        models: int = 0,
+        optimal: bool = False,
+        arguments: List[str] = DEFAULT_ARGUMENTS,
+        timeout: Optional[float] = None,
+        context: Any = Context,
+        structured: bool = False,
+    ) -> Iterator[Union[List[str], AnswerSet]]:
+        """
+        Yield the models of program as they are computed.
+
+        Args:
+            program: ASP program
+            models: Maximum number of models to yield, 0 for all
+            optimal: Whether to yield only the optimal models (the top-k with models=k)
+            arguments: Arguments of the clingo control
+            timeout: Optional time limit of the enumeration, in seconds
+            context: Context providing the functions called by the program
+            structured: Whether to yield AnswerSet instances instead of lists of facts
+        """
+        arguments = [*arguments, "--models=0"]
+        if optimal:
+            arguments.append("--opt-mode=optN")
         control = Control(arguments, logger=logger)
         control.add(f"{program}")
         control.ground([("base", [])], context=context)
 
-        with control.solve(on_model=on_model, async_=True) as handle:
-            handle.wait(timeout)
-            handle.cancel()
-            handle = handle.get()
+        yield from _enumerate_control(control, models, optimal, timeout, structured)
+
+
+class IncrementalSolver:
+    """
+    Solver keeping a long-lived clingo control where a static program is grounded once.
+
+    The static program (typically the database) is loaded with load() and grounded in the
+    base part. Every call to solve() grounds the given program in a new part whose rules are
+    guarded by an external atom; the atom is true while solving and released afterwards,
+    so that the rules of previous requests can never fire again. After max_steps requests the
+    control is rebuilt, to bound the memory taken by released parts.
+
+    Facts set with assign_facts() are external atoms of the static part: they hold in every
+    following solve until they are retracted, and changing them neither grounds the static
+    part again nor adds a part. A solver holding such facts serves a single conversation
+    (see llmasp.llm.session.Session).
+
+    Args:
+        arguments: Arguments of the clingo control
+        context: Context providing the functions called by the programs
+        max_steps: Number of solved requests after which the control is rebuilt
+    """
+
+    preloads_database = True
+    accepts_symbols = True
+
+    def __init__(
+        self,
+        arguments: List[str] = DEFAULT_ARGUMENTS,
+        context: Any = Context,
+        max_steps: int = 1000,
+    ):
+        self.arguments = list(arguments)
+        self.context = context
+        self.max_steps = max_steps
+        self.static_programs: List[str] = []
+        self._lock = threading.Lock()
+        self._control: Optional[Control] = None
+        self._step = 0
+        self._facts: Dict[Symbol, bool] = {}
+        self._declared: Set[Symbol] = set()
+
+    def load(self, program: str) -> None:
+        """
+        Add a program to the static part, grounded once for all requests.
+        """
+        with self._lock:
+            self.static_programs.append(program)
+            self._control = None
+
+    def _reset(self, trace: Trace = NULL_TRACE) -> Control:
+        """Create a new control and ground the static programs."""
+        with trace.span("grounding", static=True):
+            control = Control(self.arguments, logger=logger)
+            for program in self.static_programs:
+                control.add("base", [], program)
+            control.ground([("base", [])], context=self.context)
+        self._control = control
+        self._step = 0
+        self._declared = set()
+        self._assign(control, self._facts)
+        return control
+
+    def _assign(self, control: Control, facts: Dict[Symbol, bool]) -> None:
+        """Declare the external atoms of facts that control does not know yet, and assign their values."""
+        new = [symbol for symbol in facts if symbol not in self._declared]
+        if new:
+            with control.backend() as backend:
+                for symbol in new:
+                    backend.add_external(backend.add_atom(symbol), TruthValue.False_)
+            self._declared.update(new)
+        for symbol, value in facts.items():
+            control.assign_external(symbol, value)
+
+    def assign_facts(self, add: Iterable[Symbol] = (), retract: Iterable[Symbol] = ()) -> None:
+        """
+        Make the given atoms hold, or no longer hold, in the following solves.
+
+        Args:
+            add: Atoms added as facts
+            retract: Atoms retracted, if they were added before
+        """
+        with self._lock:
+            changes = {symbol: True for symbol in add}
+            changes.update((symbol, False) for symbol in retract if symbol in self._facts or symbol in changes)
+            self._facts.update(changes)
+            if self._control is not None:
+                self._assign(self._control, changes)
+
+    @property
+    def facts(self) -> List[Symbol]:
+        """Atoms added with assign_facts() and not retracted."""
+        with self._lock:
+            return [symbol for symbol, value in self._facts.items() if value]
+
+    def _add_step(
+        self,
+        control: Control,
+        program: str,
+        step: int,
+        facts: Optional[Iterable[Symbol]] = None
+    ) -> Tuple[str, Any, str]:
+        """
+        Add program and facts to the control in a new part guarded by the external atom of step.
+
+        Clingo does not allow redefining atoms of previous steps, hence the predicates that are
+        not in the static part are renamed with a prefix specific to the step.
+        """
+        part = f"{STEP_ATOM}_{step}"
+        prefix = f"{part}_"
+        guard_atom = Function(STEP_ATOM, [Number(step)])
+        location = ast.Location(ast.Position("<step>", 1, 1), ast.Position("<step>", 1, 1))
+        guard = ast.Literal(
+            location,
+            ast.Sign.NoSign,
+            ast.SymbolicAtom(ast.SymbolicTerm(location, guard_atom))
+        )
+        static = {(name, arity) for name, arity, _ in control.symbolic_atoms.signatures}
+        renamer = _PredicateRenamer(prefix, static)
+        if facts:
+            _add_facts(
+                control,
+                (s if (s.name, len(s.arguments)) in static else _add_prefix(s, prefix) for s in facts),
+                guard_atom
+            )
+
+        with ast.ProgramBuilder(control) as builder:
+            def add(statement):
+                if statement.ast_type == ast.ASTType.Program:
+                    if statement.name == "base":
+                        statement = ast.Program(statement.location, part, [])
+                    builder.add(statement)
+                    return
+                statement = renamer(statement)
+                if statement.ast_type in (
+                    ast.ASTType.Rule,
+                    ast.ASTType.Minimize,
+                    ast.ASTType.ShowTerm,
+                    ast.ASTType.External,
+                ):
+                    statement = statement.update(body=[*statement.body, guard])
+                builder.add(statement)
+
+            ast.parse_string(program, add)
+        control.add(part, [], f"#external {STEP_ATOM}({step}).")
+        return part, guard_atom, prefix
+
+    def solve(
+        self,
+        program: str,
+        arguments: Optional[List[str]] = None,
+        timeout: int = 2,
+        context: Any = None,
+        structured: bool = False,
+        trace: Optional[Trace] = None,
+        facts: Optional[Iterable[Symbol]] = None,
+    ) -> Tuple[Union[List[str], AnswerSet], Any, Any]:
+        """
+        Solve program, and the facts given as clingo symbols, on top of the static part.
 
-        model = results[0] if len(results) > 0 else Model.empty()
-        result = model.as_facts.split("\n") if len(model) > 0 else []
+        Passing arguments different from the current ones rebuilds the control.
+        """
+        trace = trace or NULL_TRACE
+        with self._lock:
+            if arguments is not None and list(arguments) != self.arguments:
+                self.arguments = list(arguments)
+                self._control = None
+            if self._control is None or self._step >= self.max_steps:
+                self._reset(trace)
+            control = self._control
+            self._step += 1
 
-        return result, handle.interrupted, handle.satisfiable
\ No newline at end of file
+            with trace.span("grounding"):
+                part, guard_atom, prefix = self._add_step(control, program, self._step, facts)
+                control.ground([(part, [])], context=context or self.context)
+            control.assign_external(guard_atom, True)
+            try:
+                return _solve_control(control, timeout, prefix=prefix, structured=structured, trace=trace)
+            finally:
+                control.release_external(guard_atom)
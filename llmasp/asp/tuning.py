@@ -0,0 +1,250 @@
+"""
+Solver settings of an application, and their offline tuning.
+
+The solver section of an application specification sets the clingo options used for its
+knowledge base:
+
+    solver:
+      threads: 4
+      parallel_mode: compete
+      configuration: many
+      opt_strategy: usc,k,0,5
+      opt_usc_shrink: rgs
+      timeout: 5
+      arguments: ["--heuristic=Domain"]
+
+With several threads in compete mode every thread searches the same program and the
+configuration many gives them a portfolio of different search strategies; split mode
+divides the search space instead. tune() compares settings on sample fact sets and
+write_settings() stores the best one in the specification.
+"""
+
+import os
+import re
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import yaml
+
+from llmasp.asp.solver import Solver
+
+
+PARALLEL_MODES = ("compete", "split")
+SETTINGS_KEYS = ("threads", "parallel_mode", "configuration", "opt_strategy", "opt_usc_shrink", "timeout", "arguments")
+
+_TOP_LEVEL_KEY = re.compile(r"^[^\s#-][^:]*:")
+
+
+@dataclass(frozen=True)
+class SolverSettings:
+    """
+    Clingo options of an application, from the solver section of its specification.
+
+    Attributes:
+        threads: Number of solving threads
+        parallel_mode: How threads share the search, "compete" or "split"
+        configuration: Clingo search configuration, e.g. trendy, crafty or many (a portfolio
+            of configurations for competing threads); None for the clingo default
+        opt_strategy: Optimisation strategy, e.g. bb or usc,k,0,5; None for the clingo default
+        opt_usc_shrink: Core shrinking strategy of usc optimisation; None for the clingo default
+        timeout: Time limit of solving, in seconds; None for the default of the solver
+        arguments: Other clingo arguments
+    """
+    threads: int = 1
+    parallel_mode: str = "compete"
+    configuration: Optional[str] = None
+    opt_strategy: Optional[str] = "usc,k,0,5"
+    opt_usc_shrink: Optional[str] = "rgs"
+    timeout: Optional[float] = None
+    arguments: Tuple[str, ...] = field(default_factory=tuple)
+
+    def __post_init__(self):
+        if not isinstance(self.threads, int) or self.threads < 1:
+            raise ValueError(f"threads must be a positive integer, got {self.threads!r}")
+        if self.parallel_mode not in PARALLEL_MODES:
+            raise ValueError(f"Unknown parallel mode: {self.parallel_mode}, expected one of {PARALLEL_MODES}")
+        if self.timeout is not None and self.timeout <= 0:
+            raise ValueError(f"timeout must be positive, got {self.timeout}")
+        object.__setattr__(self, "arguments", tuple(str(argument) for argument in self.arguments))
+
+    @staticmethod
+    def from_config(section: Optional[Mapping]) -> Optional["SolverSettings"]:
+        """
+        Settings of the solver section of a specification, None if there is none.
+
+        Raises:
+            ValueError: If the section has unknown keys or invalid values
+        """
+        if section is None:
+            return None
+        if not isinstance(section, Mapping):
+            raise ValueError("The solver section must be a mapping")
+        unknown = set(section) - set(SETTINGS_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown solver settings: {sorted(unknown)}, expected some of {SETTINGS_KEYS}")
+        return SolverSettings(**section)
+
+    def to_config(self) -> Dict[str, Any]:
+        """Solver section of a specification, without the settings left to their defaults."""
+        default = SolverSettings()
+        config = {key: getattr(self, key) for key in SETTINGS_KEYS if getattr(self, key) != getattr(default, key)}
+        if "arguments" in config:
+            config["arguments"] = list(config["arguments"])
+        return config
+
+    def clingo_arguments(self) -> List[str]:
+        """Arguments of the clingo control."""
+        arguments = []
+        if self.opt_strategy:
+            arguments.append(f"--opt-strategy={self.opt_strategy}")
+        if self.opt_usc_shrink:
+            arguments.append(f"--opt-usc-shrink={self.opt_usc_shrink}")
+        if self.configuration:
+            arguments.append(f"--configuration={self.configuration}")
+        if self.threads > 1:
+            arguments.append(f"--parallel-mode={self.threads},{self.parallel_mode}")
+        return arguments + list(self.arguments)
+
+    def describe(self) -> str:
+        return " ".join(self.clingo_arguments()) or "(clingo defaults)"
+
+
+def default_candidates(threads: Optional[int] = None) -> List[SolverSettings]:
+    """
+    Settings compared by tune(): the optimisation strategies of clingo with one thread, and
+    portfolios of threads (at most 4, or threads if given) competing on them.
+    """
+    threads = threads or min(4, os.cpu_count() or 1)
+    candidates = [
+        SolverSettings(),
+        SolverSettings(opt_strategy="bb", opt_usc_shrink=None),
+        SolverSettings(opt_strategy="usc", opt_usc_shrink=None),
+        SolverSettings(configuration="trendy"),
+        SolverSettings(configuration="crafty", opt_strategy="bb", opt_usc_shrink=None),
+    ]
+    if threads > 1:
+        candidates += [
+            SolverSettings(threads=threads, configuration="many"),
+            SolverSettings(threads=threads, configuration="many", opt_strategy="bb", opt_usc_shrink=None),
+            SolverSettings(threads=threads, parallel_mode="split"),
+        ]
+    return candidates
+
+
+@dataclass
+class TuningResult:
+    """
+    Performance of settings over the sample fact sets.
+
+    Attributes:
+        settings: Compared settings
+        runs: Number of solved programs
+        timeouts: Number of programs whose search was interrupted by the timeout
+        times: Time to optimum of every program, in seconds, the timeout if interrupted
+        timeout: Time limit of every run
+    """
+    settings: SolverSettings
+    runs: int = 0
+    timeouts: int = 0
+    times: List[float] = field(default_factory=list)
+    timeout: float = 0.0
+
+    @property
+    def timeout_rate(self) -> float:
+        return self.timeouts / self.runs if self.runs else 0.0
+
+    @property
+    def mean_time(self) -> float:
+        return sum(self.times) / len(self.times) if self.times else 0.0
+
+    @property
+    def score(self) -> float:
+        """Mean time with interrupted runs counted twice the timeout (PAR2), lower is better."""
+        if not self.runs:
+            return float("inf")
+        penalties = self.timeouts * self.timeout
+        return (sum(self.times) + penalties) / self.runs
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "arguments": self.settings.describe(),
+            "runs": self.runs,
+            "timeout_rate": self.timeout_rate,
+            "mean_time": self.mean_time,
+            "score": self.score,
+        }
+
+
+def tune(
+    program: str,
+    fact_sets: Iterable[str],
+    candidates: Optional[List[SolverSettings]] = None,
+    timeout: float = 10,
+    repeats: int = 1,
+) -> List[TuningResult]:
+    """
+    Solve program with every fact set under every candidate settings, best settings first.
+
+    Every run searches for the optimum until the timeout; settings are ranked by timeout rate
+    and then by PAR2 score (see TuningResult.score). Runs of different settings alternate, so
+    that a change of the load of the machine affects them alike.
+
+    Args:
+        program: Knowledge base and database of the application
+        fact_sets: Facts of sample requests, e.g. extracted by LLMASP.run_batch
+        candidates: Compared settings, by default default_candidates()
+        timeout: Time limit of every run, in seconds
+        repeats: Number of runs of every fact set with every settings
+    """
+    candidates = candidates if candidates is not None else default_candidates()
+    results = [TuningResult(settings, timeout=timeout) for settings in candidates]
+    solver = Solver()
+    for facts in fact_sets:
+        for _ in range(repeats):
+            for result in results:
+                start = time.perf_counter()
+                _, interrupted, _ = solver.solve(
+                    f"{facts}\n{program}",
+                    arguments=result.settings.clingo_arguments(),
+                    timeout=timeout
+                )
+                elapsed = time.perf_counter() - start
+                result.runs += 1
+                result.timeouts += int(bool(interrupted))
+                result.times.append(timeout if interrupted else elapsed)
+    return sorted(results, key=lambda result: (result.timeout_rate, result.score))
+
+
+def best_settings(results: List[TuningResult], current: SolverSettings, min_gain: float = 0.05) -> SolverSettings:
+    """
+    Settings to use after tuning: the best ones, unless they do not time out less often than
+    current and do not improve its score by at least the fraction min_gain.
+    """
+    best = results[0]
+    baseline = next((result for result in results if result.settings == current), None)
+    if baseline is None or best.timeout_rate < baseline.timeout_rate:
+        return best.settings
+    return best.settings if best.score <= baseline.score * (1 - min_gain) else current
+
+
+def write_settings(config_file: str, settings: SolverSettings) -> None:
+    """
+    Store settings in the solver section of an application specification.
+
+    The section is replaced, or appended if there is none; the rest of the file is kept as is.
+    """
+    with open(config_file, "r") as f:
+        lines = f.read().splitlines(keepends=True)
+    section = yaml.safe_dump({"solver": settings.to_config() or None}, sort_keys=False)
+    start = next((i for i, line in enumerate(lines) if line.startswith("solver:")), None)
+    if start is None:
+        if lines and not lines[-1].endswith("\n"):
+            lines[-1] += "\n"
+        lines += ["\n", section]
+    else:
+        end = next((i for i in range(start + 1, len(lines)) if _TOP_LEVEL_KEY.match(lines[i])), len(lines))
+        lines[start:end] = [section + ("\n" if end < len(lines) else "")]
+    with open(config_file, "w") as f:
+        f.write("".join(lines))
@@ -0,0 +1,195 @@
+"""
+Caches for deterministic results, such as LLM responses at temperature 0.
+"""
+
+import hashlib
+import json
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def make_key(*parts: Any) -> str:
+    """
+    Create a stable content hash of the given parts.
+
+    Parts are serialised as canonical JSON (sorted keys, no whitespace), so that equal
+    requests map to the same key across processes and runs.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cache(ABC):
+    """
+    Base class of the cache backends, keeping hit and miss counters.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the value stored for key, or default if missing or expired."""
+        found, value = self.probe(key)
+        self.count(found)
+        return value if found else default
+
+    def probe(self, key: str) -> tuple:
+        """
+        Return a pair (found, value) for key, without counting a hit or a miss; a lookup made
+        of several probes is counted once with count().
+        """
+        return self._get(key)
+
+    def count(self, found: bool) -> None:
+        """Count a lookup as a hit if found, else as a miss."""
+        with self._stats_lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def set(self, key: str, value: Any) -> None:
+        """Store value for key."""
+        self._set(key, value)
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups that found a value."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the counters of the cache."""
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate, "size": len(self)}
+
+    @abstractmethod
+    def _get(self, key: str) -> tuple:
+        """Return a pair (found, value)."""
+        pass
+
+    @abstractmethod
+    def _set(self, key: str, value: Any) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry."""
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+
+class LRUCache(Cache):
+    """
+    In-memory cache evicting the least recently used entries.
+
+    Args:
+        max_size: Maximum number of entries
+        ttl: Optional time to live of an entry, in seconds
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        super().__init__()
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> tuple:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def _set(self, key: str, value: Any) -> None:
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache(Cache):
+    """
+    Persistent cache stored in a SQLite database, with values serialised by pickle.
+
+    Args:
+        path: Path of the database file
+        ttl: Optional time to live of an entry, in seconds
+        max_size: Optional maximum number of entries; the least recently used are evicted
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_size: Optional[int] = None):
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+
+    def _get(self, key: str) -> tuple:
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return False, None
+            value, created = row
+            if self.ttl is not None and created + self.ttl < now:
+                self._connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return False, None
+            self._connection.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return True, pickle.loads(value)
+
+    def _set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, pickle.dumps(value), now, now)
+            )
+            if self.max_size is not None:
+                self._connection.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_size,)
+                )
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM cache")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._connection.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
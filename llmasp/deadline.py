@@ -0,0 +1,61 @@
+"""
+End-to-end time budget of a request, split across the stages of the pipeline.
+"""
+
+import time
+from typing import Dict, Optional, Union
+
+
+STAGES = ("extraction", "solving", "postprocessing", "summarize")
+DEFAULT_SHARES = {"solving": 0.2, "postprocessing": 0.2, "summarize": 0.2}
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage that cannot degrade has no time left."""
+    pass
+
+
+class Deadline:
+    """
+    Time budget of a request, shared by its stages.
+
+    Every stage may use the time that is left, except the shares of the total budget
+    reserved for the following stages; the time saved by a stage that finishes early
+    is therefore available to the next ones.
+
+    Args:
+        seconds: Total budget of the request
+        shares: Fraction of the total budget reserved for every stage after extraction,
+            by stage name (see STAGES)
+        clock: Monotonic clock, in seconds
+    """
+
+    def __init__(self, seconds: float, shares: Optional[Dict[str, float]] = None, clock=time.monotonic):
+        self.seconds = seconds
+        self.shares = dict(DEFAULT_SHARES if shares is None else shares)
+        self._clock = clock
+        self._end = clock() + seconds
+
+    @staticmethod
+    def of(value: Union[None, float, "Deadline"]) -> Optional["Deadline"]:
+        """Return value if it is a Deadline or None, otherwise a Deadline of value seconds."""
+        if value is None or isinstance(value, Deadline):
+            return value
+        return Deadline(value)
+
+    def remaining(self) -> float:
+        """Seconds left, 0 if the deadline passed."""
+        return max(0.0, self._end - self._clock())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def budget(self, stage: str) -> float:
+        """Seconds that stage may use, 0 if the time left is reserved for the following stages."""
+        later = STAGES[STAGES.index(stage) + 1:]
+        reserved = self.seconds * sum(self.shares.get(name, 0.0) for name in later)
+        return max(0.0, self.remaining() - reserved)
+
+    def __repr__(self) -> str:
+        return f"Deadline({self.seconds}, remaining={self.remaining():.3f})"
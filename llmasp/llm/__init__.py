@@ -1,2 +1,7 @@
 from llmasp.llm.llmasp import LLMASP
-from llmasp.llm.llm_handler import LLMHandler
\ No newline at end of file
+from llmasp.llm.llm_handler import LLMHandler
+from llmasp.llm.async_llm_handler import AsyncLLMHandler
+from llmasp.llm.spec import CompiledSpec
+from llmasp.llm.router import RouterLLMHandler
+from llmasp.llm.extraction_cache import ExtractionCache
+from llmasp.llm.session import Session
\ No newline at end of file
@@ -0,0 +1,128 @@
+from openai import AsyncOpenAI
+from typing import Optional, List, Dict, Any, AsyncIterator, Awaitable, Callable
+
+from llmasp.cache import Cache
+from .llm_handler import BaseCompletionStream, BaseLLMHandler
+
+
+class AsyncCompletionStream(BaseCompletionStream):
+    """
+    Async iterator over the content deltas of a streamed completion.
+
+    The request is sent on the first iteration. Calling aclose() before the end of the stream
+    closes the connection, so that the server stops generating.
+    """
+
+    def __init__(self, create: Callable[[], Awaitable[Any]]):
+        super().__init__()
+        self._create = create
+        self._response = None
+        self._chunks: Optional[AsyncIterator[Any]] = None
+
+    def __aiter__(self) -> "AsyncCompletionStream":
+        return self
+
+    async def __anext__(self) -> str:
+        if self.closed:
+            raise StopAsyncIteration
+        if self._chunks is None:
+            self._response = await self._create()
+            self._chunks = self._response.__aiter__()
+        async for chunk in self._chunks:
+            content = self._content(chunk)
+            if content:
+                return content
+        self.closed = True
+        raise StopAsyncIteration
+
+    async def aclose(self) -> None:
+        """Stop the stream, closing the connection if the response is still being received."""
+        if not self.closed and self._response is not None and hasattr(self._response, "close"):
+            await self._response.close()
+        self.closed = True
+
+
+class AsyncLLMHandler(BaseLLMHandler):
+    """
+    Handles asynchronous interactions with a Large Language Model (LLM) via the OpenAI-compatible API.
+
+    All the calls of a handler go through a single async client, and therefore share its
+    connection pool. Handlers created with the same client share the pool as well.
+    """
+    def __init__(
+        self,
+        model_name: str = 'ollama',
+        server_url: str = 'http://localhost:11434/v1',
+        api_key: str = 'ollama',
+        timeout: int = 3600,
+        max_retries: int = 4,
+        client: Optional[AsyncOpenAI] = None,
+        http_client: Optional[Any] = None,
+        cache: Optional[Cache] = None,
+        stream_usage: bool = True
+    ):
+        """
+        Initialize the async LLM handler.
+
+        Args:
+            model_name: Name of the model
+            server_url: Base URL of the OpenAI-compatible server
+            api_key: API key of the server
+            timeout: Timeout of a request, in seconds
+            max_retries: Maximum number of retries of a request
+            client: Optional async client to share with other handlers
+            http_client: Optional async HTTP client, e.g. with custom connection pool limits
+            cache: Optional cache of the completions requested at temperature 0, keyed like
+                those of LLMHandler; completions served from it report a usage of zero tokens
+            stream_usage: Whether streamed completions request the token usage from the server
+        """
+        if client is None:
+            client = AsyncOpenAI(
+                base_url=server_url,
+                api_key=api_key,
+                timeout=timeout,
+                max_retries=max_retries,
+                http_client=http_client
+            )
+        super().__init__(client, model_name, cache, stream_usage)
+
+    async def call(
+        self,
+        messages: List[Dict[str, Any]],
+        temperature: float = 0,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None
+    ):
+        """
+        Call the LLM with the given messages and parameters.
+
+        If timeout is given, it replaces the timeout of the client for this request, in seconds,
+        and the request is not retried.
+        """
+        key = self._cache_key(messages, temperature, max_tokens)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        response = await self._create(messages, temperature, max_tokens, timeout)
+        return self._store(key, *self._completion(response))
+
+    def stream(
+        self,
+        messages: List[Dict[str, Any]],
+        temperature: float = 0,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncCompletionStream:
+        """
+        Call the LLM with the given messages and iterate over the completion as it is generated.
+
+        Returns:
+            Async stream of the content deltas, holding the whole completion and the usage once exhausted
+        """
+        return AsyncCompletionStream(lambda: self._create(messages, temperature, max_tokens, timeout, stream=True))
+
+    async def close(self) -> None:
+        """
+        Close the underlying client and its connection pool.
+        """
+        await self.client.close()
@@ -0,0 +1,11 @@
+"""
+Exceptions of the LLMASP pipeline.
+"""
+
+class LLMASPError(Exception):
+    """Base exception for LLMASP errors."""
+    pass
+
+class ConfigError(LLMASPError):
+    """Configuration related errors."""
+    pass
@@ -0,0 +1,217 @@
+"""
+Cache of the facts extracted from user inputs, matching repeated and near-duplicate inputs.
+"""
+
+import random
+import re
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+from llmasp.cache import Cache, LRUCache, make_key
+
+
+NUMBER_WORDS = {
+    "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6",
+    "seven": "7", "eight": "8", "nine": "9", "ten": "10", "eleven": "11", "twelve": "12",
+    "thirteen": "13", "fourteen": "14", "fifteen": "15", "sixteen": "16", "seventeen": "17",
+    "eighteen": "18", "nineteen": "19", "twenty": "20", "thirty": "30", "forty": "40",
+    "fifty": "50", "sixty": "60", "seventy": "70", "eighty": "80", "ninety": "90",
+    "hundred": "100", "dozen": "12",
+}
+DEFAULT_STOPWORDS = frozenset({"please", "pls", "thanks", "thank", "hi", "hello", "kindly"})
+
+_TOKEN = re.compile(r"\d+(?:\.\d+)?|\w+")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_PRIME = (1 << 61) - 1
+
+
+def normalize(text: str, stopwords: FrozenSet[str] = DEFAULT_STOPWORDS) -> str:
+    """
+    Normalise a user input: case, unicode forms, punctuation and whitespace are ignored,
+    number words are written as digits and stopwords are dropped.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = (NUMBER_WORDS.get(token, token) for token in _TOKEN.findall(text))
+    return " ".join(token for token in tokens if token not in stopwords)
+
+
+def _numbers(normalized: str) -> Tuple[str, ...]:
+    return tuple(_NUMBER.findall(normalized))
+
+
+class _MinHashIndex:
+    """
+    Locality sensitive index of MinHash signatures of character n-grams.
+
+    Signatures are split in bands; inputs sharing a band are candidates, whose similarity is
+    estimated by the fraction of equal signature values.
+    """
+
+    def __init__(self, num_perm: int, bands: int, ngram: int, max_entries: int):
+        generator = random.Random(num_perm)
+        self._permutations = [(generator.randrange(1, _PRIME), generator.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self._rows = num_perm // bands
+        self.ngram = ngram
+        self.max_entries = max_entries
+        # key -> (signature, numbers), in insertion order for eviction
+        self._entries: OrderedDict = OrderedDict()
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[str]] = {}
+
+    def signature(self, normalized: str) -> Tuple[int, ...]:
+        text = f" {normalized} "
+        shingles = {text[i:i + self.ngram] for i in range(max(1, len(text) - self.ngram + 1))}
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles]
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._permutations)
+
+    def _bands(self, signature: Tuple[int, ...]):
+        for band, start in enumerate(range(0, len(signature), self._rows)):
+            yield band, signature[start:start + self._rows]
+
+    def add(self, key: str, normalized: str) -> None:
+        if key in self._entries:
+            return
+        signature = self.signature(normalized)
+        self._entries[key] = (signature, _numbers(normalized))
+        for band in self._bands(signature):
+            self._buckets.setdefault(band, []).append(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        signature, _ = self._entries.pop(key)
+        for band in self._bands(signature):
+            keys = self._buckets.get(band)
+            if keys is not None:
+                keys.remove(key)
+                if not keys:
+                    del self._buckets[band]
+
+    def nearest(self, normalized: str, threshold: float) -> Optional[str]:
+        """Key of the most similar input with the same numbers, None if none reaches threshold."""
+        signature = self.signature(normalized)
+        numbers = _numbers(normalized)
+        best, best_similarity = None, threshold
+        candidates = {key for band in self._bands(signature) for key in self._buckets.get(band, ())}
+        for key in candidates:
+            other, other_numbers = self._entries[key]
+            if other_numbers != numbers:
+                continue
+            similarity = sum(x == y for x, y in zip(signature, other)) / len(signature)
+            if similarity >= best_similarity:
+                best, best_similarity = key, similarity
+        return best
+
+
+class ExtractionCache:
+    """
+    Cache of the facts extracted from user inputs, shared by LLMASP instances.
+
+    Inputs are looked up by their normalised text (see normalize) and, if threshold is
+    given, by the similarity of their character n-grams, estimated with MinHash signatures
+    kept in memory: an input whose similarity with a cached one reaches threshold, and that
+    has the same numbers in the same order, gets its facts. Entries are scoped by the digest
+    of the specifications, so editing the YAML files invalidates them.
+
+    Args:
+        cache: Backend storing the extracted facts, by default an LRUCache; a SQLiteCache
+            persists exact matches across processes
+        threshold: Minimum estimated Jaccard similarity of near-duplicate inputs, in (0, 1];
+            None only matches normalised inputs exactly
+        num_perm: Number of MinHash permutations
+        bands: Number of bands of the signatures; more bands find more candidates
+        ngram: Length of the character n-grams
+        max_entries: Maximum number of inputs in the similarity index of every scope
+        stopwords: Words ignored by the normalisation
+    """
+
+    def __init__(
+        self,
+        cache: Optional[Cache] = None,
+        threshold: Optional[float] = None,
+        num_perm: int = 64,
+        bands: int = 16,
+        ngram: int = 3,
+        max_entries: int = 10000,
+        stopwords: FrozenSet[str] = DEFAULT_STOPWORDS,
+    ):
+        if threshold is not None and not 0 < threshold <= 1:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.cache = cache if cache is not None else LRUCache(max_size=max_entries)
+        self.threshold = threshold
+        self.stopwords = frozenset(stopwords)
+        self._index_options = (num_perm, bands, ngram, max_entries)
+        self._indexes: Dict[Hashable, _MinHashIndex] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def lookup(self, scope: Hashable, user_input: str) -> Tuple[str, Optional[Any]]:
+        """
+        Return the match kind ("exact", "similar" or "miss") and the facts cached for an input.
+
+        Args:
+            scope: Scope of the entries, e.g. the digest of the specifications and the extraction options
+            user_input: Natural language input
+        """
+        normalized = normalize(user_input, self.stopwords)
+        found, value = self.cache.probe(make_key(scope, normalized))
+        match = "exact"
+        if not found and self.threshold is not None:
+            with self._lock:
+                index = self._indexes.get(scope)
+                key = index.nearest(normalized, self.threshold) if index is not None else None
+            if key is not None:
+                found, value = self.cache.probe(key)
+                match = "similar"
+        # The backend counts the lookup once, whatever the number of probes
+        self.cache.count(found)
+        if not found:
+            match, value = "miss", None
+        with self._lock:
+            if match == "exact":
+                self.exact_hits += 1
+            elif match == "similar":
+                self.similar_hits += 1
+            else:
+                self.misses += 1
+        return match, value
+
+    def store(self, scope: Hashable, user_input: str, value: Any) -> None:
+        """Cache the facts extracted from an input."""
+        normalized = normalize(user_input, self.stopwords)
+        key = make_key(scope, normalized)
+        self.cache.set(key, value)
+        if self.threshold is not None:
+            with self._lock:
+                index = self._indexes.get(scope)
+                if index is None:
+                    index = self._indexes[scope] = _MinHashIndex(*self._index_options)
+                index.add(key, normalized)
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups that found facts, exactly or by similarity."""
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return (self.exact_hits + self.similar_hits) / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the counters of the cache."""
+        return {
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "size": len(self.cache),
+        }
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self.cache.clear()
+            self._indexes.clear()
@@ -1,7 +1,163 @@
 from openai import OpenAI
-from typing import Optional, List, Dict, Any
+from openai.types import CompletionUsage
+from typing import Optional, List, Dict, Any, Iterator, Callable, Tuple
 
-class LLMHandler:
+from llmasp.cache import Cache, make_key
+
+
+def _bounded(client: Any, timeout: Optional[float]) -> Any:
+    """
+    Client sending a single request within timeout seconds, if given.
+
+    The request is not retried, since the retries of the client, each with the same timeout,
+    and their backoff would exceed it.
+    """
+    return client if timeout is None else client.with_options(timeout=timeout, max_retries=0)
+
+
+def _cached_usage() -> CompletionUsage:
+    """Usage of a completion served from the cache, for which no token was spent."""
+    return CompletionUsage(prompt_tokens=0, completion_tokens=0, total_tokens=0)
+
+
+class BaseCompletionStream:
+    """
+    Content deltas of a streamed completion, with the record of the whole completion.
+
+    Once the stream is exhausted, completion holds the whole text, usage the token usage
+    reported by the server (if it supports stream_options), and finish_reason the reason
+    why generation stopped.
+    """
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.usage: Any = None
+        self.finish_reason: Optional[str] = None
+        self.closed = False
+
+    @property
+    def completion(self) -> str:
+        return "".join(self.chunks)
+
+    def _content(self, chunk: Any) -> Optional[str]:
+        """Record a chunk of the response and return its content delta, if any."""
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            self.usage = usage
+        if not chunk.choices:
+            return None
+        choice = chunk.choices[0]
+        if isinstance(getattr(choice, "finish_reason", None), str):
+            self.finish_reason = choice.finish_reason
+        content = choice.delta.content
+        if content:
+            self.chunks.append(content)
+            return content
+        return None
+
+
+class CompletionStream(BaseCompletionStream):
+    """
+    Iterator over the content deltas of a streamed completion.
+
+    The request is sent on the first iteration. Calling close() before the end of the stream
+    closes the connection, so that the server stops generating.
+    """
+
+    def __init__(self, create: Callable[[], Any]):
+        super().__init__()
+        self._create = create
+        self._response = None
+        self._chunks: Optional[Iterator[Any]] = None
+
+    def __iter__(self) -> "CompletionStream":
+        return self
+
+    def __next__(self) -> str:
+        if self.closed:
+            raise StopIteration
+        if self._chunks is None:
+            self._response = self._create()
+            self._chunks = iter(self._response)
+        for chunk in self._chunks:
+            content = self._content(chunk)
+            if content:
+                return content
+        self.closed = True
+        raise StopIteration
+
+    def close(self) -> None:
+        """Stop the stream, closing the connection if the response is still being received."""
+        if not self.closed and self._response is not None and hasattr(self._response, "close"):
+            self._response.close()
+        self.closed = True
+
+
+class BaseLLMHandler:
+    """
+    Request building, caching and response parsing shared by LLMHandler and AsyncLLMHandler,
+    which only differ in how requests are sent.
+
+    Completions requested at temperature 0 are stored in the cache, if any, keyed by a hash
+    of the server URL, the model, the messages and the maximum number of tokens. Completions
+    served from the cache report a usage of zero tokens.
+    """
+
+    def __init__(self, client: Any, model_name: str, cache: Optional[Cache] = None, stream_usage: bool = True):
+        self.client = client
+        self.model = model_name
+        self.cache = cache
+        self.stream_usage = stream_usage
+
+    def _cache_key(self, messages: List[Dict[str, Any]], temperature: float, max_tokens: Optional[int]) -> Optional[str]:
+        """
+        Return the cache key of a request, or None if the request must not be cached.
+        """
+        if self.cache is None or temperature != 0:
+            return None
+        return make_key("chat", str(self.client.base_url), self.model, messages, max_tokens)
+
+    def _cached(self, key: Optional[str]) -> Optional[Tuple[str, Any]]:
+        """Completion and usage of a cached request, None if it is not cached."""
+        if key is None:
+            return None
+        completion = self.cache.get(key)
+        return None if completion is None else (completion, _cached_usage())
+
+    def _store(self, key: Optional[str], completion: str, meta: Any) -> Tuple[str, Any]:
+        """Store a completion in the cache, if the request is cached, and return it with its usage."""
+        if key is not None:
+            self.cache.set(key, completion)
+        return completion, meta
+
+    def _stream_options(self) -> Dict[str, Any]:
+        return {"stream_options": {"include_usage": True}} if self.stream_usage else {}
+
+    def _create(
+        self,
+        messages: List[Dict[str, Any]],
+        temperature: float,
+        max_tokens: Optional[int],
+        timeout: Optional[float],
+        stream: bool = False
+    ) -> Any:
+        """Send a chat completion request, awaitable if the client is async."""
+        options = {"stream": True, **self._stream_options()} if stream else {}
+        return _bounded(self.client, timeout).chat.completions.create(
+            model=self.model,
+            temperature=temperature,
+            messages=messages,
+            max_tokens=max_tokens,
+            **options
+        )
+
+    @staticmethod
+    def _completion(response: Any) -> Tuple[str, Any]:
+        """Completion and usage of a chat completion response."""
+        return response.choices[0].message.content, response.usage
+
+
+class LLMHandler(BaseLLMHandler):
     """
     Handles interactions with a Large Language Model (LLM) via the OpenAI-compatible API.
     """
@@ -11,37 +167,63 @@ class LLMHandler:
         server_url: str = 'http://localhost:11434/v1',
         api_key: str = 'ollama',
         timeout: int = 3600,
-        max_retries: int = 4
+        max_retries: int = 4,
+        cache: Optional[Cache] = None,
+        stream_usage: bool = True
     ):
         """
         Initialize the LLM handler.
+
+        If a cache is given, completions requested at temperature 0 are stored in it,
+        keyed by a hash of the server URL, the model, the messages and the maximum number
+        of tokens. Completions served from the cache report a usage of zero tokens.
+        If stream_usage is set, streamed completions request the token usage from the
+        server (stream_options), which not every OpenAI-compatible server supports.
         """
-        self.client = OpenAI(base_url=server_url, api_key=api_key, timeout=timeout, max_retries=max_retries)
-        self.model = model_name
+        client = OpenAI(base_url=server_url, api_key=api_key, timeout=timeout, max_retries=max_retries)
+        super().__init__(client, model_name, cache, stream_usage)
 
     def call(
         self,
         messages: List[Dict[str, Any]],
         temperature: float = 0,
         stream: bool = False,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None
     ):
         """
         Call the LLM with the given messages and parameters.
+
+        If stream is True, the completion is received as a stream and returned once complete;
+        use stream() to process the deltas as they arrive. If timeout is given, it replaces
+        the timeout of the client for this request, in seconds, and the request is not retried.
+
+        Returns:
+            Tuple of (completion, usage)
         """
-        response = self.client.chat.completions.create(
-            model=self.model,
-            temperature=temperature,
-            messages=messages,
-            stream=stream,
-            max_tokens=max_tokens
-        )
+        key = self._cache_key(messages, temperature, max_tokens)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
 
         if stream is True:
-            for chunk in response:
-                if chunk.choices[0].delta.content is not None:
-                    return chunk.choices[0].delta.content
-        else:
-            completion = response.choices[0].message.content
-            meta = response.usage
-            return completion, meta
\ No newline at end of file
+            response = self.stream(messages, temperature=temperature, max_tokens=max_tokens, timeout=timeout)
+            for _ in response:
+                pass
+            return self._store(key, response.completion, response.usage)
+        return self._store(key, *self._completion(self._create(messages, temperature, max_tokens, timeout)))
+
+    def stream(
+        self,
+        messages: List[Dict[str, Any]],
+        temperature: float = 0,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> CompletionStream:
+        """
+        Call the LLM with the given messages and iterate over the completion as it is generated.
+
+        Returns:
+            Stream of the content deltas, holding the whole completion and the usage once exhausted
+        """
+        return CompletionStream(lambda: self._create(messages, temperature, max_tokens, timeout, stream=True))
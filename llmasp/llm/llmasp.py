@@ -1,25 +1,45 @@
 """
 LLMASP: Main pipeline for converting natural language to ASP and back using LLMs and an ASP solver.
 """
-import yaml
-import re
+import asyncio
+import threading
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Optional, List, Dict, Any, Tuple
-from yaml.error import YAMLError
+from typing import Optional, List, Dict, Any, Set, Tuple, Callable, Iterable, Iterator, Awaitable, Union
 
+from clingo import Symbol, parse_term
+from openai import APITimeoutError
+
+from llmasp.asp.answer_set import AnswerSet
+from llmasp.asp.facts import FactParser
+from llmasp.asp.slicing import DatabaseSlicer
+from llmasp.asp.solver import Context, Solver, defined_predicates, grounded_predicates
+from llmasp.cache import Cache, make_key
+from llmasp.deadline import Deadline, DeadlineExceeded
+from llmasp.tracing import Span, Trace, NULL_TRACE, export
 from .abstract_llmasp import AbstractLLMASP
+from .errors import LLMASPError, ConfigError
+from .extraction_cache import ExtractionCache
 from .llm_handler import LLMHandler
+from .spec import CompiledSpec, load_yaml
 
 logger = logging.getLogger(__name__)
 
-class LLMASPError(Exception):
-    """Base exception for LLMASP errors."""
-    pass
+HISTORY_MODES = ("full", "dedupe", "facts")
+HISTORY_FACTS_PROMPT = "Facts extracted from the user request:\n"
+OUTPUT_END = "[/OUTPUT]"
+
+
+def _facts_text(symbols: Iterable[Symbol]) -> str:
+    """Text of the facts of the given atoms, one per line."""
+    return "\n".join(f"{symbol}." for symbol in symbols)
+
+
+def _timed_out(error: Exception) -> bool:
+    """Whether error reports an LLM call or a stage that ran out of time."""
+    return isinstance(error, (TimeoutError, APITimeoutError, DeadlineExceeded))
 
-class ConfigError(LLMASPError):
-    """Configuration related errors."""
-    pass
 
 @dataclass
 class PreProcessingConfig:
@@ -36,6 +56,60 @@ class PostProcessingConfig:
     init: str
     summarize: str
 
+@dataclass
+class BatchResult:
+    """Outcome of a single input processed by run_batch."""
+    input: str
+    response: Optional[str] = None
+    facts: Optional[str] = None
+    error: Optional[str] = None
+
+class FactStream:
+    """
+    Incremental parser of the facts of an extraction answer received as a stream.
+
+    Facts are collected as soon as they are complete; the answer is done once the closing
+    [/OUTPUT] marker is received, and whatever follows the marker is ignored.
+
+    Args:
+        parser: Parser validating the facts, by default accepting every predicate
+    """
+
+    def __init__(self, parser: Optional[FactParser] = None):
+        self.parser = parser or FactParser()
+        self.text = ""
+        self.symbols: List[Symbol] = []
+        self.diagnostics: List[str] = []
+        self.done = False
+        self._position = 0
+        self._seen: set = set()
+
+    @property
+    def facts(self) -> List[str]:
+        return [f"{symbol}." for symbol in self.symbols]
+
+    def feed(self, delta: str) -> List[str]:
+        """Add a delta of the answer and return the facts it completes."""
+        if self.done:
+            return []
+        self.text += delta
+        end = self.text.find(OUTPUT_END)
+        self.done = end >= 0
+        return self._scan(self.text[:end] if self.done else self.text, final=self.done)
+
+    def close(self) -> List[str]:
+        """End an answer without [/OUTPUT] marker and return the facts completed by its end."""
+        if self.done:
+            return []
+        self.done = True
+        return self._scan(self.text, final=True)
+
+    def _scan(self, text: str, final: bool) -> List[str]:
+        parsed, self._position = self.parser.scan(text, self._position, final=final, seen=self._seen)
+        self.symbols.extend(parsed.symbols)
+        self.diagnostics.extend(parsed.diagnostics)
+        return parsed.facts
+
 class LLMASP(AbstractLLMASP):
     """
     Main pipeline for LLMASP framework.
@@ -49,51 +123,111 @@ class LLMASP(AbstractLLMASP):
         llm: LLM handler instance
         solver: ASP solver instance
         database: Optional database content from config
+        spec: Compiled specification, shared by the instances created from the same files
+        history_mode: How the extraction history is given to the postprocessing queries
+        stream_extraction: Whether extraction answers are streamed and parsed incrementally
+        fact_parser: Parser of the extraction answers, accepting the predicates of the preprocessing entries
+        extraction_cache: Optional cache of the facts extracted from user inputs
+        database_slicer: Selection of the database facts relevant to a request, if slicing is enabled
+        solve_cache: Optional cache of the answer sets of the extracted facts
+        database_preloaded: Whether the database is loaded once into the solver; False if the
+            solver does not preload it, or if the knowledge base or the extracted facts may
+            define its predicates, which clingo rejects for a preloaded database
     """
-    def __init__(self, config_file: str, behavior_file: str, llm: LLMHandler, solver: Any):
+    def __init__(
+        self, 
+        config_file: Optional[str], 
+        behavior_file: Optional[str], 
+        llm: LLMHandler, 
+        solver: Any, 
+        exporters: Optional[List[Any]] = None,
+        spec: Optional[CompiledSpec] = None,
+        history_mode: str = "full",
+        stream_extraction: bool = False,
+        extraction_cache: Optional[ExtractionCache] = None,
+        slice_database: bool = False,
+        solve_cache: Optional[Cache] = None
+    ):
         """
         Initialize LLMASP with configuration files and handlers.
 
+        The specification files are compiled once per content (see CompiledSpec.load);
+        instances created from the same files share the same CompiledSpec.
+
         Args:
-            config_file: Path to application configuration YAML
-            behavior_file: Path to behavior rules YAML
+            config_file: Path to application configuration YAML, ignored if spec is given
+            behavior_file: Path to behavior rules YAML, ignored if spec is given
             llm: LLM handler instance
-            solver: ASP solver instance
+            solver: ASP solver instance; the database is loaded into solvers that preload it
+            exporters: Optional trace exporters (see llmasp.tracing), receiving the trace of every run
+            spec: Optional precompiled specification
+            history_mode: How the extraction history is given to the postprocessing queries
+                when use_history is set: "full" replays every extraction query before the
+                postprocessing prompt; "dedupe" replays them once without repeated system
+                messages, and "facts" replaces them by a single message listing the extracted
+                facts. Both put the postprocessing system messages first, so that every
+                postprocessing query shares the same prefix, which server-side prefix
+                caching can reuse.
+            stream_extraction: Whether extraction answers are streamed, their facts collected
+                as they arrive and the stream closed as soon as [/OUTPUT] is received
+            extraction_cache: Optional cache of the facts extracted from user inputs, reused
+                for repeated and near-duplicate inputs instead of querying the LLM
+            slice_database: Whether only the database facts that may matter to the facts of
+                a request are solved with it (see llmasp.asp.slicing), so that grounding
+                scales with the request instead of the database. Ignored by solvers that
+                preload the database, e.g. IncrementalSolver
+            solve_cache: Optional cache of the answer sets, e.g. an LRUCache or a SQLiteCache
+                persisting them across processes, keyed by the sorted extracted facts, the
+                specification, the database and its files, and the solver arguments. Only answer sets
+                whose search completed, i.e. proven optimal, are stored
         
         Raises:
             ConfigError: If configuration files are invalid or missing required fields
         """
+        self.exporters = list(exporters or [])
+        if history_mode not in HISTORY_MODES:
+            raise ConfigError(f"Unknown history mode: {history_mode}, expected one of {HISTORY_MODES}")
+        self.history_mode = history_mode
+        self.stream_extraction = stream_extraction
+        self.extraction_cache = extraction_cache
+        self.solve_cache = solve_cache
         try:
-            super().__init__(config_file, behavior_file, llm, solver)
-            self._validate_config()
-            try:
-                db_file = self.load_file(self.config["database"])
-                self.database = db_file["database"]
-            except (KeyError, FileNotFoundError) as e:
-                logger.warning(f"Database configuration not found: {e}")
-                self.database = ""
-            except Exception as e:
-                logger.error(f"Error loading database: {e}")
-                self.database = ""
+            self.spec = spec or CompiledSpec.load(config_file, behavior_file)
+            self.config = self.spec.config
+            self.behavior = self.spec.behavior
+            self.llm = llm
+            self.solver = solver
+            self.database = self.spec.database
+            self.fact_parser = FactParser(self.spec.signatures)
+            self.database_slicer = DatabaseSlicer(self.database, self.spec.knowledge_base) if slice_database else None
+            # The database program may only include its files, whose stamp tells their version
+            self._database_digest = make_key(self.database, self.spec.database_stamp) if solve_cache is not None else None
+            self._database_signatures: Optional[Set[Tuple[str, int]]] = None
+            self._preload_conflicts: Optional[Set[Tuple[str, int]]] = None
+            self.database_preloaded = self._preloaded(self.solver)
+            if self.database_preloaded:
+                self.solver.load(self.database)
+            elif getattr(self.solver, "preloads_database", False) is True:
+                logger.warning(f"Not preloading the database, whose predicates {sorted(self._preload_conflicts)} may be derived or extracted")
         except Exception as e:
             raise ConfigError(f"Failed to initialize LLMASP: {e}")
 
-    def _validate_config(self) -> None:
-        """Validate configuration structure."""
-        required_config = {"preprocessing", "knowledge_base", "postprocessing"}
-        required_behavior = {
-            "preprocessing": {"context", "mapping", "init"},
-            "postprocessing": {"context", "mapping", "init", "summarize"}
-        }
-        
-        if not all(key in self.config for key in required_config):
-            raise ConfigError(f"Missing required config keys: {required_config - set(self.config.keys())}")
-            
-        for section, fields in required_behavior.items():
-            if section not in self.behavior:
-                raise ConfigError(f"Missing behavior section: {section}")
-            if not all(field in self.behavior[section] for field in fields):
-                raise ConfigError(f"Missing required fields in {section}: {fields - set(self.behavior[section].keys())}")
+    @classmethod
+    def from_spec(
+        cls, 
+        spec: CompiledSpec, 
+        llm: LLMHandler, 
+        solver: Any, 
+        exporters: Optional[List[Any]] = None,
+        **options: Any
+    ) -> "LLMASP":
+        """Create an LLMASP instance sharing a compiled specification; options are passed to __init__."""
+        return cls(None, None, llm, solver, exporters=exporters, spec=spec, **options)
+
+    def session(self, **options: Any) -> "Session":
+        """Start a multi-turn conversation; options are passed to Session."""
+        from .session import Session
+        return Session(self, **options)
 
     def __get_atom_name(self, atom: str) -> str:
         """Extract predicate name from atom."""
@@ -115,75 +249,28 @@ class LLMASP(AbstractLLMASP):
             List of query messages for the LLM
         """
         try:
-            queries = []
-            context = self.behavior["preprocessing"]["context"]
-            mapping = self.behavior["preprocessing"]["mapping"]
-            mapping = re.sub(r"\{input\}", user_input, mapping)
-            _, application_context = self.__get_property(self.config["preprocessing"], "_")
-            real_context = re.sub(r"\{context\}", application_context, context)
-
             if single_pass:
-                formats, instructions = zip(*[
-                    (key, value) 
-                    for query in self.config["preprocessing"]
-                    for key, value in query.items() 
-                    if key != "_"
-                ])
-                application_mapping = re.sub(r"\{instructions\}", "".join(instructions), mapping)
-                application_mapping = re.sub(r"\{atom\}", " ".join(formats), application_mapping)
-                queries.append(self._create_query_messages(real_context, application_mapping))
+                if self.spec.single_pass is None:
+                    raise LLMASPError("No predicate to extract in preprocessing")
+                templates = [self.spec.single_pass]
             else:
-                for query in self.config["preprocessing"]:
-                    key, value = list(query.items())[0]
-                    if key != "_":
-                        application_mapping = re.sub(r"\{instructions\}", value, mapping)
-                        application_mapping = re.sub(r"\{atom\}", key, application_mapping)
-                        queries.append(self._create_query_messages(real_context, application_mapping))
-            
-            return queries
+                templates = [template for _, template in self.spec.extraction]
+            return [self.spec.extraction_messages(template, user_input) for template in templates]
         except Exception as e:
             logger.error(f"Error creating queries: {e}")
             raise LLMASPError(f"Failed to create queries: {e}")
 
-    def _create_query_messages(self, context: str, mapping: str) -> List[Dict[str, str]]:
-        """Create a list of messages for a single query."""
-        return [
-            self.__prompt("system", self.behavior["preprocessing"]["init"]),
-            self.__prompt("system", context),
-            self.__prompt("user", mapping)
-        ]
-
-    def __get_property(self, properties: List[Dict[str, Any]], key: str, is_fact: bool = False) -> Tuple[str, Any]:
+    def _map(self, function: Callable[[Any], Any], items: Iterable[Any], max_workers: int = 1) -> List[Any]:
         """
-        Get property from configuration.
-        
-        Args:
-            properties: List of property dictionaries
-            key: Property key to find
-            is_fact: Whether to match fact names
-            
-        Returns:
-            Tuple of property key and value
-        
-        Raises:
-            LLMASPError: If property not found
+        Apply function to every item, concurrently if max_workers > 1.
+
+        Results are returned in the order of the items, whatever the completion order.
         """
-        try:
-            if is_fact:
-                property = next(
-                    p for p in properties 
-                    if self.__get_atom_name(next(iter(p))) == key
-                )
-            else:
-                property = next(p for p in properties if next(iter(p)) == key)
-            
-            property_key = next(iter(property))
-            property_value = list(property.values())[0]
-            return property_key, property_value
-        except StopIteration:
-            raise LLMASPError(f"Property not found: {key}")
-        except Exception as e:
-            raise LLMASPError(f"Error getting property: {e}")
+        items = list(items)
+        if max_workers <= 1 or len(items) <= 1:
+            return [function(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+            return list(executor.map(function, items))
 
     def load_file(self, config_file: str) -> Any:
         """
@@ -198,29 +285,132 @@ class LLMASP(AbstractLLMASP):
         Raises:
             ConfigError: If file cannot be loaded or parsed
         """
-        try:
-            with open(config_file, "r") as f:
-                return yaml.safe_load(f)
-        except FileNotFoundError:
-            raise ConfigError(f"Configuration file not found: {config_file}")
-        except YAMLError as e:
-            raise ConfigError(f"Invalid YAML in {config_file}: {e}")
-        except Exception as e:
-            raise ConfigError(f"Error loading {config_file}: {e}")
+        return load_yaml(config_file)
+
+    def _translate_fact_groups(
+        self, 
+        grouped_facts: Dict[str, List[str]], 
+        history: List[Any], 
+        use_history: bool = True,
+        max_workers: int = 1,
+        trace: Trace = NULL_TRACE,
+        deadline: Optional[Deadline] = None
+    ) -> List[str]:
+        """
+        Translate every group of facts.
+        
+        Args:
+            grouped_facts: Facts grouped by predicate name
+            history: Previous conversation history
+            use_history: Whether to use conversation history
+            max_workers: Maximum number of fact groups translated concurrently
+            trace: Trace recording the LLM calls
+            deadline: Optional deadline of the request
+            
+        Returns:
+            Translation of every group of facts
+        """
+        queries = self._history_messages(history, use_history)
+        
+        # Process each fact group
+        return self._map(
+            lambda group: self._process_fact_group(
+                group[0], 
+                group[1], 
+                queries, 
+                trace=trace,
+                deadline=deadline
+            ),
+            grouped_facts.items(),
+            max_workers
+        )
+
+    def _summary_messages(
+        self, 
+        facts: Union[List[str], AnswerSet], 
+        history: List[Any], 
+        use_history: bool = True,
+        max_workers: int = 1,
+        trace: Trace = NULL_TRACE
+    ) -> Tuple[Optional[List[Dict[str, str]]], Optional[str]]:
+        """
+        Translate every group of facts and build the messages of the final summarize query.
+
+        Returns:
+            Messages of the summarize query, or None and the response if the facts are only
+            rendered by templates
+        """
+        grouped_facts = self._group_facts(facts)
+        responses = self._translate_fact_groups(
+            grouped_facts, history, use_history=use_history, max_workers=max_workers, trace=trace
+        )
+        if self.spec.rendered_only(grouped_facts):
+            return None, "\n".join(responses)
+        return self._summary_query(responses), None
+
+    def _group_facts(self, facts: Union[List[str], AnswerSet]) -> Dict[str, List[str]]:
+        """Group facts by predicate name."""
+        if isinstance(facts, AnswerSet):
+            return facts.group_facts()
+        grouped = {}
+        for f in facts:
+            name = self.__get_atom_name(f)
+            grouped.setdefault(name, []).append(f)
+        return grouped
+
+    def _history_messages(self, history: List[Any], use_history: bool) -> List[Dict[str, str]]:
+        """Flatten the extraction history into the messages replayed during postprocessing."""
+        if not use_history:
+            return []
+        messages = [x for v in history for x in v]
+        if self.history_mode == "dedupe":
+            seen = set()
+            unique = []
+            for message in messages:
+                if message["role"] == "system":
+                    if message["content"] in seen:
+                        continue
+                    seen.add(message["content"])
+                unique.append(message)
+            return unique
+        if self.history_mode == "facts":
+            facts = [m["content"] for m in messages if m["role"] == "assistant" and m["content"]]
+            return [self.__prompt("system", HISTORY_FACTS_PROMPT + "\n".join(facts))] if facts else []
+        return messages
+
+    def _summary_query(self, responses: List[str]) -> List[Dict[str, str]]:
+        """Create the messages of the final summarize query."""
+        return self.spec.summary_messages(responses)
 
     def asp_to_natural(
         self, 
-        facts: List[str], 
+        facts: Union[List[str], AnswerSet], 
         history: List[Any], 
-        use_history: bool = True
+        use_history: bool = True,
+        max_workers: int = 1,
+        on_token: Optional[Callable[[str], None]] = None,
+        trace: Optional[Trace] = None,
+        deadline: Optional[Deadline] = None
     ) -> Tuple[str, Any]:
         """
         Convert ASP facts to natural language using the LLM.
         
+        Fact groups whose predicate has a template in the application are rendered without
+        the LLM; if the application sets summarize_templates to false and every group is
+        rendered, the rendered groups are the response.
+        
+        With a deadline, a fact group whose translation runs out of time is given as its
+        facts, and the summarize query is skipped when no time is left for it: the
+        translations of the fact groups are then returned as they are.
+        
         Args:
-            facts: List of ASP facts
+            facts: List of ASP facts, or the AnswerSet returned by a structured solve
             history: Previous conversation history
             use_history: Whether to use conversation history
+            max_workers: Maximum number of fact groups translated concurrently
+            on_token: Optional callback receiving the summary tokens as they are streamed
+            trace: Optional trace recording the postprocessing steps
+            deadline: Optional deadline of the request
             
         Returns:
             Tuple of (response text, metadata)
@@ -228,80 +418,416 @@ class LLMASP(AbstractLLMASP):
         Raises:
             LLMASPError: If conversion fails
         """
+        trace = trace or NULL_TRACE
         try:
-            def group_by_fact(facts: List[str]) -> Dict[str, List[str]]:
-                """Group facts by predicate name."""
-                grouped = {}
-                for f in facts:
-                    name = self.__get_atom_name(f)
-                    grouped.setdefault(name, []).append(f)
-                return grouped
-
-            grouped_facts = group_by_fact(facts)
-            responses = []
-            queries = [x for v in history for x in v] if use_history else []
-            
-            # Get context and prepare final response template
-            context = self.behavior["postprocessing"]["context"]
-            _, application_context = self.__get_property(self.config["postprocessing"], "_")
-            application_context = re.sub(r"\{context\}", application_context, context)
-            final_response = self.behavior["postprocessing"]["summarize"]
-            
-            # Process each fact group
-            for fact_name, fact_group in grouped_facts.items():
-                response = self._process_fact_group(
-                    fact_name, 
-                    fact_group, 
-                    queries, 
-                    application_context
+            with trace.span("postprocessing"):
+                grouped_facts = self._group_facts(facts)
+                responses = self._translate_fact_groups(
+                    grouped_facts, 
+                    history, 
+                    use_history=use_history, 
+                    max_workers=max_workers, 
+                    trace=trace,
+                    deadline=deadline
                 )
-                responses.append(response)
+                if self.spec.rendered_only(grouped_facts):
+                    return self._rendered_response(responses, on_token), None
+                messages = self._summary_query(responses)
+                chunks = []
+                try:
+                    timeout = self._stage_timeout(deadline, "summarize")
+                    if on_token is None:
+                        return self._call(messages, trace, "summarize", **timeout)
+                    
+                    with trace.span("llm_call", stage="summarize", stream=True) as span:
+                        response = self.llm.stream(messages, **timeout)
+                        for chunk in response:
+                            on_token(chunk)
+                            chunks.append(chunk)
+                        meta = self._stream_usage(response, span)
+                    return "".join(chunks), meta
+                except Exception as e:
+                    return self._degraded_summary(e, responses, chunks, on_token, trace, deadline), None
+            
+        except Exception as e:
+            raise self._postprocessing_error(e)
+
+    def stream_asp_to_natural(
+        self, 
+        facts: Union[List[str], AnswerSet], 
+        history: List[Any], 
+        use_history: bool = True,
+        max_workers: int = 1,
+        trace: Optional[Trace] = None
+    ) -> Iterator[str]:
+        """
+        Convert ASP facts to natural language, yielding the summary tokens as they arrive.
+        
+        Args:
+            facts: List of ASP facts, or the AnswerSet returned by a structured solve
+            history: Previous conversation history
+            use_history: Whether to use conversation history
+            max_workers: Maximum number of fact groups translated concurrently
+            trace: Optional trace recording the postprocessing steps
             
-            # Generate final response
-            final_response = re.sub(r"\{responses\}", "\n".join(responses), final_response)
-            return self.llm.call([
-                self.__prompt("system", application_context),
-                self.__prompt("user", final_response)
-            ])
+        Yields:
+            Chunks of the response text
             
+        Raises:
+            LLMASPError: If conversion fails
+        """
+        trace = trace or NULL_TRACE
+        try:
+            messages, rendered = self._summary_messages(
+                facts, 
+                history, 
+                use_history=use_history, 
+                max_workers=max_workers, 
+                trace=trace
+            )
+            if messages is None:
+                yield rendered
+                return
+            with trace.span("llm_call", stage="summarize", stream=True) as span:
+                response = self.llm.stream(messages)
+                yield from response
+                self._stream_usage(response, span)
         except Exception as e:
-            logger.error(f"Error converting ASP to natural language: {e}")
-            raise LLMASPError(f"Failed to convert ASP to natural language: {e}")
+            raise self._postprocessing_error(e)
+
+    @staticmethod
+    def _postprocessing_error(error: Exception) -> LLMASPError:
+        """Log a failed postprocessing and return the error raised for it."""
+        logger.error(f"Error converting ASP to natural language: {error}")
+        return LLMASPError(f"Failed to convert ASP to natural language: {error}")
+
+    @staticmethod
+    def _stream_usage(response: Any, span: Span) -> Any:
+        """Usage of an exhausted or closed stream, recorded in its span."""
+        meta = getattr(response, "usage", None)
+        span.record_usage(meta)
+        return meta
+
+    def _fact_group_query(
+        self, 
+        fact_name: str, 
+        facts: List[str], 
+        queries: List[Any]
+    ) -> List[Dict[str, str]]:
+        """Create the messages translating a group of related facts."""
+        messages = self.spec.fact_group_messages(fact_name, facts)
+        if self.history_mode == "full":
+            return [*queries, *messages]
+        return [*messages[:-1], *queries, messages[-1]]
 
     def _process_fact_group(
         self, 
         fact_name: str, 
         facts: List[str], 
         queries: List[Any], 
-        context: str
+        trace: Trace = NULL_TRACE,
+        deadline: Optional[Deadline] = None
     ) -> str:
-        """Process a group of related facts."""
-        fact_translation = self.behavior["postprocessing"]["mapping"]
-        f_key, f_value = self.__get_property(
-            self.config["postprocessing"], 
-            fact_name, 
-            is_fact=True
-        )
-        
-        # Apply translations
-        fact_translation = re.sub(r"\{atom\}", f_key, fact_translation)
-        fact_translation = re.sub(r"\{intructions\}", f_value, fact_translation)
-        fact_translation = re.sub(r"\{facts\}", "\n".join(facts), fact_translation)
-        
-        # Get response from LLM
-        response, _ = self.llm.call([
-            *queries,
-            self.__prompt("system", self.behavior["postprocessing"]["init"]),
-            self.__prompt("system", context),
-            self.__prompt("user", fact_translation),
-        ])
+        """
+        Process a group of related facts, rendered by its template if any, given as they are
+        if the deadline is exhausted.
+        """
+        rendered = self._render_fact_group(fact_name, facts, trace)
+        if rendered is not None:
+            return rendered
+        messages = self._fact_group_query(fact_name, facts, queries)
+        try:
+            timeout = self._stage_timeout(deadline, "postprocessing")
+            response, _ = self._call(messages, trace, "postprocessing", predicate=fact_name, **timeout)
+        except Exception as e:
+            return self._degraded_fact_group(e, fact_name, facts, trace, deadline)
         return response
 
+    def _degraded_fact_group(
+        self, 
+        error: Exception, 
+        fact_name: str, 
+        facts: List[str], 
+        trace: Trace, 
+        deadline: Optional[Deadline]
+    ) -> str:
+        """Response of a fact group whose translation failed: its facts if it ran out of time, else error is raised."""
+        if deadline is None or not _timed_out(error):
+            raise error
+        return self._degrade(trace, "postprocessing", "\n".join(facts), predicate=fact_name)
+
+    def _render_fact_group(self, fact_name: str, facts: List[str], trace: Trace = NULL_TRACE) -> Optional[str]:
+        """Render a group of facts with the template of its predicate, None if it has none."""
+        if fact_name not in self.spec.fact_renderers:
+            return None
+        with trace.span("template", predicate=fact_name):
+            return self.spec.render_facts(fact_name, facts)
+
+    @staticmethod
+    def _rendered_response(responses: List[str], on_token: Optional[Callable[[str], None]]) -> str:
+        """Response made of the fact groups rendered by templates, sent to on_token if given."""
+        text = "\n".join(responses)
+        if on_token is not None:
+            on_token(text)
+        return text
+
+    @staticmethod
+    def _stage_timeout(deadline: Optional[Deadline], stage: str) -> Dict[str, float]:
+        """
+        Keyword arguments giving the LLM call of a stage the time the deadline leaves it.
+
+        Raises:
+            DeadlineExceeded: If no time is left for the stage
+        """
+        if deadline is None:
+            return {}
+        budget = deadline.budget(stage)
+        if budget <= 0:
+            raise DeadlineExceeded(f"No time left for {stage}")
+        return {"timeout": budget}
+
+    @staticmethod
+    def _degrade(trace: Trace, stage: str, fallback: str, **attributes: Any) -> str:
+        """Record that a stage ran out of time and return its fallback output."""
+        logger.warning(f"Deadline exhausted during {stage}, degrading the response")
+        with trace.span("degraded", stage=stage, **attributes):
+            pass
+        return fallback
+
+    def _degraded_summary(
+        self, 
+        error: Exception, 
+        responses: List[str], 
+        chunks: List[str], 
+        on_token: Optional[Callable[[str], None]], 
+        trace: Trace, 
+        deadline: Optional[Deadline]
+    ) -> str:
+        """
+        Response of a failed summarize query: if it ran out of time, the chunks streamed so far,
+        or the translations; else error is raised.
+        """
+        if deadline is None or not _timed_out(error):
+            raise error
+        if chunks:
+            return self._degrade(trace, "summarize", "".join(chunks))
+        text = self._degrade(trace, "summarize", "\n".join(responses))
+        if on_token is not None:
+            on_token(text)
+        return text
+
+    def _call(
+        self, 
+        messages: List[Dict[str, str]], 
+        trace: Trace, 
+        stage: str, 
+        predicate: Optional[str] = None, 
+        **kwargs: Any
+    ) -> Tuple[str, Any]:
+        """Call the LLM, recording the call and its token usage in trace."""
+        with trace.span("llm_call", **self._call_attributes(stage, predicate)) as span:
+            completion, meta = self.llm.call(messages, **kwargs)
+            span.record_usage(meta)
+        return completion, meta
+
+    @staticmethod
+    def _call_attributes(stage: str, predicate: Optional[str]) -> Dict[str, str]:
+        """Attributes of the span of an LLM call."""
+        return {"stage": stage} if predicate is None else {"stage": stage, "predicate": predicate}
+
+    def _extract_facts(
+        self, 
+        query: List[Dict[str, str]], 
+        max_tokens: Optional[int] = None, 
+        trace: Trace = NULL_TRACE,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Symbol], Any]:
+        """
+        Send a single extraction query to the LLM and collect the facts in its answer.
+
+        The facts are appended to the query as an assistant message.
+        """
+        timeout = self._stage_timeout(deadline, "extraction")
+        if self.stream_extraction:
+            return self._stream_facts(query, max_tokens, trace, **timeout)
+        completion, meta = self._call(query, trace, "extraction", max_tokens=max_tokens, **timeout)
+        with trace.span("fact_extraction") as span:
+            return self._collect_facts(query, completion, span), meta
+
+    def _stream_facts(
+        self, 
+        query: List[Dict[str, str]], 
+        max_tokens: Optional[int] = None, 
+        trace: Trace = NULL_TRACE,
+        **kwargs: Any
+    ) -> Tuple[List[Symbol], Any]:
+        """
+        Stream an extraction answer, collecting its facts as they arrive and closing the
+        stream once the [/OUTPUT] marker is received.
+        """
+        parser = FactStream(self.fact_parser)
+        with trace.span("llm_call", stage="extraction", stream=True) as span:
+            response = self.llm.stream(query, max_tokens=max_tokens, **kwargs)
+            try:
+                for delta in response:
+                    parser.feed(delta)
+                    if parser.done:
+                        break
+            finally:
+                if hasattr(response, "close"):
+                    response.close()
+            return self._streamed_facts(query, parser, response, span)
+
+    def _streamed_facts(self, query: List[Dict[str, str]], parser: FactStream, response: Any, span: Span) -> Tuple[List[Symbol], Any]:
+        """Facts of a streamed extraction answer, appended to the query, and the usage of the stream."""
+        meta = self._stream_usage(response, span)
+        span.attributes["early_stop"] = parser.done
+        parser.close()
+        self._report_dropped(parser.diagnostics, span)
+        return self._append_facts(query, parser.symbols), meta
+
+    def _collect_facts(self, query: List[Dict[str, str]], completion: str, span: Optional[Span] = None) -> List[Symbol]:
+        """Parse the facts of an extraction answer and append them to the query."""
+        parsed = self.fact_parser.parse(completion)
+        self._report_dropped(parsed.diagnostics, span)
+        return self._append_facts(query, parsed.symbols)
+
+    @staticmethod
+    def _report_dropped(diagnostics: List[str], span: Optional[Span] = None) -> None:
+        """Log the atoms dropped from an extraction answer and count them in span."""
+        for diagnostic in diagnostics:
+            logger.warning(f"Dropped extracted atom: {diagnostic}")
+        if diagnostics and span is not None:
+            span.attributes["dropped"] = len(diagnostics)
+
+    def _append_facts(self, query: List[Dict[str, str]], facts: List[Symbol]) -> List[Symbol]:
+        """Append the extracted facts to the query as an assistant message."""
+        query.append(self.__prompt("assistant", "\n".join(f"{fact}." for fact in facts)))
+        return facts
+
+    def _extraction_queries(
+        self, 
+        user_input: str, 
+        single_pass: bool, 
+        max_tokens: Optional[int], 
+        trace: Trace
+    ) -> Tuple[List[List[Dict[str, str]]], Tuple[Any, ...], Optional[List[Symbol]]]:
+        """
+        Create the extraction queries of user_input.
+
+        Returns:
+            Tuple of (queries, scope in the extraction cache, cached facts or None)
+        """
+        with trace.span("prompt_construction"):
+            queries = self.__create_queries(user_input, single_pass=single_pass)
+        scope = self._extraction_scope(single_pass, max_tokens)
+        return queries, scope, self._cached_facts(scope, user_input, queries, trace)
+
+    def _extraction_result(
+        self, 
+        scope: Tuple[Any, ...], 
+        user_input: str, 
+        queries: List[List[Dict[str, str]]], 
+        results: List[Tuple[List[Symbol], Any]]
+    ) -> Tuple[List[Symbol], List[Any], Any]:
+        """Store the facts extracted by the queries and return them, the queries and the metadata of the last one."""
+        meta = results[-1][1] if results else None
+        return self._store_facts(scope, user_input, results), queries, meta
+
+    @staticmethod
+    def _extraction_error(error: Exception) -> LLMASPError:
+        """Log a failed extraction and return the error raised for it."""
+        logger.error(f"Error converting natural language to ASP: {error}")
+        return LLMASPError(f"Failed to convert natural language to ASP: {error}")
+
+    def _extraction_scope(self, single_pass: bool, max_tokens: Optional[int]) -> Tuple[Any, ...]:
+        """
+        Scope of the extraction cache entries: the specifications, the extraction options and
+        the models answering the LLM calls, e.g. those of every endpoint of a router.
+        """
+        endpoints = getattr(self.llm, "endpoints", None)
+        handlers = [endpoint.handler for endpoint in endpoints] if endpoints is not None else [self.llm]
+        models = tuple(sorted({str(getattr(handler, "model", None)) for handler in handlers}))
+        return (self.spec.digest, single_pass, max_tokens, models)
+
+    def _cached_facts(
+        self, 
+        scope: Tuple[Any, ...], 
+        user_input: str, 
+        queries: List[List[Dict[str, str]]], 
+        trace: Trace = NULL_TRACE
+    ) -> Optional[List[Symbol]]:
+        """
+        Facts of the extraction cache for user_input, appended to its queries, None if not cached.
+        """
+        if self.extraction_cache is None:
+            return None
+        with trace.span("extraction_cache") as span:
+            match, cached = self.extraction_cache.lookup(scope, user_input)
+            span.attributes["match"] = match
+        if cached is None or len(cached) != len(queries):
+            return None
+        created_facts = []
+        for query, facts in zip(queries, cached):
+            created_facts.extend(self._append_facts(query, [parse_term(fact) for fact in facts]))
+        return created_facts
+
+    def _store_facts(self, scope: Tuple[Any, ...], user_input: str, results: List[Tuple[List[Symbol], Any]]) -> List[Symbol]:
+        """
+        Store the facts extracted by every query in the extraction cache, and return them all without duplicates.
+
+        Facts are cached as text: clingo symbols are only valid in the process that created them.
+        """
+        if self.extraction_cache is not None:
+            self.extraction_cache.store(scope, user_input, tuple(tuple(str(fact) for fact in facts) for facts, _ in results))
+        return list(dict.fromkeys(fact for facts, _ in results for fact in facts))
+
+    def _database_predicates(self, signatures: Iterable[Tuple[str, int]]) -> Set[Tuple[str, int]]:
+        """
+        Signatures among the given ones that the database defines.
+
+        The database is grounded once for its signatures, since its text may only include
+        its fact files.
+        """
+        if self._database_signatures is None:
+            context = getattr(self.solver, "context", None) or Context
+            self._database_signatures = grounded_predicates(self.database, context)
+        return set(signatures) & self._database_signatures
+
+    def _preloaded(self, solver: Any = None) -> bool:
+        """
+        Whether solver, by default the solver of the instance, holds the database: solvers that
+        preload it do, unless the knowledge base or the extracted facts may define its predicates.
+        """
+        if getattr(solver or self.solver, "preloads_database", False) is not True:
+            return False
+        if self._preload_conflicts is None:
+            # Atoms of a preloaded database cannot be defined again by later programs
+            self._preload_conflicts = self._database_predicates(
+                defined_predicates(self.spec.knowledge_base) | set(self.spec.signatures or ())
+            )
+        return not self._preload_conflicts
+
+    def _asp_input(self, created_facts: str, solver: Any = None, database: Optional[str] = None) -> str:
+        """
+        Create the ASP program solved for the given extracted facts.
+
+        The database, by default the whole database, is omitted if the solver, by default
+        the solver of the instance, preloads it, e.g. IncrementalSolver.
+        """
+        if self._preloaded(solver):
+            return f"{created_facts}\n{self.config['knowledge_base']}"
+        database = self.database if database is None else database
+        return f"{created_facts}\n{database}\n{self.config['knowledge_base']}"
+
     def natural_to_asp(
         self, 
         user_input: str, 
         single_pass: bool = False, 
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        max_workers: int = 1,
+        trace: Optional[Trace] = None,
+        deadline: Optional[Deadline] = None
     ) -> Tuple[str, str, List[Any], Any]:
         """
         Convert natural language to ASP facts using the LLM.
@@ -310,6 +836,9 @@ class LLMASP(AbstractLLMASP):
             user_input: Natural language input
             single_pass: Whether to process all mappings in one query
             max_tokens: Optional maximum tokens for LLM response
+            max_workers: Maximum number of extraction queries sent concurrently
+            trace: Optional trace recording the extraction steps
+            deadline: Optional deadline of the request, bounding every extraction query
             
         Returns:
             Tuple of (created facts, ASP input, query history, metadata)
@@ -317,33 +846,47 @@ class LLMASP(AbstractLLMASP):
         Raises:
             LLMASPError: If conversion fails
         """
+        symbols, queries, meta = self._natural_to_asp(
+            user_input, single_pass, max_tokens, max_workers, trace or NULL_TRACE, deadline
+        )
+        created_facts = _facts_text(symbols)
+        return created_facts, self._asp_input(created_facts), queries, meta
+
+    def _natural_to_asp(
+        self, 
+        user_input: str, 
+        single_pass: bool = False, 
+        max_tokens: Optional[int] = None,
+        max_workers: int = 1,
+        trace: Trace = NULL_TRACE,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Symbol], List[Any], Any]:
+        """
+        Extract the facts of user_input as clingo symbols, see natural_to_asp.
+
+        Returns:
+            Tuple of (extracted atoms, query history, metadata)
+        """
         try:
-            queries = self.__create_queries(user_input, single_pass=single_pass)
-            created_facts = []
-            meta = None
-            
-            for query in queries:
-                facts, meta = self.llm.call(query, max_tokens=max_tokens)
-                # Extract predicate expressions
-                facts = re.findall(r"\b[a-zA-Z][\w_]*\([^)]*\)", facts)
-                facts = [f"{f}." for f in facts]
-                created_facts.extend(facts)
-                query.append(self.__prompt("assistant", "\n".join(facts)))
-            
-            created_facts_str = "\n".join(created_facts)
-            asp_input = f"{created_facts_str}\n{self.database}\n{self.config['knowledge_base']}"
-            return created_facts_str, asp_input, queries, meta
+            queries, scope, symbols = self._extraction_queries(user_input, single_pass, max_tokens, trace)
+            if symbols is not None:
+                return symbols, queries, None
+            results = self._map(lambda query: self._extract_facts(query, max_tokens, trace, deadline), queries, max_workers)
+            return self._extraction_result(scope, user_input, queries, results)
             
         except Exception as e:
-            logger.error(f"Error converting natural language to ASP: {e}")
-            raise LLMASPError(f"Failed to convert natural language to ASP: {e}")
+            raise self._extraction_error(e)
 
     def run(
         self, 
         user_input: str, 
         single_pass: bool = False, 
         use_history: bool = False, 
-        verbose: int = 0
+        verbose: int = 0,
+        max_workers: int = 1,
+        on_token: Optional[Callable[[str], None]] = None,
+        trace: Optional[Trace] = None,
+        deadline: Union[None, float, Deadline] = None
     ) -> Optional[str]:
         """
         Run the complete LLMASP pipeline.
@@ -353,6 +896,13 @@ class LLMASP(AbstractLLMASP):
             single_pass: Whether to process all mappings in one query
             use_history: Whether to use conversation history
             verbose: Verbosity level (0 or 1)
+            max_workers: Maximum number of LLM queries sent concurrently
+            on_token: Optional callback receiving the response tokens as they are streamed
+            trace: Optional trace filled with the timings of the run; it is also handed to the exporters
+            deadline: Optional end-to-end time budget of the run, in seconds or as a Deadline
+                splitting it across the stages. Every LLM call gets the time left to its stage
+                and the solver the rest, returning its best model so far when interrupted.
+                Postprocessing degrades instead of failing when the budget is exhausted
             
         Returns:
             Natural language response or None if error occurs
@@ -360,27 +910,476 @@ class LLMASP(AbstractLLMASP):
         Raises:
             LLMASPError: If pipeline execution fails
         """
+        trace = trace or Trace()
+        cache_hits = self._cache_hits()
+        deadline = Deadline.of(deadline)
         try:
             logs = []
             logs.append(f"input: {user_input}")
             
             # Convert to ASP
-            created_facts, asp_input, history, _ = self.natural_to_asp(
+            symbols, history, _ = self._natural_to_asp(
                 user_input, 
-                single_pass=single_pass
+                single_pass=single_pass,
+                max_workers=max_workers,
+                trace=trace,
+                deadline=deadline
             )
+            created_facts = _facts_text(symbols)
             logs.append(f"extracted facts: {created_facts}")
             print(f"extracted facts: {created_facts}")
             
             # Solve ASP program
-            result, interrupted, satisfiable = self.solver.solve(asp_input)
+            result, interrupted, satisfiable = self._solve(symbols, trace, deadline)
+            if not result:
+                logs.extend(["answer set: not found", "out: not found"])
+                return None if not verbose else ""
+            
+            # Convert back to natural language
+            logs.append(f"answer set: {result.to_facts()}")
+            response, _ = self.asp_to_natural(
+                result, 
+                history, 
+                use_history=use_history, 
+                max_workers=max_workers, 
+                on_token=on_token,
+                trace=trace,
+                deadline=deadline
+            )
+            logs.append(f"output: {response}")
+            
+            if verbose == 1:
+                print("\n\n".join(logs))
+                
+            return response
+            
+        except Exception as e:
+            logger.error(f"Pipeline execution failed: {e}")
+            trace.attributes["error"] = str(e)
+            if verbose == 1:
+                print(f"Error: {e}")
+            return None
+        finally:
+            self._finish_trace(trace, cache_hits, deadline)
+
+    def _cache_hits(self) -> Optional[int]:
+        """Current number of hits of the LLM response cache, if any."""
+        cache = getattr(self.llm, "cache", None)
+        return cache.hits if isinstance(cache, Cache) else None
+
+    def _finish_trace(self, trace: Trace, cache_hits: Optional[int], deadline: Optional[Deadline] = None) -> None:
+        """Record the cache hits and the deadline of a run and hand its trace to the exporters."""
+        if cache_hits is not None:
+            trace.attributes["cache_hits"] = self._cache_hits() - cache_hits
+        if deadline is not None:
+            trace.attributes["deadline"] = deadline.seconds
+            trace.attributes["degraded"] = sorted({s.attributes["stage"] for s in trace.spans if s.name == "degraded"})
+        export(trace, self.exporters)
+
+    def _solve(
+        self, 
+        facts: List[Symbol], 
+        trace: Trace = NULL_TRACE, 
+        deadline: Optional[Deadline] = None, 
+        solver: Any = None
+    ) -> Tuple[AnswerSet, Any, Any]:
+        """
+        Solve the ASP program of the facts extracted from a request, returning a structured answer set.
+
+        The facts are given to the solver, by default the solver of the instance, as clingo
+        symbols if it accepts them, e.g. Solver, otherwise as the text of the program.
+
+        Answer sets found in the solve cache are returned without solving; those whose
+        search completed are stored in it.
+
+        With database slicing, only the database facts that may matter to the extracted facts
+        are given to a solver that does not preload the database.
+
+        The clingo arguments and the timeout of the solver section of the application, if
+        any, override those of the solver. With a deadline the solver gets the time left to
+        solving, or all the time left if extraction used the share of solving, at most the
+        timeout of the solver section.
+
+        Raises:
+            DeadlineExceeded: If no time is left
+        """
+        solver = solver or self.solver
+        key = self._solve_key(facts, solver)
+        if key is not None:
+            with trace.span("solve_cache") as span:
+                cached = self.solve_cache.get(key)
+                span.attributes["hit"] = cached is not None
+            if cached is not None:
+                atoms, satisfiable = cached
+                return AnswerSet.of_symbols(parse_term(atom) for atom in atoms), False, satisfiable
+        result, interrupted, satisfiable = self._solve_program(facts, trace, deadline, solver)
+        if key is not None and not interrupted:
+            # As text: clingo symbols are only valid in the process that created them
+            self.solve_cache.set(key, ([str(symbol) for symbol in result], satisfiable))
+        return result, interrupted, satisfiable
+
+    def _solve_key(self, facts: List[Symbol], solver: Any) -> Optional[str]:
+        """
+        Key of the solve cache for the given facts, None without a solve cache.
+
+        The facts held by the solver, e.g. those of a Session, are part of the program.
+        """
+        if self.solve_cache is None:
+            return None
+        held = getattr(solver, "facts", None) or []
+        settings = self.spec.solver_settings
+        return make_key(
+            "solve",
+            sorted({str(symbol) for symbol in [*facts, *held]}),
+            self.spec.digest,
+            self._database_digest,
+            type(solver).__name__,
+            settings.clingo_arguments() if settings is not None else getattr(solver, "arguments", None)
+        )
+
+    def _solve_program(self, facts: List[Symbol], trace: Trace, deadline: Optional[Deadline], solver: Any) -> Tuple[AnswerSet, Any, Any]:
+        """Solve the program of the facts with solver, see _solve."""
+        database, fallback = None, {}
+        if self._preloaded(solver) and self.spec.signatures is None:
+            held = getattr(solver, "facts", None) or []
+            conflicts = self._database_predicates({(f.name, len(f.arguments)) for f in [*facts, *held]})
+            if conflicts:
+                # Extracted facts may define atoms of the preloaded database
+                logger.warning(f"Solving without the preloaded database, extracted facts of {sorted(conflicts)}")
+                fallback = {option: getattr(solver, option) for option in ("arguments", "context") if hasattr(solver, option)}
+                solver, facts = Solver(), [*facts, *held]
+        if self.database_slicer is not None and not self._preloaded(solver):
+            with trace.span("slicing") as span:
+                database = self.database_slicer.slice(facts)
+                if database is not None:
+                    span.attributes.update(kept=len(database), database_facts=self.database_slicer.size)
+        if getattr(solver, "accepts_symbols", False) is True:
+            if database is None:
+                asp_input, options = self._asp_input("", solver), {"facts": facts}
+            else:
+                asp_input, options = self._asp_input("", solver, database=""), {"facts": [*facts, *database]}
+        else:
+            text = None if database is None else _facts_text(database)
+            asp_input, options = self._asp_input(_facts_text(facts), solver, database=text), {}
+        options.update(fallback)
+        settings = self.spec.solver_settings
+        if settings is not None:
+            options["arguments"] = settings.clingo_arguments()
+            if settings.timeout is not None:
+                options["timeout"] = settings.timeout
+        if deadline is not None:
+            # The time reserved for the stages after solving is never used by it
+            budget = self._stage_timeout(deadline, "solving")["timeout"]
+            options["timeout"] = min(budget, options.get("timeout", float("inf")))
+        return solver.solve(asp_input, structured=True, trace=trace, **options)
+
+    def run_batch(
+        self, 
+        inputs: Iterable[str], 
+        single_pass: bool = False, 
+        use_history: bool = False, 
+        llm_workers: int = 4,
+        solver_workers: int = 1,
+        postprocessing_workers: Optional[int] = None,
+        max_workers: int = 1,
+        deadline: Union[None, float, List[Union[None, float, Deadline]]] = None
+    ) -> List[BatchResult]:
+        """
+        Run the pipeline over many inputs, overlapping the stages of different inputs.
+        
+        Extraction, solving and postprocessing have separate concurrency limits, so that
+        LLM calls of some inputs proceed while the programs of others are being solved.
+        A failing input is reported in its result and does not abort the batch.
+        
+        Args:
+            inputs: Natural language inputs
+            single_pass: Whether to process all mappings in one query
+            use_history: Whether to use conversation history
+            llm_workers: Maximum number of inputs in the extraction stage
+            solver_workers: Maximum number of programs solved at the same time
+            postprocessing_workers: Maximum number of inputs in the postprocessing stage,
+                by default llm_workers
+            max_workers: Maximum number of LLM queries sent concurrently for a single input
+            deadline: Optional time budget of every input, in seconds, counted from the
+                start of its extraction (see run), or a list with the budget or Deadline of
+                every input, e.g. started when the input was received
+            
+        Returns:
+            One result per input, in input order
+
+        Raises:
+            ValueError: If deadline is a list whose length differs from the number of inputs
+        """
+        postprocessing_workers = postprocessing_workers or llm_workers
+        extraction = threading.BoundedSemaphore(llm_workers)
+        solving = threading.BoundedSemaphore(solver_workers)
+        postprocessing = threading.BoundedSemaphore(postprocessing_workers)
+
+        inputs = list(inputs)
+        deadlines = list(deadline) if isinstance(deadline, list) else [deadline] * len(inputs)
+        if len(deadlines) != len(inputs):
+            raise ValueError(f"Got {len(deadlines)} deadlines for {len(inputs)} inputs")
+
+        def process(user_input: str, budget: Union[None, float, Deadline]) -> BatchResult:
+            result = BatchResult(input=user_input)
+            trace = Trace()
+            item_deadline = None
+            try:
+                with extraction:
+                    item_deadline = Deadline.of(budget)
+                    symbols, history, _ = self._natural_to_asp(
+                        user_input, 
+                        single_pass=single_pass,
+                        max_workers=max_workers,
+                        trace=trace,
+                        deadline=item_deadline
+                    )
+                    result.facts = _facts_text(symbols)
+                with solving:
+                    answer_set, _, _ = self._solve(symbols, trace, item_deadline)
+                if answer_set:
+                    with postprocessing:
+                        result.response, _ = self.asp_to_natural(
+                            answer_set, 
+                            history, 
+                            use_history=use_history, 
+                            max_workers=max_workers,
+                            trace=trace,
+                            deadline=item_deadline
+                        )
+            except Exception as e:
+                logger.error(f"Batch item failed: {e}")
+                result.error = str(e)
+                trace.attributes["error"] = str(e)
+            self._finish_trace(trace, None, item_deadline)
+            return result
+
+        in_flight = llm_workers + solver_workers + postprocessing_workers
+        with ThreadPoolExecutor(max_workers=in_flight) as executor:
+            return list(executor.map(process, inputs, deadlines))
+
+    async def _amap(self, function: Callable[[Any], Awaitable[Any]], items: Iterable[Any], max_workers: int = 1) -> List[Any]:
+        """
+        Await function on every item, with at most max_workers pending at the same time.
+
+        Results are returned in the order of the items, whatever the completion order.
+        """
+        semaphore = asyncio.Semaphore(max(1, max_workers))
+
+        async def bounded(item):
+            async with semaphore:
+                return await function(item)
+
+        return list(await asyncio.gather(*(bounded(item) for item in items)))
+
+    async def _acall(
+        self, 
+        messages: List[Dict[str, str]], 
+        trace: Trace, 
+        stage: str, 
+        predicate: Optional[str] = None, 
+        **kwargs: Any
+    ) -> Tuple[str, Any]:
+        """Async version of _call."""
+        with trace.span("llm_call", **self._call_attributes(stage, predicate)) as span:
+            completion, meta = await self.llm.call(messages, **kwargs)
+            span.record_usage(meta)
+        return completion, meta
+
+    async def _aextract_facts(
+        self, 
+        query: List[Dict[str, str]], 
+        max_tokens: Optional[int] = None, 
+        trace: Trace = NULL_TRACE,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Symbol], Any]:
+        """Async version of _extract_facts."""
+        timeout = self._stage_timeout(deadline, "extraction")
+        if self.stream_extraction:
+            parser = FactStream(self.fact_parser)
+            with trace.span("llm_call", stage="extraction", stream=True) as span:
+                response = self.llm.stream(query, max_tokens=max_tokens, **timeout)
+                try:
+                    async for delta in response:
+                        parser.feed(delta)
+                        if parser.done:
+                            break
+                finally:
+                    if hasattr(response, "aclose"):
+                        await response.aclose()
+                return self._streamed_facts(query, parser, response, span)
+        completion, meta = await self._acall(query, trace, "extraction", max_tokens=max_tokens, **timeout)
+        with trace.span("fact_extraction") as span:
+            return self._collect_facts(query, completion, span), meta
+
+    async def anatural_to_asp(
+        self, 
+        user_input: str, 
+        single_pass: bool = False, 
+        max_tokens: Optional[int] = None,
+        max_workers: int = 1,
+        trace: Optional[Trace] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[str, str, List[Any], Any]:
+        """
+        Async version of natural_to_asp, requiring an async LLM handler such as AsyncLLMHandler.
+        
+        Raises:
+            LLMASPError: If conversion fails
+        """
+        symbols, queries, meta = await self._anatural_to_asp(
+            user_input, single_pass, max_tokens, max_workers, trace or NULL_TRACE, deadline
+        )
+        created_facts = _facts_text(symbols)
+        return created_facts, self._asp_input(created_facts), queries, meta
+
+    async def _anatural_to_asp(
+        self, 
+        user_input: str, 
+        single_pass: bool = False, 
+        max_tokens: Optional[int] = None,
+        max_workers: int = 1,
+        trace: Trace = NULL_TRACE,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Symbol], List[Any], Any]:
+        """Async version of _natural_to_asp."""
+        try:
+            queries, scope, symbols = self._extraction_queries(user_input, single_pass, max_tokens, trace)
+            if symbols is not None:
+                return symbols, queries, None
+            results = await self._amap(
+                lambda query: self._aextract_facts(query, max_tokens, trace, deadline), 
+                queries, 
+                max_workers
+            )
+            return self._extraction_result(scope, user_input, queries, results)
+            
+        except Exception as e:
+            raise self._extraction_error(e)
+
+    async def aasp_to_natural(
+        self, 
+        facts: Union[List[str], AnswerSet], 
+        history: List[Any], 
+        use_history: bool = True,
+        max_workers: int = 1,
+        on_token: Optional[Callable[[str], None]] = None,
+        trace: Optional[Trace] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[str, Any]:
+        """
+        Async version of asp_to_natural, requiring an async LLM handler such as AsyncLLMHandler.
+        
+        Raises:
+            LLMASPError: If conversion fails
+        """
+        trace = trace or NULL_TRACE
+        try:
+            with trace.span("postprocessing"):
+                queries = self._history_messages(history, use_history)
+                grouped_facts = self._group_facts(facts)
+                responses = await self._amap(
+                    lambda group: self._aprocess_fact_group(group[0], group[1], queries, trace, deadline),
+                    grouped_facts.items(),
+                    max_workers
+                )
+                if self.spec.rendered_only(grouped_facts):
+                    return self._rendered_response(responses, on_token), None
+                messages = self._summary_query(responses)
+                chunks = []
+                try:
+                    timeout = self._stage_timeout(deadline, "summarize")
+                    if on_token is None:
+                        return await self._acall(messages, trace, "summarize", **timeout)
+                    
+                    with trace.span("llm_call", stage="summarize", stream=True) as span:
+                        response = self.llm.stream(messages, **timeout)
+                        async for chunk in response:
+                            on_token(chunk)
+                            chunks.append(chunk)
+                        meta = self._stream_usage(response, span)
+                    return "".join(chunks), meta
+                except Exception as e:
+                    return self._degraded_summary(e, responses, chunks, on_token, trace, deadline), None
+            
+        except Exception as e:
+            raise self._postprocessing_error(e)
+
+    async def _aprocess_fact_group(
+        self, 
+        fact_name: str, 
+        facts: List[str], 
+        queries: List[Any], 
+        trace: Trace = NULL_TRACE,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """Async version of _process_fact_group."""
+        rendered = self._render_fact_group(fact_name, facts, trace)
+        if rendered is not None:
+            return rendered
+        messages = self._fact_group_query(fact_name, facts, queries)
+        try:
+            timeout = self._stage_timeout(deadline, "postprocessing")
+            response, _ = await self._acall(messages, trace, "postprocessing", predicate=fact_name, **timeout)
+        except Exception as e:
+            return self._degraded_fact_group(e, fact_name, facts, trace, deadline)
+        return response
+
+    async def arun(
+        self, 
+        user_input: str, 
+        single_pass: bool = False, 
+        use_history: bool = False, 
+        verbose: int = 0,
+        max_workers: int = 1,
+        on_token: Optional[Callable[[str], None]] = None,
+        trace: Optional[Trace] = None,
+        deadline: Union[None, float, Deadline] = None
+    ) -> Optional[str]:
+        """
+        Async version of run, requiring an async LLM handler such as AsyncLLMHandler.
+
+        The ASP program is solved in the default executor of the running loop, so that
+        solving does not block other conversations served by the same loop.
+        
+        Returns:
+            Natural language response or None if error occurs
+        """
+        trace = trace or Trace()
+        cache_hits = self._cache_hits()
+        deadline = Deadline.of(deadline)
+        try:
+            logs = []
+            logs.append(f"input: {user_input}")
+            
+            # Convert to ASP
+            symbols, history, _ = await self._anatural_to_asp(
+                user_input, 
+                single_pass=single_pass,
+                max_workers=max_workers,
+                trace=trace,
+                deadline=deadline
+            )
+            logs.append(f"extracted facts: {_facts_text(symbols)}")
+            
+            # Solve ASP program
+            loop = asyncio.get_running_loop()
+            result, interrupted, satisfiable = await loop.run_in_executor(None, self._solve, symbols, trace, deadline)
             if not result:
                 logs.extend(["answer set: not found", "out: not found"])
                 return None if not verbose else ""
             
             # Convert back to natural language
-            logs.append(f"answer set: {result}")
-            response, _ = self.asp_to_natural(result, history, use_history=use_history)
+            logs.append(f"answer set: {result.to_facts()}")
+            response, _ = await self.aasp_to_natural(
+                result, 
+                history, 
+                use_history=use_history, 
+                max_workers=max_workers, 
+                on_token=on_token,
+                trace=trace,
+                deadline=deadline
+            )
             logs.append(f"output: {response}")
             
             if verbose == 1:
@@ -390,6 +1389,9 @@ class LLMASP(AbstractLLMASP):
             
         except Exception as e:
             logger.error(f"Pipeline execution failed: {e}")
+            trace.attributes["error"] = str(e)
             if verbose == 1:
                 print(f"Error: {e}")
             return None
+        finally:
+            self._finish_trace(trace, cache_hits, deadline)
@@ -0,0 +1,328 @@
+"""
+Routing of LLM requests over several OpenAI-compatible endpoints.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .llm_handler import LLMHandler
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("least_outstanding", "latency")
+
+
+class RouterError(Exception):
+    """Raised when no endpoint of a router is available."""
+    pass
+
+
+class _Endpoint:
+    """An endpoint of the router, with its load, its latencies and its circuit breaker."""
+
+    def __init__(self, handler: LLMHandler, window: int):
+        self.handler = handler
+        self.outstanding = 0
+        self.latencies: deque = deque(maxlen=window)
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+
+    @property
+    def name(self) -> str:
+        return str(getattr(self.handler.client, "base_url", id(self.handler)))
+
+    def latency(self) -> float:
+        """Mean of the recent latencies, 0 if none was observed."""
+        return sum(self.latencies) / len(self.latencies) if self.latencies else 0.0
+
+    def quantile(self, q: float) -> float:
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RouterLLMHandler:
+    """
+    LLM handler balancing requests over several endpoints, a drop-in for LLMHandler.
+
+    Every request goes to the available endpoint with the least outstanding requests, or the
+    lowest expected latency. If it does not answer within the hedge delay (by default the p95
+    of its latencies), a duplicate request is sent to another endpoint and the first answer
+    is returned; the requests that lost are cancelled if they have not started yet, and their
+    late answers are discarded. A failed request is retried on the other endpoints.
+
+    Each endpoint has a circuit breaker: after failure_threshold consecutive failures it is
+    ejected for reset_timeout seconds, then a single trial request decides whether it is
+    readmitted; requests sent before the ejection do not close the circuit.
+
+    Args:
+        handlers: Handlers of the endpoints, typically created with max_retries=0
+        strategy: "least_outstanding" or "latency"
+        hedge: Whether to send hedged requests
+        hedge_quantile: Quantile of the latencies of an endpoint used as hedge delay
+        hedge_delay: Fixed hedge delay, in seconds, instead of the quantile
+        hedge_min_samples: Number of latencies of an endpoint needed to compute the quantile
+        failure_threshold: Consecutive failures after which an endpoint is ejected
+        reset_timeout: Seconds an ejected endpoint waits before a trial request
+        window: Number of recent latencies kept for every endpoint
+        max_workers: Maximum number of requests in flight
+    """
+
+    def __init__(
+        self,
+        handlers: List[LLMHandler],
+        strategy: str = "least_outstanding",
+        hedge: bool = True,
+        hedge_quantile: float = 0.95,
+        hedge_delay: Optional[float] = None,
+        hedge_min_samples: int = 10,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30,
+        window: int = 100,
+        max_workers: int = 32,
+    ):
+        if not handlers:
+            raise ValueError("A router needs at least one endpoint")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy: {strategy}, expected one of {STRATEGIES}")
+        self.endpoints = [_Endpoint(handler, window) for handler in handlers]
+        self.strategy = strategy
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_delay = hedge_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.cache = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    @staticmethod
+    def from_urls(
+        server_urls: List[str],
+        model_name: str = 'ollama',
+        api_key: str = 'ollama',
+        timeout: int = 600,
+        **options: Any
+    ) -> "RouterLLMHandler":
+        """Create a router over endpoints serving the same model; options are passed to __init__."""
+        handlers = [LLMHandler(model_name, url, api_key, timeout=timeout, max_retries=0) for url in server_urls]
+        return RouterLLMHandler(handlers, **options)
+
+    def _available(self, endpoint: _Endpoint, now: float) -> bool:
+        """Whether the circuit breaker of endpoint lets a request through."""
+        if endpoint.opened_at is None:
+            return True
+        if endpoint.trial or now - endpoint.opened_at < self.reset_timeout:
+            return False
+        return True
+
+    def _acquire(self, exclude: List[_Endpoint]) -> Tuple[Optional[_Endpoint], bool]:
+        """
+        Select the endpoint of a new request and count the request as outstanding.
+
+        Returns:
+            The endpoint, None if none is available, and whether the request is the trial
+            request of an ejected endpoint
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e not in exclude and self._available(e, now)]
+            if not candidates:
+                return None, False
+            if self.strategy == "latency":
+                endpoint = min(candidates, key=lambda e: (e.latency() * (e.outstanding + 1), e.outstanding))
+            else:
+                endpoint = min(candidates, key=lambda e: (e.outstanding, e.latency()))
+            trial = endpoint.opened_at is not None
+            if trial:
+                endpoint.trial = True
+            endpoint.outstanding += 1
+            return endpoint, trial
+
+    def _release(self, endpoint: _Endpoint, latency: Optional[float], trial: bool = False) -> None:
+        """
+        Record the outcome of a request: its latency, or a failure if latency is None.
+
+        Only the trial request of an ejected endpoint closes or reopens its circuit.
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            if trial:
+                endpoint.trial = False
+            if latency is not None:
+                endpoint.latencies.append(latency)
+                if endpoint.opened_at is None or trial:
+                    endpoint.failures = 0
+                    endpoint.opened_at = None
+                return
+            endpoint.failures += 1
+            if trial or (endpoint.opened_at is None and endpoint.failures >= self.failure_threshold):
+                if endpoint.opened_at is None:
+                    logger.warning(f"Ejecting LLM endpoint {endpoint.name} after {endpoint.failures} failures")
+                endpoint.opened_at = time.monotonic()
+
+    def _abandon(self, endpoint: _Endpoint, trial: bool) -> None:
+        """Forget a request cancelled before it started, without recording an outcome."""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if trial:
+                endpoint.trial = False
+
+    def _hedge_delay(self, endpoint: _Endpoint) -> Optional[float]:
+        if not self.hedge or len(self.endpoints) < 2:
+            return None
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        with self._lock:
+            if len(endpoint.latencies) < self.hedge_min_samples:
+                return None
+            return endpoint.quantile(self.hedge_quantile)
+
+    def _submit(self, endpoint: _Endpoint, trial: bool, messages: List[Dict[str, Any]], kwargs: Dict[str, Any]) -> Future:
+        def request():
+            start = time.perf_counter()
+            try:
+                result = endpoint.handler.call(messages, **kwargs)
+            except Exception:
+                self._release(endpoint, None, trial)
+                raise
+            self._release(endpoint, time.perf_counter() - start, trial)
+            return result
+
+        future = self._executor.submit(request)
+        future.endpoint = endpoint
+        future.trial = trial
+        return future
+
+    def _cancel(self, futures: Iterable[Future]) -> None:
+        """Cancel the requests that lost the race and have not started yet."""
+        for future in futures:
+            if future.cancel():
+                self._abandon(future.endpoint, future.trial)
+
+    def call(
+        self,
+        messages: List[Dict[str, Any]],
+        temperature: float = 0,
+        stream: bool = False,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None
+    ):
+        """
+        Call the LLM with the given messages and parameters, as LLMHandler.call.
+
+        Raises:
+            RouterError: If no endpoint is available
+        """
+        kwargs = {"temperature": temperature, "stream": stream, "max_tokens": max_tokens, "timeout": timeout}
+        tried: List[_Endpoint] = []
+        pending = set()
+        error: Optional[BaseException] = None
+
+        while True:
+            if not pending:
+                endpoint, trial = self._acquire(tried)
+                if endpoint is None:
+                    if error is not None:
+                        raise error
+                    raise RouterError("No LLM endpoint is available")
+                tried.append(endpoint)
+                pending.add(self._submit(endpoint, trial, messages, kwargs))
+                delay = self._hedge_delay(endpoint)
+            else:
+                delay = None
+
+            done, pending = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self._cancel(pending)
+                    return future.result()
+                error = future.exception()
+                logger.warning(f"LLM endpoint {future.endpoint.name} failed: {error}")
+            if not done and delay is not None:
+                # Hedge: duplicate the request on another endpoint
+                endpoint, trial = self._acquire(tried)
+                if endpoint is not None:
+                    tried.append(endpoint)
+                    pending.add(self._submit(endpoint, trial, messages, kwargs))
+
+    def stream(
+        self,
+        messages: List[Dict[str, Any]],
+        temperature: float = 0,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> Iterator[str]:
+        """
+        Stream the completion from the selected endpoint, as LLMHandler.stream.
+
+        Streams are neither hedged nor retried, since deltas may have been consumed already.
+
+        Raises:
+            RouterError: If no endpoint is available
+        """
+        endpoint, trial = self._acquire([])
+        if endpoint is None:
+            raise RouterError("No LLM endpoint is available")
+        return _RoutedStream(self, endpoint, trial, endpoint.handler.stream(messages, temperature=temperature, max_tokens=max_tokens, timeout=timeout))
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Load, latency and circuit breaker state of every endpoint."""
+        with self._lock:
+            return [
+                {
+                    "endpoint": e.name,
+                    "outstanding": e.outstanding,
+                    "latency": e.latency(),
+                    "failures": e.failures,
+                    "ejected": e.opened_at is not None,
+                }
+                for e in self.endpoints
+            ]
+
+    def close(self) -> None:
+        """Stop the threads of the router; requests in flight are completed."""
+        self._executor.shutdown(wait=False)
+
+
+class _RoutedStream:
+    """Stream of an endpoint, reporting its outcome to the router once finished."""
+
+    def __init__(self, router: RouterLLMHandler, endpoint: _Endpoint, trial: bool, stream: Any):
+        self._router = router
+        self._endpoint = endpoint
+        self._trial = trial
+        self._stream = stream
+        self._start = time.perf_counter()
+        self._released = False
+
+    def _finish(self, failed: bool) -> None:
+        if not self._released:
+            self._released = True
+            self._router._release(self._endpoint, None if failed else time.perf_counter() - self._start, self._trial)
+
+    def __iter__(self) -> "_RoutedStream":
+        return self
+
+    def __next__(self) -> str:
+        try:
+            return next(self._stream)
+        except StopIteration:
+            self._finish(False)
+            raise
+        except Exception:
+            self._finish(True)
+            raise
+
+    def close(self) -> None:
+        if hasattr(self._stream, "close"):
+            self._stream.close()
+        self._finish(False)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
@@ -0,0 +1,252 @@
+"""
+Multi-turn conversations over an LLMASP pipeline.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from clingo import Symbol, SymbolType
+
+from llmasp.asp.answer_set import AnswerSet
+from llmasp.asp.solver import IncrementalSolver
+from llmasp.deadline import Deadline
+from llmasp.tracing import Trace
+from .llmasp import LLMASP
+
+logger = logging.getLogger(__name__)
+
+
+class Session:
+    """
+    Conversation with an LLMASP pipeline, accumulating the facts extracted from every turn.
+
+    Every turn only sends the new utterance to the extraction queries. The facts it extracts
+    are applied to the solver of the session as a delta, where the database is grounded once,
+    so that the cost of a turn does not grow with the length of the conversation: they are
+    added, and the facts of previous turns that they revise are retracted (see update).
+    Postprocessing gets the extraction queries of the last max_history turns.
+
+    Args:
+        llmasp: Pipeline of the conversation
+        solver: Solver of the session, by default an IncrementalSolver where the database of
+            llmasp is loaded; facts are added to and retracted from a solver with
+            assign_facts, any other solver gets all the facts at every turn
+        max_history: Number of turns whose extraction queries are kept
+        keys: Positions of the key arguments of predicates, by signature (name, arity); a fact
+            of a turn revises the facts of its predicate with the same key arguments. By
+            default the key arguments of a fact are those that are not numbers, e.g.
+            product_request("apple",3) revises product_request("apple",2) and budget(20)
+            revises budget(10)
+    """
+
+    def __init__(
+        self,
+        llmasp: LLMASP,
+        solver: Any = None,
+        max_history: int = 4,
+        keys: Optional[Dict[Tuple[str, int], Sequence[int]]] = None
+    ):
+        self.llmasp = llmasp
+        self.solver = solver if solver is not None else self._default_solver(llmasp)
+        self.keys = dict(keys or {})
+        self.history: Deque[List[List[Dict[str, str]]]] = deque(maxlen=max_history)
+        self.turns = 0
+        self._facts: Dict[Symbol, None] = {}
+
+    @staticmethod
+    def _default_solver(llmasp: LLMASP) -> IncrementalSolver:
+        """
+        Create an IncrementalSolver with the options of the solver of llmasp, and load its database
+        unless it must be given with every program (see LLMASP.database_preloaded).
+        """
+        options = {}
+        if isinstance(llmasp.solver, IncrementalSolver):
+            options = {"arguments": llmasp.solver.arguments, "context": llmasp.solver.context}
+        solver = IncrementalSolver(**options)
+        if llmasp._preloaded(solver):
+            solver.load(llmasp.database)
+        return solver
+
+    @property
+    def facts(self) -> List[Symbol]:
+        """Facts of the conversation, in the order they were added."""
+        return list(self._facts)
+
+    def _symbols(self, facts: Iterable[Union[Symbol, str]]) -> List[Symbol]:
+        """Atoms of facts given as clingo symbols or as text, validated by the parser of llmasp."""
+        symbols = []
+        for fact in facts:
+            if isinstance(fact, Symbol):
+                symbols.append(fact)
+            else:
+                symbols.extend(self.llmasp.fact_parser.parse(fact).symbols)
+        return symbols
+
+    def add(self, facts: Iterable[Union[Symbol, str]]) -> List[Symbol]:
+        """Add facts to the conversation and return those that were not in it."""
+        new = [symbol for symbol in dict.fromkeys(self._symbols(facts)) if symbol not in self._facts]
+        self._facts.update(dict.fromkeys(new))
+        if new and hasattr(self.solver, "assign_facts"):
+            self.solver.assign_facts(add=new)
+        return new
+
+    def retract(self, facts: Iterable[Union[Symbol, str]]) -> List[Symbol]:
+        """Remove facts from the conversation and return those that were in it."""
+        removed = [symbol for symbol in dict.fromkeys(self._symbols(facts)) if symbol in self._facts]
+        for symbol in removed:
+            del self._facts[symbol]
+        if removed and hasattr(self.solver, "assign_facts"):
+            self.solver.assign_facts(retract=removed)
+        return removed
+
+    def _key(self, symbol: Symbol) -> Tuple:
+        """Signature and key arguments of a fact (see keys)."""
+        arguments = symbol.arguments
+        positions = self.keys.get((symbol.name, len(arguments)))
+        if positions is None:
+            positions = [i for i, argument in enumerate(arguments) if argument.type != SymbolType.Number]
+        return symbol.name, len(arguments), tuple(arguments[i] for i in positions)
+
+    def update(self, facts: Iterable[Union[Symbol, str]]) -> Tuple[List[Symbol], List[Symbol]]:
+        """
+        Add facts to the conversation, retracting the facts they revise, i.e. the facts of the
+        conversation with the same key (see keys) that are not among them.
+
+        Returns:
+            Facts that were added and facts that were retracted
+        """
+        symbols = list(dict.fromkeys(self._symbols(facts)))
+        keys = {self._key(symbol) for symbol in symbols}
+        given = set(symbols)
+        retracted = [symbol for symbol in self._facts if symbol not in given and self._key(symbol) in keys]
+        added = [symbol for symbol in symbols if symbol not in self._facts]
+        for symbol in retracted:
+            del self._facts[symbol]
+        self._facts.update(dict.fromkeys(added))
+        if (added or retracted) and hasattr(self.solver, "assign_facts"):
+            self.solver.assign_facts(add=added, retract=retracted)
+        return added, retracted
+
+    def reset(self) -> None:
+        """Forget the facts and the history of the conversation."""
+        self.retract(self.facts)
+        self.history.clear()
+        self.turns = 0
+
+    def _history_queries(self) -> List[List[Dict[str, str]]]:
+        return [query for queries in self.history for query in queries]
+
+    def _solve(self, trace: Trace, deadline: Optional[Deadline]) -> AnswerSet:
+        facts = [] if hasattr(self.solver, "assign_facts") else self.facts
+        result, _, _ = self.llmasp._solve(facts, trace, deadline, solver=self.solver)
+        return result
+
+    def _record(self, queries: List[List[Dict[str, str]]], trace: Trace) -> None:
+        self.history.append(queries)
+        self.turns += 1
+        trace.attributes["turn"] = self.turns
+        trace.attributes["session_facts"] = len(self._facts)
+
+    def turn(
+        self,
+        utterance: str,
+        single_pass: bool = False,
+        use_history: bool = True,
+        max_workers: int = 1,
+        on_token: Optional[Callable[[str], None]] = None,
+        trace: Optional[Trace] = None,
+        deadline: Union[None, float, Deadline] = None
+    ) -> Optional[str]:
+        """
+        Process a user utterance and answer it from the facts of the whole conversation.
+
+        Args:
+            utterance: Natural language input of the turn
+            single_pass: Whether to process all mappings in one query
+            use_history: Whether postprocessing gets the extraction queries of the previous turns
+            max_workers: Maximum number of LLM queries sent concurrently
+            on_token: Optional callback receiving the response tokens as they are streamed
+            trace: Optional trace filled with the timings of the turn
+            deadline: Optional time budget of the turn (see LLMASP.run)
+
+        Returns:
+            Natural language response or None if error occurs
+        """
+        trace = trace or Trace()
+        cache_hits = self.llmasp._cache_hits()
+        deadline = Deadline.of(deadline)
+        try:
+            symbols, queries, _ = self.llmasp._natural_to_asp(
+                utterance,
+                single_pass=single_pass,
+                max_workers=max_workers,
+                trace=trace,
+                deadline=deadline
+            )
+            self.update(symbols)
+            result = self._solve(trace, deadline)
+            self._record(queries, trace)
+            if not result:
+                return None
+            response, _ = self.llmasp.asp_to_natural(
+                result,
+                self._history_queries(),
+                use_history=use_history,
+                max_workers=max_workers,
+                on_token=on_token,
+                trace=trace,
+                deadline=deadline
+            )
+            return response
+        except Exception as e:
+            logger.error(f"Session turn failed: {e}")
+            trace.attributes["error"] = str(e)
+            return None
+        finally:
+            self.llmasp._finish_trace(trace, cache_hits, deadline)
+
+    async def aturn(
+        self,
+        utterance: str,
+        single_pass: bool = False,
+        use_history: bool = True,
+        max_workers: int = 1,
+        on_token: Optional[Callable[[str], None]] = None,
+        trace: Optional[Trace] = None,
+        deadline: Union[None, float, Deadline] = None
+    ) -> Optional[str]:
+        """Async version of turn, requiring an async LLM handler such as AsyncLLMHandler."""
+        trace = trace or Trace()
+        cache_hits = self.llmasp._cache_hits()
+        deadline = Deadline.of(deadline)
+        try:
+            symbols, queries, _ = await self.llmasp._anatural_to_asp(
+                utterance,
+                single_pass=single_pass,
+                max_workers=max_workers,
+                trace=trace,
+                deadline=deadline
+            )
+            self.update(symbols)
+            result = await asyncio.get_running_loop().run_in_executor(None, self._solve, trace, deadline)
+            self._record(queries, trace)
+            if not result:
+                return None
+            response, _ = await self.llmasp.aasp_to_natural(
+                result,
+                self._history_queries(),
+                use_history=use_history,
+                max_workers=max_workers,
+                on_token=on_token,
+                trace=trace,
+                deadline=deadline
+            )
+            return response
+        except Exception as e:
+            logger.error(f"Session turn failed: {e}")
+            trace.attributes["error"] = str(e)
+            return None
+        finally:
+            self.llmasp._finish_trace(trace, cache_hits, deadline)
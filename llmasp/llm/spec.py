@@ -0,0 +1,495 @@
+"""
+Compiled application and behavior specifications.
+
+A CompiledSpec is built once from the YAML files: templates are split on their placeholders,
+the instructions of every predicate are indexed by name and the system messages are built
+in advance, so that assembling the prompts of a request only joins strings. A CompiledSpec
+is never modified after construction and can be shared by many LLMASP instances and threads.
+"""
+
+import hashlib
+import logging
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass, field, fields
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+
+import yaml
+from clingo import Symbol, SymbolType, parse_term
+from yaml.error import YAMLError
+
+from llmasp.asp.answer_set import Signature
+from llmasp.asp.database import load_database, stamp
+from llmasp.asp.facts import signature
+from llmasp.asp.tuning import SolverSettings
+from llmasp.cache import Cache, LRUCache
+from .errors import LLMASPError, ConfigError
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+REQUIRED_CONFIG = {"preprocessing", "knowledge_base", "postprocessing"}
+REQUIRED_BEHAVIOR = {
+    "preprocessing": {"context", "mapping", "init"},
+    "postprocessing": {"context", "mapping", "init", "summarize"}
+}
+
+
+class Template:
+    """
+    Text split on its {placeholders}, rendered by joining the literal parts and the values.
+
+    Placeholders without a value are rendered unchanged.
+    """
+
+    __slots__ = ("parts",)
+
+    def __init__(self, text: Union[str, Tuple[str, ...]]):
+        # Literal parts are at even positions, placeholder names at odd positions
+        self.parts: Tuple[str, ...] = tuple(_PLACEHOLDER.split(text)) if isinstance(text, str) else text
+
+    def fill(self, **values: str) -> "Template":
+        """Return a template where the given placeholders are replaced by their values."""
+        parts = [self.parts[0]]
+        for i in range(1, len(self.parts), 2):
+            name, literal = self.parts[i], self.parts[i + 1]
+            if name in values:
+                parts[-1] += values[name] + literal
+            else:
+                parts.extend((name, literal))
+        return Template(tuple(parts))
+
+    def render(self, **values: str) -> str:
+        """Replace the placeholders by their values."""
+        parts = self.parts
+        return "".join(
+            part if i % 2 == 0 else values.get(part, f"{{{part}}}")
+            for i, part in enumerate(parts)
+        )
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Template):
+            return self.parts == other.parts
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.parts)
+
+    def __getstate__(self):
+        return self.parts
+
+    def __setstate__(self, state):
+        self.parts = state
+
+    def __repr__(self) -> str:
+        return f"Template({self.render()!r})"
+
+
+class FactTemplate:
+    """
+    Deterministic rendering of the facts of a predicate, declared in the postprocessing
+    section of an application with a template instead of instructions:
+
+        - select("product", "quantity").:
+            template: 'Buy {quantity} of {product}.'
+
+    Placeholders are bound to the arguments of a fact by the names in the atom of the entry,
+    or by position ({0}, {1}, ...). String arguments are rendered without quotes.
+    """
+
+    __slots__ = ("names", "template")
+
+    def __init__(self, names: Tuple[str, ...], template: Template):
+        self.names = names
+        self.template = template
+
+    def render(self, fact: Union[str, Symbol]) -> str:
+        """Render a fact, given as a clingo symbol or as text such as 'select("apple",2).'."""
+        symbol = fact if isinstance(fact, Symbol) else parse_term(fact.strip().rstrip("."))
+        values = {}
+        for i, argument in enumerate(symbol.arguments):
+            text = argument.string if argument.type == SymbolType.String else str(argument)
+            values[str(i)] = text
+            if i < len(self.names):
+                values[self.names[i]] = text
+        return self.template.render(**values)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, FactTemplate):
+            return (self.names, self.template) == (other.names, other.template)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((self.names, self.template))
+
+    def __getstate__(self):
+        return self.names, self.template
+
+    def __setstate__(self, state):
+        self.names, self.template = state
+
+    def __repr__(self) -> str:
+        return f"FactTemplate({self.names}, {self.template!r})"
+
+
+def load_yaml(path: str) -> Any:
+    """
+    Load a YAML file.
+
+    Raises:
+        ConfigError: If the file cannot be loaded or parsed
+    """
+    try:
+        with open(path, "r") as f:
+            return yaml.safe_load(f)
+    except FileNotFoundError:
+        raise ConfigError(f"Configuration file not found: {path}")
+    except YAMLError as e:
+        raise ConfigError(f"Invalid YAML in {path}: {e}")
+    except Exception as e:
+        raise ConfigError(f"Error loading {path}: {e}")
+
+
+def _read(path: str) -> bytes:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        raise ConfigError(f"Configuration file not found: {path}")
+    except Exception as e:
+        raise ConfigError(f"Error loading {path}: {e}")
+
+
+def _digest(*contents: bytes) -> str:
+    digest = hashlib.sha256()
+    for content in contents:
+        digest.update(len(content).to_bytes(8, "big"))
+        digest.update(content)
+    return digest.hexdigest()
+
+
+def _freeze(value: Any) -> Any:
+    """Read-only copy of parsed YAML: mappings become MappingProxyType, lists tuples."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """Plain dicts and lists of a value frozen by _freeze, e.g. to pickle it."""
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+def _entries(section: Any) -> List[Tuple[str, Any]]:
+    """The (atom, value) pairs of a preprocessing or postprocessing section."""
+    if not isinstance(section, (list, tuple)):
+        return []
+    return [next(iter(entry.items())) for entry in section if isinstance(entry, Mapping) and entry]
+
+
+def _instructions(value: Any) -> str:
+    """Instructions of an entry, given as text or with an instructions key."""
+    if isinstance(value, Mapping):
+        return str(value.get("instructions", ""))
+    return str(value)
+
+
+def _argument_names(atom: str) -> Tuple[str, ...]:
+    """Names of the arguments of the atom of an entry, e.g. ('product', 'quantity') for select("product", quantity)."""
+    if "(" not in atom or ")" not in atom:
+        return ()
+    arguments = atom[atom.index("(") + 1:atom.rindex(")")]
+    return tuple(name.strip().strip('"') for name in arguments.split(","))
+
+
+def _validate(config: Any, behavior: Any) -> None:
+    """Validate the structure of the application and behavior specifications."""
+    if not isinstance(config, Mapping) or not isinstance(behavior, Mapping):
+        raise ConfigError("Specifications must be YAML mappings")
+    if not all(key in config for key in REQUIRED_CONFIG):
+        raise ConfigError(f"Missing required config keys: {REQUIRED_CONFIG - set(config.keys())}")
+    for section, fields in REQUIRED_BEHAVIOR.items():
+        if section not in behavior:
+            raise ConfigError(f"Missing behavior section: {section}")
+        if not all(field in behavior[section] for field in fields):
+            raise ConfigError(f"Missing required fields in {section}: {fields - set(behavior[section].keys())}")
+
+
+def _load_database(path: Optional[str], cache_dir: Optional[str] = None) -> str:
+    """Load the database program (see llmasp.asp.database), an empty database if it is not available."""
+    try:
+        if path is None:
+            raise KeyError("database")
+        return load_database(path, cache_dir)
+    except (KeyError, FileNotFoundError) as e:
+        logger.warning(f"Database configuration not found: {e}")
+    except Exception as e:
+        logger.error(f"Error loading database: {e}")
+    return ""
+
+
+# Fields of CompiledSpec holding read-only mappings
+_FROZEN_FIELDS = ("config", "behavior", "preprocessing_messages", "postprocessing_messages", "fact_templates", "fact_renderers")
+
+
+def _message(role: str, content: str) -> Dict[str, str]:
+    return {"role": role, "content": content}
+
+
+@dataclass(frozen=True)
+class CompiledSpec:
+    """
+    Application and behavior specifications, compiled for fast prompt assembly.
+
+    The parsed specifications and every compiled mapping are read-only (MappingProxyType,
+    with tuples instead of lists), so that a shared CompiledSpec cannot be modified.
+
+    Attributes:
+        config: Parsed application specification
+        behavior: Parsed behavior specification
+        database: Database program
+        digest: Hash of the content of the specification files
+        database_file: Path of the database file, if any
+        database_stamp: Modification times and sizes of the database files, if any
+        preprocessing_messages: System messages starting every extraction query
+        extraction: Atom and template, with {input} left, of every extraction query
+        single_pass: Template, with {input} left, of the single pass extraction query
+        signatures: Signatures of the predicates of the preprocessing entries, the only
+            predicates accepted in extraction answers; None if no entry declares an atom
+        postprocessing_messages: System messages starting every fact group query
+        fact_templates: Template, with {facts} left, of the query of every predicate name
+        fact_renderers: Template rendering the facts of a predicate name without the LLM, if declared
+        summarize: Template of the summarize query
+        summarize_templates: Whether answers whose facts are all rendered by templates are
+            summarized by the LLM (summarize_templates key of the application)
+        solver_settings: Clingo options of the knowledge base (solver section of the
+            application), None to use those of the solver
+    """
+    config: Mapping
+    behavior: Mapping
+    database: str
+    digest: str
+    database_file: Optional[str] = None
+    database_stamp: Optional[Tuple] = None
+    preprocessing_messages: Optional[Tuple[Mapping, ...]] = None
+    extraction: Tuple[Tuple[str, Template], ...] = ()
+    single_pass: Optional[Template] = None
+    signatures: Optional[FrozenSet[Signature]] = None
+    postprocessing_messages: Optional[Tuple[Mapping, ...]] = None
+    fact_templates: Mapping = field(default_factory=lambda: MappingProxyType({}))
+    fact_renderers: Mapping = field(default_factory=lambda: MappingProxyType({}))
+    summarize: Template = Template("")
+    summarize_templates: bool = True
+    solver_settings: Optional[SolverSettings] = None
+
+    @property
+    def knowledge_base(self) -> str:
+        return self.config["knowledge_base"]
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # MappingProxyType cannot be pickled, e.g. by a SQLiteCache
+        state = {f.name: getattr(self, f.name) for f in fields(self)}
+        for name in _FROZEN_FIELDS:
+            state[name] = _thaw(state[name])
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        for name, value in state.items():
+            object.__setattr__(self, name, _freeze(value) if name in _FROZEN_FIELDS else value)
+
+    @staticmethod
+    def compile(config: Dict[str, Any], behavior: Dict[str, Any], database: str = "", **metadata: Any) -> "CompiledSpec":
+        """
+        Compile parsed application and behavior specifications.
+
+        Args:
+            config: Parsed application specification
+            behavior: Parsed behavior specification
+            database: Database program
+            metadata: digest, database_file and database_stamp of the specification files
+
+        Raises:
+            ConfigError: If the specifications miss required fields or have invalid solver settings
+        """
+        _validate(config, behavior)
+        return CompiledSpec._compile(config, behavior, database, **metadata)
+
+    @staticmethod
+    def _compile(config: Mapping, behavior: Mapping, database: str, **metadata: Any) -> "CompiledSpec":
+        """Compile validated specifications, see compile."""
+        try:
+            solver_settings = SolverSettings.from_config(config.get("solver"))
+        except (ValueError, TypeError) as e:
+            raise ConfigError(f"Invalid solver settings: {e}")
+        preprocessing, postprocessing = behavior["preprocessing"], behavior["postprocessing"]
+
+        entries = [(atom, _instructions(value)) for atom, value in _entries(config["preprocessing"])]
+        contexts = dict(entries)
+        mappings = [(atom, instructions) for atom, instructions in entries if atom != "_"]
+        mapping = Template(preprocessing["mapping"])
+        preprocessing_messages = None
+        if "_" in contexts:
+            preprocessing_messages = (
+                _message("system", preprocessing["init"]),
+                _message("system", Template(preprocessing["context"]).render(context=contexts["_"])),
+            )
+        extraction = tuple(
+            (atom, mapping.fill(instructions=instructions, atom=atom))
+            for atom, instructions in mappings
+        )
+        signatures = frozenset(filter(None, (signature(atom) for atom, _ in mappings))) or None
+        single_pass = None
+        if mappings:
+            atoms, instructions = zip(*mappings)
+            single_pass = mapping.fill(instructions="".join(instructions), atom=" ".join(atoms))
+
+        values = _entries(config["postprocessing"])
+        entries = [(atom, _instructions(value)) for atom, value in values]
+        contexts = dict(entries)
+        postprocessing_messages = None
+        if "_" in contexts:
+            postprocessing_messages = (
+                _message("system", postprocessing["init"]),
+                _message("system", Template(postprocessing["context"]).render(context=contexts["_"])),
+            )
+        mapping = Template(postprocessing["mapping"])
+        fact_templates: Dict[str, Template] = {}
+        for atom, instructions in entries:
+            # The first entry of a predicate name is used, as in the specification order
+            fact_templates.setdefault(atom.split("(")[0], mapping.fill(atom=atom, intructions=instructions))
+        fact_renderers: Dict[str, FactTemplate] = {}
+        for atom, value in values:
+            if isinstance(value, Mapping) and "template" in value:
+                renderer = FactTemplate(_argument_names(atom), Template(str(value["template"])))
+                fact_renderers.setdefault(atom.split("(")[0], renderer)
+
+        return CompiledSpec(
+            config=_freeze(config),
+            behavior=_freeze(behavior),
+            database=database,
+            digest=metadata.get("digest") or _digest(repr((config, behavior, database)).encode("utf-8")),
+            database_file=metadata.get("database_file"),
+            database_stamp=metadata.get("database_stamp"),
+            preprocessing_messages=_freeze(preprocessing_messages),
+            extraction=extraction,
+            single_pass=single_pass,
+            signatures=signatures,
+            postprocessing_messages=_freeze(postprocessing_messages),
+            fact_templates=MappingProxyType(fact_templates),
+            fact_renderers=MappingProxyType(fact_renderers),
+            summarize=Template(postprocessing["summarize"]),
+            summarize_templates=bool(config.get("summarize_templates", True)),
+            solver_settings=solver_settings,
+        )
+
+    @staticmethod
+    def from_files(config_file: str, behavior_file: str) -> "CompiledSpec":
+        """
+        Parse and compile the specification files, and the database file they refer to.
+
+        Raises:
+            ConfigError: If the files cannot be loaded or miss required fields
+        """
+        return CompiledSpec._from_contents(_read(config_file), _read(behavior_file), config_file, behavior_file)
+
+    @staticmethod
+    def _from_contents(config_content: bytes, behavior_content: bytes, config_file: str, behavior_file: str) -> "CompiledSpec":
+        try:
+            config = yaml.safe_load(config_content)
+        except YAMLError as e:
+            raise ConfigError(f"Invalid YAML in {config_file}: {e}")
+        try:
+            behavior = yaml.safe_load(behavior_content)
+        except YAMLError as e:
+            raise ConfigError(f"Invalid YAML in {behavior_file}: {e}")
+        _validate(config, behavior)
+        database_file = config.get("database")
+        database_file = database_file if isinstance(database_file, str) else None
+        return CompiledSpec._compile(
+            config,
+            behavior,
+            _load_database(database_file, config.get("database_cache")),
+            digest=_digest(config_content, behavior_content),
+            database_file=database_file,
+            database_stamp=stamp(database_file),
+        )
+
+    @staticmethod
+    def load(config_file: str, behavior_file: str, cache: Optional[Cache] = None) -> "CompiledSpec":
+        """
+        Return the compiled specification of the given files, compiling them only if needed.
+
+        Compiled specifications are looked up by the hash of the content of the files, first
+        in the specifications compiled by this process, then in cache if given, e.g. a
+        SQLiteCache persisting them across processes. Entries whose database files were modified
+        since they were compiled are compiled again.
+
+        Args:
+            config_file: Path to the application specification
+            behavior_file: Path to the behavior specification
+            cache: Optional cache of compiled specifications
+
+        Raises:
+            ConfigError: If the files cannot be loaded or miss required fields
+        """
+        config_content, behavior_content = _read(config_file), _read(behavior_file)
+        digest = _digest(config_content, behavior_content)
+        for store in (_COMPILED, cache):
+            if store is None:
+                continue
+            spec = store.get(digest)
+            if isinstance(spec, CompiledSpec) and spec.database_stamp == stamp(spec.database_file):
+                if store is not _COMPILED:
+                    _COMPILED.set(digest, spec)
+                return spec
+
+        spec = CompiledSpec._from_contents(config_content, behavior_content, config_file, behavior_file)
+        _COMPILED.set(digest, spec)
+        if cache is not None:
+            cache.set(digest, spec)
+        return spec
+
+    def extraction_messages(self, template: Template, user_input: str) -> List[Dict[str, str]]:
+        """Create the messages of an extraction query."""
+        if self.preprocessing_messages is None:
+            raise LLMASPError("Property not found: _")
+        return [*map(dict, self.preprocessing_messages), _message("user", template.render(input=user_input))]
+
+    def fact_group_messages(self, fact_name: str, facts: List[str]) -> List[Dict[str, str]]:
+        """Create the messages translating a group of facts, without the history."""
+        if self.postprocessing_messages is None:
+            raise LLMASPError("Property not found: _")
+        template = self.fact_templates.get(fact_name)
+        if template is None:
+            raise LLMASPError(f"Property not found: {fact_name}")
+        return [*map(dict, self.postprocessing_messages), _message("user", template.render(facts="\n".join(facts)))]
+
+    def render_facts(self, fact_name: str, facts: List[str]) -> Optional[str]:
+        """Render a group of facts with the template of their predicate, None if it has none."""
+        renderer = self.fact_renderers.get(fact_name)
+        if renderer is None:
+            return None
+        return "\n".join(renderer.render(fact) for fact in facts)
+
+    def rendered_only(self, fact_names: Iterable[str]) -> bool:
+        """Whether the groups of facts with the given names are all rendered by templates and not summarized."""
+        fact_names = list(fact_names)
+        return not self.summarize_templates and bool(fact_names) and all(n in self.fact_renderers for n in fact_names)
+
+    def summary_messages(self, responses: List[str]) -> List[Dict[str, str]]:
+        """Create the messages of the final summarize query."""
+        if self.postprocessing_messages is None:
+            raise LLMASPError("Property not found: _")
+        return [dict(self.postprocessing_messages[1]), _message("user", self.summarize.render(responses="\n".join(responses)))]
+
+
+# Specifications compiled by this process, by hash of their files
+_COMPILED: Cache = LRUCache(max_size=64)
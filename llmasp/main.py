@@ -2,46 +2,225 @@
 Main entry point for the LLMASP engine.
 """
 
-from llmasp.llm import LLMASP, LLMHandler
-from llmasp.asp import Solver
 import argparse
-from llmasp.examples import marketplace_example
+import json
+import sys
+from dataclasses import asdict
+from typing import List, Optional
 
+# The pipeline modules (openai, clingo, dumbo_asp) are imported by the commands that use
+# them, so that --help and the startup of the server are fast.
 
-def main():
+
+def read_batch(path: str):
     """
-    Command-line interface for running LLMASP or an example.
+    Read the inputs of a batch from a JSONL file, or from stdin if path is '-'.
+
+    Each line is either a JSON string or an object with an "input" key.
+    """
+    stream = sys.stdin if path == "-" else open(path, "r")
+    try:
+        inputs = []
+        for line in stream:
+            if line.strip():
+                item = json.loads(line)
+                inputs.append(item["input"] if isinstance(item, dict) else item)
+        return inputs
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def make_llm(model: str, server: str):
+    """Create the LLM handler of a hostname, or a router over comma-separated hostnames."""
+    from llmasp.llm import LLMHandler, RouterLLMHandler
+
+    servers = [url.strip() for url in server.split(",") if url.strip()]
+    return RouterLLMHandler.from_urls(servers, model) if len(servers) > 1 else LLMHandler(model, server)
+
+
+def serve(argv: List[str]):
+    """
+    Command-line interface of `llmasp serve`, answering requests over HTTP until interrupted.
     """
+    parser = argparse.ArgumentParser(
+        prog='llmasp serve',
+        description='Serve the LLMASP pipeline over HTTP/JSON: POST /run, GET /ready, GET /stats'
+    )
+    parser.add_argument("behavior_file", help="behavior file")
+    parser.add_argument("application_file", help="application file")
+    parser.add_argument("-m", "--model", type=str, help="model name", required=True)
+    parser.add_argument("-s", "--server", type=str, help="hostname, or comma-separated hostnames to balance requests over", required=True)
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="interface to bind")
+    parser.add_argument("-p", "--port", type=int, default=8080, help="port to bind")
+    parser.add_argument("--max-batch", type=int, default=16, help="maximum number of requests processed together")
+    parser.add_argument("--max-batches", type=int, default=4, help="maximum number of batches processed at the same time")
+    parser.add_argument("--batch-wait", type=float, default=0.005, help="seconds to wait for other requests before processing a single one")
+    parser.add_argument("-w", "--max-workers", type=int, default=1, help="maximum number of concurrent llm queries of a request")
+    parser.add_argument("--llm-workers", type=int, default=4, help="requests in the llm stages at the same time")
+    parser.add_argument("--solver-workers", type=int, default=1, help="programs solved at the same time")
+    parser.add_argument("-d", "--deadline", type=float, help="default time budget of every request, in seconds")
+    args = parser.parse_args(argv)
+
+    from llmasp.server import LLMASPServer
+
+    def factory():
+        from llmasp.llm import LLMASP
+        from llmasp.asp import IncrementalSolver
+
+        # The database is grounded once and shared by the requests
+        return LLMASP(args.application_file, args.behavior_file, make_llm(args.model, args.server), IncrementalSolver())
+
+    server = LLMASPServer(
+        factory,
+        host=args.host,
+        port=args.port,
+        max_batch=args.max_batch,
+        max_batches=args.max_batches,
+        batch_wait=args.batch_wait,
+        llm_workers=args.llm_workers,
+        solver_workers=args.solver_workers,
+        max_workers=args.max_workers,
+        deadline=args.deadline
+    )
+    print(f"Serving LLMASP on {server.url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def read_fact_sets(path: str) -> List[str]:
+    """
+    Read sample fact sets from a JSONL file, e.g. the output of --batch.
+
+    Each line is either a JSON string of facts or an object with a "facts" key; objects
+    without facts (failed inputs) are skipped.
+    """
+    fact_sets = []
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                facts = item.get("facts") if isinstance(item, dict) else item
+                if facts is not None:
+                    fact_sets.append(facts)
+    return fact_sets
+
+
+def tune(argv: List[str]):
+    """
+    Command-line interface of `llmasp tune`, comparing solver settings on sample fact sets.
+    """
+    parser = argparse.ArgumentParser(
+        prog='llmasp tune',
+        description='Compare clingo settings on the knowledge base of an application and sample fact sets, '
+                    'by timeout rate and time to optimum'
+    )
+    parser.add_argument("behavior_file", help="behavior file")
+    parser.add_argument("application_file", help="application file")
+    parser.add_argument("-f", "--facts", type=str, required=True, help="JSONL file of sample fact sets, e.g. the output of --batch")
+    parser.add_argument("-t", "--timeout", type=float, default=10, help="time limit of every run, in seconds")
+    parser.add_argument("-r", "--repeats", type=int, default=1, help="runs of every fact set with every settings")
+    parser.add_argument("--threads", type=int, help="threads of the parallel settings, by default up to 4")
+    parser.add_argument("--min-gain", type=float, default=0.05, help="minimum relative improvement of the score over the current settings to replace them")
+    parser.add_argument("--write", action="store_true", help="write the best settings to the solver section of the application file")
+    args = parser.parse_args(argv)
+
+    from llmasp.asp.tuning import SolverSettings, best_settings, default_candidates, tune as tune_settings, write_settings
+    from llmasp.llm import CompiledSpec
+
+    spec = CompiledSpec.from_files(args.application_file, args.behavior_file)
+    current = spec.solver_settings or SolverSettings()
+    candidates = default_candidates(args.threads)
+    if current not in candidates:
+        candidates.insert(0, current)
+    results = tune_settings(
+        f"{spec.database}\n{spec.knowledge_base}",
+        read_fact_sets(args.facts),
+        candidates,
+        timeout=args.timeout,
+        repeats=args.repeats
+    )
+    for result in results:
+        print(json.dumps(result.to_dict()))
+    if not results or not any(result.runs for result in results):
+        parser.error(f"No fact sets in {args.facts}")
+    best = best_settings(results, current, args.min_gain)
+    if best == current:
+        print(f"Keeping {current.describe()}", file=sys.stderr)
+    elif args.write:
+        write_settings(args.application_file, best)
+        print(f"Wrote {best.describe()} to {args.application_file}", file=sys.stderr)
+    else:
+        print(f"Best settings: {best.describe()}, use --write to store them", file=sys.stderr)
+
+
+COMMANDS = {"serve": serve, "tune": tune}
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Command-line interface for running LLMASP or an example, or one of the COMMANDS, e.g. `llmasp serve`.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        COMMANDS[argv[0]](argv[1:])
+        return
     parser = argparse.ArgumentParser(
         prog='LLMASP Engine',
-        description='Prototype system for smooth interaction between an LLM and an ASP solver',
+        description='Prototype system for smooth interaction between an LLM and an ASP solver. '
+                    'Run `llmasp serve --help` for the server mode and `llmasp tune --help` for solver tuning.',
         epilog='Hope you get the best answer!!!'
     )
     parser.add_argument("behavior_file", help="behavior file", nargs='?', default=None)
     parser.add_argument("application_file", help="application file", nargs='?', default=None)
     parser.add_argument("-e", "--example", action="store_true", help="show an example")
     parser.add_argument("-m", "--model", type=str, help="model name", required=True)
-    parser.add_argument("-s", "--server", type=str, help="hostname", required=True)
+    parser.add_argument("-s", "--server", type=str, help="hostname, or comma-separated hostnames to balance requests over", required=True)
     parser.add_argument("-sp", "--single-pass", action="store_true", help="single pass to llm", required=False)
+    parser.add_argument("-w", "--max-workers", type=int, default=1, help="maximum number of concurrent llm queries")
+    parser.add_argument("-b", "--batch", type=str, help="JSONL file of inputs to process, '-' for stdin")
+    parser.add_argument("--llm-workers", type=int, default=4, help="inputs in the llm stages at the same time in batch mode")
+    parser.add_argument("--solver-workers", type=int, default=1, help="programs solved at the same time in batch mode")
+    parser.add_argument("-d", "--deadline", type=float, help="time budget of every input, in seconds")
+    parser.add_argument("--slice-database", action="store_true", help="solve every input with the database facts relevant to it only")
     parser.add_argument("-v", "--verbose", type=int, choices=[0, 1], default=0, help="print every step result")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     model = args.model
     server = args.server
     if args.example:
+        from llmasp.examples import marketplace_example
+
         marketplace_example(model, server)
         return
     elif args.behavior_file is None or args.application_file is None:
         parser.error("behavior_file and application_file are required if --example is not set")
     else:
+        from llmasp.llm import LLMASP
+        from llmasp.asp import Solver
+
         behavior = args.behavior_file
         application = args.application_file
         single_pass = args.single_pass
         verbose = args.verbose
-        user_input = input("input: ")
-        llm = LLMHandler(model, server)
+        llm = make_llm(model, server)
         solver = Solver()
-        llmasp = LLMASP(application, behavior, llm, solver)
-        response = llmasp.run(user_input, single_pass, verbose=verbose)
+        llmasp = LLMASP(application, behavior, llm, solver, slice_database=args.slice_database)
+        if args.batch is not None:
+            results = llmasp.run_batch(
+                read_batch(args.batch),
+                single_pass,
+                llm_workers=args.llm_workers,
+                solver_workers=args.solver_workers,
+                max_workers=args.max_workers,
+                deadline=args.deadline
+            )
+            for result in results:
+                print(json.dumps(asdict(result)))
+            return
+        user_input = input("input: ")
+        response = llmasp.run(user_input, single_pass, verbose=verbose, max_workers=args.max_workers, deadline=args.deadline)
         if verbose == 0:
             print(response)
 
@@ -0,0 +1,347 @@
+"""
+Local HTTP/JSON server running the LLMASP pipeline, for `llmasp serve`.
+
+The pipeline (specifications, LLM clients and solver) is built once, in the background, and
+reused by every request. Identical requests in flight share the same run, and requests that
+arrive together are gathered into batches, so that their LLM calls and solving overlap
+through LLMASP.run_batch; several batches run at the same time, so that a slow request does
+not hold back the ones received after it.
+
+Endpoints:
+    POST /run: {"input": str, "single_pass": bool, "deadline": float} -> BatchResult as JSON
+    GET /ready: 200 once the pipeline is built, 503 before (or if building it failed)
+    GET /stats: requests, errors and latency by endpoint, batching, coalescing, LLM endpoints
+        and cache counters
+
+This module only imports the standard library (and llmasp.deadline), so that the server binds its port before
+the heavy dependencies of the pipeline are loaded.
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from llmasp.deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+
+class _EndpointStats:
+    """Counters of the requests of an HTTP endpoint."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency: float, error: bool) -> None:
+        self.requests += 1
+        self.errors += int(error)
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "mean_latency": self.total_latency / self.requests if self.requests else 0.0,
+            "max_latency": self.max_latency,
+        }
+
+
+class LLMASPServer:
+    """
+    Threaded HTTP server answering requests with a warm LLMASP pipeline.
+
+    Requests with the same input and options as one in flight wait for its result instead
+    of running the pipeline again. The other requests are queued; a dispatcher thread takes
+    everything queued, up to max_batch requests, waiting batch_wait seconds for more if the
+    queue holds a single one, and runs them with LLMASP.run_batch, with at most max_batches
+    batches running at the same time. The deadline of a request starts when it is received,
+    so that the time spent in the queue counts.
+
+    Args:
+        factory: Function building the LLMASP instance, called once when the server starts
+        host: Interface to bind
+        port: Port to bind, 0 for a free one
+        max_batch: Maximum number of requests processed by one run_batch call
+        max_batches: Maximum number of run_batch calls running at the same time
+        batch_wait: Seconds to wait for other requests before processing a single one
+        llm_workers: Inputs in the extraction stage at the same time (see LLMASP.run_batch)
+        solver_workers: Programs solved at the same time (see LLMASP.run_batch)
+        max_workers: LLM queries sent concurrently for a single input
+        deadline: Default time budget of every request, in seconds
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        max_batch: int = 16,
+        max_batches: int = 4,
+        batch_wait: float = 0.005,
+        llm_workers: int = 4,
+        solver_workers: int = 1,
+        max_workers: int = 1,
+        deadline: Optional[float] = None,
+    ):
+        self.factory = factory
+        self.max_batch = max_batch
+        self.max_batches = max_batches
+        self.batch_wait = batch_wait
+        self.llm_workers = llm_workers
+        self.solver_workers = solver_workers
+        self.max_workers = max_workers
+        self.deadline = deadline
+        self.llmasp: Any = None
+        self.error: Optional[str] = None
+        self.coalesced = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.largest_batch = 0
+        self._endpoints: Dict[str, _EndpointStats] = {}
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._queue: "queue.Queue[Optional[Tuple[Hashable, Future, Optional[Deadline]]]]" = queue.Queue()
+        self._batches = ThreadPoolExecutor(max_workers=max_batches)
+        self._slots = threading.BoundedSemaphore(max_batches)
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the pipeline is built; return whether it is."""
+        return self._ready.wait(timeout) and self.llmasp is not None
+
+    def _warm_up(self) -> None:
+        """Build the pipeline, then process the queued requests until the server stops."""
+        try:
+            self.llmasp = self.factory()
+        except Exception as e:
+            logger.error(f"Failed to build the LLMASP pipeline: {e}")
+            self.error = str(e)
+        finally:
+            self._ready.set()
+        self._dispatch()
+
+    def _next_batch(self) -> Optional[List[Tuple[Hashable, Future, Optional[Deadline]]]]:
+        """Take the queued requests, waiting for the first one; None once the server stops."""
+        item = self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch:
+            try:
+                timeout = deadline - time.monotonic() if len(batch) == 1 else 0
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _dispatch(self) -> None:
+        while True:
+            # Requests keep gathering in the queue while every batch slot is taken
+            self._slots.acquire()
+            batch = self._next_batch()
+            if batch is None:
+                self._slots.release()
+                return
+            with self._lock:
+                self.batches += 1
+                self.batched_requests += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+            # Requests of a batch share run_batch, which takes single_pass once
+            groups: Dict[bool, List[Tuple[Hashable, Future, Optional[Deadline]]]] = {}
+            for item in batch:
+                groups.setdefault(item[0][1], []).append(item)
+            for i, (single_pass, items) in enumerate(groups.items()):
+                if i:
+                    self._slots.acquire()
+                self._batches.submit(self._run, items, single_pass)
+
+    def _run(self, items: List[Tuple[Hashable, Future, Optional[Deadline]]], single_pass: bool) -> None:
+        try:
+            results = self.llmasp.run_batch(
+                [key[0] for key, _, _ in items],
+                single_pass,
+                llm_workers=self.llm_workers,
+                solver_workers=self.solver_workers,
+                max_workers=self.max_workers,
+                deadline=[deadline for _, _, deadline in items]
+            )
+        except Exception as e:
+            logger.error(f"Batch failed: {e}")
+            results = [e] * len(items)
+        finally:
+            self._slots.release()
+        for (key, future, _), result in zip(items, results):
+            with self._lock:
+                self._in_flight.pop(key, None)
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(asdict(result))
+
+    def submit(self, user_input: str, single_pass: bool = False, deadline: Optional[float] = None) -> Tuple[Future, bool]:
+        """
+        Queue a request, or join the identical request in flight.
+
+        The deadline, by default the one of the server, is counted from now.
+
+        Returns:
+            Future of the result as a dictionary, and whether the request was coalesced
+        """
+        seconds = deadline if deadline is not None else self.deadline
+        key = (user_input, single_pass, seconds)
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, True
+            future = self._in_flight[key] = Future()
+        self._queue.put((key, future, Deadline.of(seconds)))
+        return future, False
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters of the server, the LLM endpoints and the extraction and solve caches."""
+        with self._lock:
+            stats: Dict[str, Any] = {
+                "ready": self.ready and self.llmasp is not None,
+                "endpoints": {path: endpoint.to_dict() for path, endpoint in self._endpoints.items()},
+                "in_flight": len(self._in_flight),
+                "queued": self._queue.qsize(),
+                "coalesced": self.coalesced,
+                "batches": self.batches,
+                "mean_batch": self.batched_requests / self.batches if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+            }
+        llm = getattr(self.llmasp, "llm", None)
+        if hasattr(llm, "stats"):
+            stats["llm_endpoints"] = llm.stats()
+        for name in ("extraction_cache", "solve_cache"):
+            cache = getattr(self.llmasp, name, None)
+            if cache is not None:
+                stats[name] = cache.stats()
+        return stats
+
+    def _record(self, path: str, latency: float, error: bool) -> None:
+        with self._lock:
+            self._endpoints.setdefault(path, _EndpointStats()).record(latency, error)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                return
+
+            def do_GET(self):
+                start = time.perf_counter()
+                path = self.path.rstrip("/")
+                if path == "/ready":
+                    ready = server.ready and server.llmasp is not None
+                    status, payload = (200 if ready else 503), {"ready": ready, "error": server.error}
+                elif path == "/stats":
+                    status, payload = 200, server.stats()
+                else:
+                    status, payload = 404, {"error": f"Unknown endpoint {self.path}"}
+                # Recorded before answering, so that the next request of the client sees it
+                server._record(f"GET {path}", time.perf_counter() - start, status >= 400)
+                self._send_json(status, payload)
+
+            def do_POST(self):
+                start = time.perf_counter()
+                path = self.path.rstrip("/")
+                status, payload = self._post(path)
+                server._record(f"POST {path}", time.perf_counter() - start, status >= 400)
+                self._send_json(status, payload)
+
+            def _post(self, path: str) -> Tuple[int, Dict[str, Any]]:
+                if path != "/run":
+                    return 404, {"error": f"Unknown endpoint {self.path}"}
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                    user_input = body["input"]
+                    if not isinstance(user_input, str):
+                        raise ValueError("input must be a string")
+                    deadline = body.get("deadline")
+                    options = {
+                        "single_pass": bool(body.get("single_pass", False)),
+                        "deadline": float(deadline) if deadline is not None else None,
+                    }
+                except (ValueError, KeyError, TypeError) as e:
+                    return 400, {"error": f"Invalid request: {e}"}
+                if not server.ready or server.llmasp is None:
+                    return 503, {"error": server.error or "The pipeline is not ready"}
+                future, coalesced = server.submit(user_input, **options)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    return 500, {"input": user_input, "error": str(e), "coalesced": coalesced}
+                return (500 if result["error"] else 200), {**result, "coalesced": coalesced}
+
+            def _send_json(self, status: int, payload: Dict[str, Any]):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def start(self) -> "LLMASPServer":
+        """Serve requests in background threads; the pipeline is built meanwhile."""
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, daemon=True),
+            threading.Thread(target=self._warm_up, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve requests until interrupted."""
+        self.start()
+        try:
+            while True:
+                time.sleep(3600)
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        if self._threads:
+            self._server.shutdown()
+            self._queue.put(None)
+            self._threads = []
+        self._batches.shutdown(wait=False)
+        self._server.server_close()
+
+    def __enter__(self) -> "LLMASPServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
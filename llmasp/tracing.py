@@ -0,0 +1,176 @@
+"""
+Tracing and metrics of the LLMASP pipeline.
+
+A Trace records timed spans (prompt construction, LLM calls, fact extraction, grounding,
+solving, postprocessing) with their attributes, such as token counts and solver flags.
+Finished traces are handed to exporters.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Any, Callable, Dict, IO, Iterator, List, Optional, Union
+
+
+@dataclass
+class Span:
+    """A timed step of the pipeline."""
+    name: str
+    start: float
+    duration: float = 0.0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def record_usage(self, meta: Any) -> None:
+        """Record the token counts of the usage object returned by an LLM call."""
+        for key in ("prompt_tokens", "completion_tokens"):
+            value = meta.get(key) if isinstance(meta, dict) else getattr(meta, key, None)
+            if isinstance(value, int):
+                self.attributes[key] = value
+
+
+class Trace:
+    """
+    Record of the spans of a single pipeline run.
+
+    Spans may be added concurrently from several threads.
+    """
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self.attributes: Dict[str, Any] = {}
+        self.start = time.time()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Time the enclosed block as a span with the given name and attributes."""
+        span = Span(name=name, start=time.time(), attributes=attributes)
+        begin = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.duration = time.perf_counter() - begin
+            self.add(span)
+
+    def add(self, span: Span) -> None:
+        """Add a span recorded elsewhere, e.g. by a solver worker process."""
+        with self._lock:
+            self.spans.append(span)
+
+    def durations(self) -> Dict[str, float]:
+        """Total duration of the spans, by name."""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration
+        return totals
+
+    def total(self, attribute: str) -> int:
+        """Sum of a numeric attribute over all spans, e.g. prompt_tokens."""
+        return sum(span.attributes.get(attribute, 0) for span in self.spans)
+
+    @property
+    def prompt_tokens(self) -> int:
+        return self.total("prompt_tokens")
+
+    @property
+    def completion_tokens(self) -> int:
+        return self.total("completion_tokens")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "start": self.start,
+            "attributes": dict(self.attributes),
+            "spans": [asdict(span) for span in self.spans],
+        }
+
+
+class _NullTrace(Trace):
+    """Trace discarding every span, used when tracing is not requested."""
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        yield Span(name=name, start=0.0, attributes=attributes)
+
+    def add(self, span: Span) -> None:
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+class CallbackExporter:
+    """Exporter passing every finished trace to a callback."""
+
+    def __init__(self, callback: Callable[[Trace], None]):
+        self.callback = callback
+
+    def export(self, trace: Trace) -> None:
+        self.callback(trace)
+
+
+class JSONLinesExporter:
+    """Exporter appending every finished trace as a JSON line to a file or stream."""
+
+    def __init__(self, target: Union[str, IO[str]]):
+        self.target = target
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace) -> None:
+        line = json.dumps(trace.to_dict(), default=str)
+        with self._lock:
+            if isinstance(self.target, str):
+                with open(self.target, "a") as f:
+                    f.write(line + "\n")
+            else:
+                self.target.write(line + "\n")
+                self.target.flush()
+
+
+class PrometheusExporter:
+    """
+    Exporter aggregating finished traces into counters, rendered in the Prometheus text format.
+    """
+
+    def __init__(self, prefix: str = "llmasp"):
+        self.prefix = prefix
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _increment(self, name: str, value: float = 1, **labels: str) -> None:
+        label = ",".join(f'{key}="{label_value}"' for key, label_value in sorted(labels.items()))
+        key = f"{self.prefix}_{name}{{{label}}}" if label else f"{self.prefix}_{name}"
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def export(self, trace: Trace) -> None:
+        with self._lock:
+            self._increment("runs_total")
+            for span in trace.spans:
+                self._increment("span_seconds_sum", span.duration, span=span.name)
+                self._increment("span_count", span=span.name)
+                for key in ("prompt_tokens", "completion_tokens"):
+                    if key in span.attributes:
+                        self._increment(f"{key}_total", span.attributes[key])
+                for key in ("interrupted", "satisfiable"):
+                    if span.attributes.get(key) is True:
+                        self._increment(f"solver_{key}_total")
+                if span.name == "extraction_cache":
+                    self._increment("extraction_cache_lookups_total", match=span.attributes.get("match", "miss"))
+                if span.name == "solve_cache":
+                    self._increment("solve_cache_lookups_total", hit=str(span.attributes.get("hit") is True).lower())
+            if trace.attributes.get("cache_hits"):
+                self._increment("cache_hits_total", trace.attributes["cache_hits"])
+            if trace.attributes.get("error"):
+                self._increment("errors_total")
+
+    def render(self) -> str:
+        """Render the counters in the Prometheus text exposition format."""
+        with self._lock:
+            return "".join(f"{key} {value}\n" for key, value in sorted(self.counters.items()))
+
+
+def export(trace: Trace, exporters: Optional[List[Any]]) -> None:
+    """Hand a finished trace to every exporter."""
+    for exporter in exporters or []:
+        exporter.export(trace)
@@ -0,0 +1,28 @@
+from benchmarks.mock_server import MockOpenAIServer, marketplace_responder
+from benchmarks.run import percentile, run_benchmarks
+from benchmarks.synthetic_db import generate_facts, product_names
+from llmasp.llm import LLMHandler
+
+def test_mock_server_answers_extraction_prompts():
+    with MockOpenAIServer(marketplace_responder(["apple"])) as server:
+        handler = LLMHandler("mock", server.url, api_key="mock", max_retries=0)
+        completion, meta = handler.call([{"role": "user", "content": '[OUTPUT]product_request("product").[/OUTPUT]'}])
+        assert completion == '[OUTPUT]product_request("apple").[/OUTPUT]'
+        assert meta.prompt_tokens == 1
+        assert "".join(handler.stream([{"role": "user", "content": "hello"}])) == "You can buy the requested products from our warehouses."
+        assert server.requests == 2
+
+def test_synthetic_database_scales():
+    facts = list(generate_facts(1000))
+    assert 900 <= len(facts) <= 1100
+    assert facts == list(generate_facts(1000))
+    assert f'product("{product_names(1000)[-1]}").' in facts
+
+def test_percentile():
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile([0, 10], 90) == 9
+
+def test_run_benchmarks_smoke():
+    results = run_benchmarks(["natural_to_asp", "solve", "run_single_pass"], [100], iterations=2, warmup=0)
+    assert [r.scenario for r in results] == ["natural_to_asp", "solve", "run_single_pass"]
+    assert all(r.iterations == 2 and r.throughput > 0 and r.p50 <= r.p99 for r in results)
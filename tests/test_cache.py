@@ -0,0 +1,85 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+from benchmarks.mock_server import MockOpenAIServer
+from llmasp.cache import LRUCache, SQLiteCache, make_key
+from llmasp.llm.llm_handler import LLMHandler
+from llmasp.llm.async_llm_handler import AsyncLLMHandler
+
+def test_make_key_is_stable():
+    assert make_key("m", [{"role": "user", "content": "hi"}]) == make_key("m", [{"content": "hi", "role": "user"}])
+    assert make_key("m", "a") != make_key("m", "b")
+
+def test_lru_cache_eviction_and_counters():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats() == {"hits": 3, "misses": 1, "hit_rate": 0.75, "size": 2}
+
+def test_lru_cache_ttl():
+    with patch("llmasp.cache.time.monotonic") as monotonic:
+        monotonic.return_value = 100.0
+        cache = LRUCache(ttl=10)
+        cache.set("a", 1)
+        monotonic.return_value = 105.0
+        assert cache.get("a") == 1
+        monotonic.return_value = 111.0
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+def test_sqlite_cache_persistence(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteCache(path, max_size=2)
+    cache.set("a", ("completion", {"tokens": 1}))
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    cache.close()
+    cache = SQLiteCache(path)
+    assert cache.get("a") == ("completion", {"tokens": 1})
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+def test_llmhandler_cache_hit():
+    with patch("llmasp.llm.llm_handler.OpenAI") as mock_openai:
+        mock_client = MagicMock()
+        mock_openai.return_value = mock_client
+        handler = LLMHandler(cache=LRUCache())
+        mock_response = MagicMock()
+        mock_response.choices = [MagicMock(message=MagicMock(content="result"))]
+        mock_response.usage = {"tokens": 10}
+        mock_client.chat.completions.create.return_value = mock_response
+        messages = [{"role": "user", "content": "hi"}]
+        assert handler.call(messages) == ("result", {"tokens": 10})
+        completion, usage = handler.call(messages)
+        assert completion == "result" and (usage.prompt_tokens, usage.completion_tokens) == (0, 0)
+        handler.call(messages, temperature=0.5)
+        assert mock_client.chat.completions.create.call_count == 2
+        assert (handler.cache.hits, handler.cache.misses) == (1, 1)
+
+def test_llmhandler_cache_is_scoped_by_server():
+    cache = LRUCache()
+    messages = [{"role": "user", "content": "hi"}]
+    with MockOpenAIServer(lambda m: "first") as first, MockOpenAIServer(lambda m: "second") as second:
+        for server in (first, second, first):
+            handler = LLMHandler("mock", server.url, api_key="mock", cache=cache)
+            assert handler.call(messages)[0] == ("first" if server is first else "second")
+        assert (first.requests, second.requests) == (1, 1)
+
+def test_async_llmhandler_shares_the_cache_of_llmhandler():
+    cache = LRUCache()
+    messages = [{"role": "user", "content": "hi"}]
+
+    async def call(handler):
+        try:
+            return await handler.call(messages)
+        finally:
+            await handler.close()
+
+    with MockOpenAIServer(lambda m: "answer") as server:
+        assert LLMHandler("mock", server.url, api_key="mock", cache=cache).call(messages)[0] == "answer"
+        completion, usage = asyncio.run(call(AsyncLLMHandler("mock", server.url, api_key="mock", cache=cache)))
+        assert completion == "answer" and usage.total_tokens == 0 and server.requests == 1
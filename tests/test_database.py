@@ -0,0 +1,98 @@
+import bz2
+import gzip
+from unittest.mock import MagicMock
+from llmasp.asp.database import load_database, stamp
+from clingo import parse_term
+from llmasp.asp.solver import Solver, IncrementalSolver, defined_predicates
+from llmasp.llm import LLMASP
+from llmasp.llm.llm_handler import LLMHandler
+from tests.test_llmasp import APPLICATION_SPEC, BEHAVIOR_SPEC, make_llmasp
+
+def write_shards(directory):
+    directory.mkdir()
+    (directory / "1.lp").write_text('product("apple").\n')
+    with gzip.open(directory / "2.lp.gz", "wt") as f:
+        f.write('product("pear").\n')
+    with bz2.open(directory / "3.lp.bz2", "wt") as f:
+        f.write('product("plum").\n')
+    (directory / "notes.txt").write_text("not facts")
+
+def test_directory_of_shards_is_included(tmp_path):
+    write_shards(tmp_path / "shards")
+    database = load_database(str(tmp_path / "shards"), str(tmp_path / "cache"))
+    assert database.count("#include") == 3 and "apple" not in database
+    assert sorted((tmp_path / "cache").iterdir()) == sorted((tmp_path / "cache").glob("*.lp"))
+    facts, _, _ = Solver().solve(f"{database}#show product/1.")
+    assert facts == ['product("apple").', 'product("pear").', 'product("plum").']
+    solver = IncrementalSolver()
+    solver.load(database)
+    assert solver.solve('ok(P) :- product(P), P != "pear". #show ok/1.')[0] == ['ok("apple").', 'ok("plum").']
+    assert load_database(str(tmp_path / "shards"), str(tmp_path / "cache")) == database
+
+def test_yaml_database_inline_or_cached(tmp_path):
+    path = tmp_path / "db.yml"
+    path.write_text('database: |\n  product("apple").\n')
+    assert load_database(str(path)) == 'product("apple").\n'
+    cached = load_database(str(path), str(tmp_path / "cache"))
+    assert cached.startswith("#include") and Solver().solve(cached)[0] == ['product("apple").']
+    before = stamp(str(path))
+    path.write_text('database: |\n  product("pear").\n  product("plum").\n')
+    assert stamp(str(path)) != before
+    assert Solver().solve(load_database(str(path), str(tmp_path / "cache")))[0] == ['product("pear").', 'product("plum").']
+
+def test_llmasp_with_sharded_database(tmp_path):
+    write_shards(tmp_path / "shards")
+    config_file = tmp_path / "application.yml"
+    behavior_file = tmp_path / "behavior.yml"
+    config_file.write_text(APPLICATION_SPEC + f"database: {tmp_path / 'shards'}\ndatabase_cache: {tmp_path / 'cache'}\n")
+    behavior_file.write_text(BEHAVIOR_SPEC)
+    llmasp = LLMASP(str(config_file), str(behavior_file), MagicMock(spec=LLMHandler), Solver())
+    assert llmasp.database.count("#include") == 3
+    assert len(llmasp._asp_input('product_request("apple",1).')) < 500
+
+def test_database_derived_by_the_knowledge_base_is_not_preloaded(tmp_path):
+    (tmp_path / "db.yml").write_text('database: |\n  product("apple").\n')
+    application = APPLICATION_SPEC.replace(
+        "  select(P,Q) :- product_request(P,Q).\n",
+        "  product(P) :- product_request(P,_).\n  select(P,Q) :- product_request(P,Q), product(P).\n  #show product/1.\n"
+    ) + f"database: {tmp_path / 'db.yml'}\n"
+    facts = [parse_term('product_request("pear",2)')]
+    expected, _, _ = make_llmasp(tmp_path, MagicMock(spec=LLMHandler), Solver(), application)._solve(facts)
+    llmasp = make_llmasp(tmp_path, MagicMock(spec=LLMHandler), IncrementalSolver(), application)
+    assert defined_predicates(llmasp.spec.knowledge_base) == {("product", 1), ("select", 2)}
+    assert not llmasp.database_preloaded and llmasp.solver.static_programs == []
+    for _ in range(2):
+        result, _, satisfiable = llmasp._solve(facts)
+        assert satisfiable and result.to_facts() == expected.to_facts()
+    assert 'product("apple").' in expected.to_facts() and 'select("pear",2).' in expected.to_facts()
+    assert make_llmasp(tmp_path, MagicMock(spec=LLMHandler), IncrementalSolver()).database_preloaded
+
+def test_database_of_extracted_predicates_is_not_preloaded(tmp_path):
+    (tmp_path / "db.yml").write_text('database: |\n  budget(5).\n')
+    application = APPLICATION_SPEC.replace("  #show select/2.\n", "  #show budget/1.\n") + f"database: {tmp_path / 'db.yml'}\n"
+    llmasp = make_llmasp(tmp_path, MagicMock(spec=LLMHandler), IncrementalSolver(), application)
+    assert not llmasp.database_preloaded
+    result, _, satisfiable = llmasp._solve([parse_term("budget(10)")])
+    assert satisfiable and sorted(result.to_facts()) == ["budget(10).", "budget(5)."]
+
+def test_fact_file_database_derived_by_the_knowledge_base_is_not_preloaded(tmp_path):
+    (tmp_path / "db.lp").write_text('item("a").\nitem("b").\n')
+    application = f"""
+preprocessing:
+- _: A shop.
+- want("item").: List the wanted items.
+knowledge_base: |
+  item(X) :- want(X).
+  pick(X) :- item(X).
+  #show pick/1.
+  #show item/1.
+postprocessing:
+- _: You are a shop assistant.
+database: {tmp_path / 'db.lp'}
+"""
+    llmasp = make_llmasp(tmp_path, MagicMock(spec=LLMHandler), IncrementalSolver(), application)
+    assert llmasp.database.startswith("#include") and not llmasp.database_preloaded
+    for item in ("b", "c", "c"):
+        result, _, satisfiable = llmasp._solve([parse_term(f'want("{item}")')])
+        expected, _, _ = Solver().solve(f'want("{item}").\n{llmasp.database}\n{llmasp.spec.knowledge_base}')
+        assert satisfiable and sorted(result.to_facts()) == sorted(expected)
@@ -0,0 +1,26 @@
+import pytest
+from llmasp.deadline import Deadline
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_deadline_reserves_the_shares_of_later_stages():
+    clock = FakeClock()
+    deadline = Deadline(10, clock=clock)
+    assert deadline.budget("extraction") == pytest.approx(4)
+    assert deadline.budget("solving") == pytest.approx(6)
+    assert deadline.budget("summarize") == pytest.approx(10)
+    clock.now += 7
+    assert deadline.budget("extraction") == 0
+    assert deadline.budget("postprocessing") == pytest.approx(1)
+    assert not deadline.expired
+    clock.now += 5
+    assert deadline.expired and deadline.budget("summarize") == 0
+    assert Deadline.of(None) is None and Deadline.of(deadline) is deadline
+    assert Deadline.of(2.5).seconds == 2.5
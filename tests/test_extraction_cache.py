@@ -0,0 +1,68 @@
+from unittest.mock import MagicMock
+from llmasp.cache import SQLiteCache
+from llmasp.llm import ExtractionCache
+from llmasp.llm.extraction_cache import normalize
+from llmasp.llm.llm_handler import LLMHandler
+from llmasp.tracing import Trace, PrometheusExporter
+from tests.test_llmasp import APPLICATION_SPEC, make_llmasp
+
+
+def test_normalize():
+    assert normalize("Two Apples, please!") == "2 apples"
+    assert normalize("  2   apples ") == "2 apples"
+    assert normalize("1.5 kg of flour") == "1.5 kg of flour"
+
+
+def test_lookup_exact_similar_and_numbers(tmp_path):
+    cache = ExtractionCache(threshold=0.7)
+    cache.store("spec", "I would like 2 apples for an apple pie", [["a"]])
+    assert cache.lookup("spec", "i would like two apples for an apple pie, please") == ("exact", [["a"]])
+    assert cache.lookup("spec", "I would like 2 apples for the apple pie") == ("similar", [["a"]])
+    assert cache.lookup("spec", "I would like 3 apples for an apple pie")[0] == "miss"
+    assert cache.lookup("other", "I would like 2 apples for an apple pie")[0] == "miss"
+    assert cache.stats() == {"exact_hits": 1, "similar_hits": 1, "misses": 2, "hit_rate": 0.5, "size": 1}
+    # Every lookup is counted once by the backend, even when it probes it twice
+    assert (cache.cache.hits, cache.cache.misses) == (2, 2)
+
+    persistent = ExtractionCache(SQLiteCache(str(tmp_path / "extraction.db")))
+    persistent.store("spec", "2 apples", [["a"]])
+    assert ExtractionCache(SQLiteCache(str(tmp_path / "extraction.db"))).lookup("spec", "two apples") == ("exact", [["a"]])
+
+
+def test_llmasp_reuses_extracted_facts(tmp_path):
+    def call(messages, max_tokens=None):
+        if "[OUTPUT]product_request(\"product\", quantity)." in messages[-1]["content"]:
+            return 'product_request("apple",2).', None
+        return "", None
+
+    llm = MagicMock(spec=LLMHandler)
+    llm.call.side_effect = call
+    cache = ExtractionCache(threshold=0.8)
+    llmasp = make_llmasp(tmp_path, llm, extraction_cache=cache)
+    cache.store = MagicMock(wraps=cache.store)
+    first = llmasp.natural_to_asp("Two apples, please")
+    assert llm.call.call_count == 3
+    # Facts are cached as text, which a persistent backend can share across processes
+    assert [fact for facts in cache.store.call_args.args[2] for fact in facts] == ['product_request("apple",2)']
+    trace = Trace()
+    second = llmasp.natural_to_asp("two apples", trace=trace)
+    assert llm.call.call_count == 3
+    assert second[:2] == first[:2]
+    assert [query[-1] for query in second[2]] == [query[-1] for query in first[2]]
+    assert "[INPUT]two apples[/INPUT]" in second[2][0][2]["content"]
+    assert [span.attributes["match"] for span in trace.spans if span.name == "extraction_cache"] == ["exact"]
+    prometheus = PrometheusExporter()
+    prometheus.export(trace)
+    assert 'llmasp_extraction_cache_lookups_total{match="exact"} 1' in prometheus.render()
+
+    # Editing the specification invalidates the cached facts
+    llmasp = make_llmasp(tmp_path, llm, application=APPLICATION_SPEC + "# edited\n", extraction_cache=cache)
+    llmasp.natural_to_asp("two apples")
+    assert llm.call.call_count == 6
+
+    # So does switching the model
+    llm.model = "another-model"
+    llmasp.natural_to_asp("two apples")
+    assert llm.call.call_count == 9
+    llmasp.natural_to_asp("two apples")
+    assert llm.call.call_count == 9
@@ -0,0 +1,32 @@
+from clingo import Function, Number, String
+from llmasp.asp.facts import FactParser, signature
+
+
+def test_parser_validates_and_dedupes_atoms():
+    parser = FactParser({("product_request", 1), ("product_request", 2), ("recipe", 1)})
+    parsed = parser.parse(
+        'Sure! [OUTPUT]product_request("apple (red)", 2). product_request("apple (red)",2).\n'
+        'recipe(pie(apple, (1, "x\\"y"))). budget(10). product_request(2.5). product_request(X).'
+        ' Product_request("pear"). product_request("pe[/OUTPUT]'
+    )
+    assert parsed.facts == ['product_request("apple (red)",2).', 'recipe(pie(apple,(1,"x\\"y"))).']
+    assert parsed.symbols[0] == Function("product_request", [String("apple (red)"), Number(2)])
+    assert len(parsed.diagnostics) == 5
+    assert parsed.diagnostics[0] == "Undeclared predicate budget/1: budget(10)"
+    assert FactParser().parse("budget(-3) and budget(").facts == ["budget(-3)."]
+
+
+def test_parser_scan_waits_for_incomplete_atoms():
+    parser = FactParser()
+    parsed, position = parser.scan('budget(1). product_request("ap', final=False)
+    assert parsed.facts == ["budget(1)."] and position == 11
+    parsed, _ = parser.scan('budget(1). product_request("apple").', position, final=False)
+    assert parsed.facts == ['product_request("apple").']
+    assert signature('select("product", "warehouse", quantity).') == ("select", 3)
+    assert signature("_") is None
+
+
+def test_parser_rejects_non_ascii_digits():
+    parsed = FactParser().parse("budget(²). budget(-١). budget(1٢). budget(3).")
+    assert parsed.facts == ["budget(3)."]
+    assert len(parsed.diagnostics) == 3
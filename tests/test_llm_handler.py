@@ -0,0 +1,35 @@
+import asyncio
+import time
+import pytest
+from openai import APITimeoutError
+from benchmarks.mock_server import MockOpenAIServer
+from llmasp.llm import LLMHandler
+from llmasp.llm.async_llm_handler import AsyncLLMHandler
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def test_requests_with_a_timeout_are_not_retried():
+    with MockOpenAIServer(latency=1) as server:
+        handler = LLMHandler("mock", server.url, api_key="mock", max_retries=4)
+        start = time.monotonic()
+        with pytest.raises(APITimeoutError):
+            handler.call(MESSAGES, timeout=0.2)
+        with pytest.raises(APITimeoutError):
+            "".join(handler.stream(MESSAGES, timeout=0.2))
+        assert time.monotonic() - start < 1.5 and server.requests == 2
+
+
+def test_async_requests_with_a_timeout_are_not_retried():
+    async def run(handler):
+        with pytest.raises(APITimeoutError):
+            await handler.call(MESSAGES, timeout=0.2)
+        with pytest.raises(APITimeoutError):
+            async for _ in handler.stream(MESSAGES, timeout=0.2):
+                pass
+        await handler.close()
+
+    with MockOpenAIServer(latency=1) as server:
+        start = time.monotonic()
+        asyncio.run(run(AsyncLLMHandler("mock", server.url, api_key="mock", max_retries=4)))
+        assert time.monotonic() - start < 1.5 and server.requests == 2
@@ -1,8 +1,18 @@
+import asyncio
+import time
 import pytest
+from openai import APITimeoutError
+from types import SimpleNamespace
+from clingo import parse_term
 from unittest.mock import MagicMock, patch
-from llmasp.llm.llmasp import LLMASP, LLMASPError
-from llmasp.asp.solver import Solver
+from benchmarks.mock_server import MockOpenAIServer
+from llmasp.deadline import Deadline, DeadlineExceeded
+from llmasp.llm.llmasp import LLMASP, LLMASPError, FactStream, _timed_out
+from llmasp.tracing import Trace
+from llmasp.asp.solver import Solver, IncrementalSolver
+from llmasp.asp.answer_set import AnswerSet
 from llmasp.llm.llm_handler import LLMHandler
+from llmasp.llm.async_llm_handler import AsyncLLMHandler
 
 # --- LLMASP tests ---
 def test_llmasp_init_sets_attributes(tmp_path):
@@ -47,6 +57,210 @@ def test_llmasp_config_error(tmp_path):
     with pytest.raises(LLMASPError):
         LLMASP("nonexistent.yml", "nonexistent2.yml", MagicMock(), MagicMock())
 
+APPLICATION_SPEC = """
+preprocessing:
+- _: A marketplace of food products.
+- product_request("product").: List all the requested products.
+- product_request("product", quantity).: List all the requested products with a quantity.
+- budget(amount).: The budget of the customer.
+knowledge_base: |
+  select(P,Q) :- product_request(P,Q).
+  #show select/2.
+postprocessing:
+- _: You are a shop assistant.
+- select("product", "quantity").: Suggest to buy "quantity" of "product".
+"""
+
+BEHAVIOR_SPEC = """
+preprocessing:
+  init: 'init'
+  context: 'context: {context}'
+  mapping: '[INPUT]{input}[/INPUT] {instructions} [OUTPUT]{atom}[/OUTPUT]'
+postprocessing:
+  init: 'init'
+  context: 'context: {context}'
+  mapping: '[FACTS]{facts}[/FACTS] {atom}: {intructions}'
+  summarize: 'Summarize: {responses}'
+"""
+
+def make_llmasp(tmp_path, llm, solver=None, application=APPLICATION_SPEC, **kwargs):
+    config_file = tmp_path / "application.yml"
+    behavior_file = tmp_path / "behavior.yml"
+    config_file.write_text(application)
+    behavior_file.write_text(BEHAVIOR_SPEC)
+    return LLMASP(str(config_file), str(behavior_file), llm, solver or Solver(), **kwargs)
+
+def test_natural_to_asp_concurrent_matches_sequential(tmp_path):
+    answers = {
+        'product_request("product")': ('product_request("apple").', 0.05),
+        'product_request("product", quantity)': ('product_request("apple",2).', 0.02),
+        'budget(amount)': ('budget(10).', 0),
+    }
+
+    def call(messages, max_tokens=None):
+        atom = messages[-1]["content"].split("[OUTPUT]")[1].split("[/OUTPUT]")[0][:-1]
+        completion, delay = answers[atom]
+        time.sleep(delay)
+        return completion, {"atom": atom}
+
+    llm = MagicMock(spec=LLMHandler)
+    llm.call.side_effect = call
+    llmasp = make_llmasp(tmp_path, llm)
+    sequential = llmasp.natural_to_asp("two apples")
+    concurrent = llmasp.natural_to_asp("two apples", max_workers=3)
+    assert concurrent == sequential
+    assert concurrent[0] == 'product_request("apple").\nproduct_request("apple",2).\nbudget(10).'
+    assert concurrent[2][1][-1] == {"role": "assistant", "content": 'product_request("apple",2).'}
+
+def test_asp_to_natural_concurrent_groups_and_streaming(tmp_path):
+    llm = MagicMock(spec=LLMHandler)
+
+    def call(messages, max_tokens=None):
+        content = messages[-1]["content"]
+        if content.startswith("[FACTS]select("):
+            time.sleep(0.05)
+        return content.split("[/FACTS]")[0].replace("[FACTS]", "said "), None
+
+    llm.call.side_effect = call
+    llm.stream.side_effect = lambda messages: iter(["Sum", "mary"])
+    application = APPLICATION_SPEC + "- budget(amount).: Mention the budget.\n"
+    llmasp = make_llmasp(tmp_path, llm, application=application)
+    facts = ['select("apple",2).', 'budget(10).', 'select("pear",1).']
+    tokens = []
+    response, meta = llmasp.asp_to_natural(facts, [], max_workers=2, on_token=tokens.append)
+    assert (response, meta) == ("Summary", None)
+    assert tokens == ["Sum", "mary"]
+    summary = llm.stream.call_args[0][0][-1]["content"]
+    assert summary == 'Summarize: said select("apple",2).\nselect("pear",1).\nsaid budget(10).'
+    assert list(llmasp.stream_asp_to_natural(facts, [], max_workers=2)) == ["Sum", "mary"]
+
+def test_history_modes_share_prefix_and_cut_tokens(tmp_path):
+    history = [
+        [{"role": "system", "content": "init"}, {"role": "system", "content": "context: shop"},
+         {"role": "user", "content": "[INPUT]two apples[/INPUT] first"}, {"role": "assistant", "content": 'product_request("apple").'}],
+        [{"role": "system", "content": "init"}, {"role": "system", "content": "context: shop"},
+         {"role": "user", "content": "[INPUT]two apples[/INPUT] second"}, {"role": "assistant", "content": 'product_request("apple",2).'}],
+    ]
+    facts = ['select("apple",2).', 'select("pear",1).']
+    prompts = {}
+    for mode in ("full", "dedupe", "facts"):
+        llm = MagicMock(spec=LLMHandler)
+        llm.call.return_value = ("ok", None)
+        llmasp = make_llmasp(tmp_path, llm, history_mode=mode)
+        llmasp.asp_to_natural(facts, history, use_history=True)
+        prompts[mode] = llm.call.call_args_list[0][0][0]
+    tokens = {mode: sum(len(m["content"].split()) for m in messages) for mode, messages in prompts.items()}
+    assert tokens["full"] > tokens["dedupe"] > tokens["facts"]
+    assert prompts["full"][:4] == history[0]
+    assert [m["content"] for m in prompts["dedupe"][:2]] == ["init", "context: You are a shop assistant."]
+    assert sum(m["content"] == "context: shop" for m in prompts["dedupe"]) == 1
+    assert prompts["facts"][2]["content"] == 'Facts extracted from the user request:\nproduct_request("apple").\nproduct_request("apple",2).'
+    with pytest.raises(LLMASPError):
+        make_llmasp(tmp_path, llm, history_mode="none")
+
+def test_arun_with_async_handler(tmp_path):
+    async def call(messages, max_tokens=None):
+        content = messages[-1]["content"]
+        if "[OUTPUT]product_request(\"product\", quantity)." in content:
+            return 'product_request("apple",2).', None
+        if content.startswith("Summarize"):
+            return content, None
+        return "", None
+
+    llm = MagicMock(spec=AsyncLLMHandler)
+    llm.call.side_effect = call
+    llmasp = make_llmasp(tmp_path, llm)
+    facts, _, history, _ = asyncio.run(llmasp.anatural_to_asp("two apples", max_workers=3))
+    assert facts == 'product_request("apple",2).'
+    assert len(history) == 3
+    assert asyncio.run(llmasp.arun("two apples", max_workers=3)) == "Summarize: "
+
+def test_run_batch_keeps_order_and_reports_errors(tmp_path):
+    def call(messages, max_tokens=None):
+        content = messages[-1]["content"]
+        if "[INPUT]boom[/INPUT]" in content:
+            raise RuntimeError("server down")
+        if "[OUTPUT]product_request(\"product\", quantity)." in content:
+            product = content.split("[INPUT]")[1].split("[/INPUT]")[0]
+            time.sleep(0.05 if product == "apple" else 0)
+            return f'product_request("{product}",1).', None
+        if content.startswith("Summarize"):
+            return content.split("said ")[1], None
+        if content.startswith("[FACTS]"):
+            return "said " + content.split("[FACTS]")[1].split("[/FACTS]")[0], None
+        return "", None
+
+    llm = MagicMock(spec=LLMHandler)
+    llm.call.side_effect = call
+    llmasp = make_llmasp(tmp_path, llm)
+    results = llmasp.run_batch(["apple", "boom", "pear"], llm_workers=3, solver_workers=1)
+    assert [r.input for r in results] == ["apple", "boom", "pear"]
+    assert results[0].response == 'select("apple",1).'
+    assert results[2].facts == 'product_request("pear",1).'
+    assert results[1].response is None and "server down" in results[1].error
+    with pytest.raises(ValueError):
+        llmasp.run_batch(["apple", "pear"], deadline=[5])
+
+def test_run_with_deadline_degrades_postprocessing(tmp_path):
+    def call(messages, max_tokens=None, timeout=None):
+        content = messages[-1]["content"]
+        if "[OUTPUT]product_request(\"product\", quantity)." in content:
+            return 'product_request("apple",2).', None
+        if "[OUTPUT]" in content:
+            return "", None
+        # Postprocessing queries do not answer within their budget
+        time.sleep(timeout)
+        raise TimeoutError("Request timed out")
+
+    llm = MagicMock(spec=LLMHandler)
+    llm.call.side_effect = call
+    solver = Solver()
+    llmasp = make_llmasp(tmp_path, llm, solver)
+    trace = Trace()
+    with patch.object(solver, "solve", wraps=solver.solve) as solve:
+        assert llmasp.run("two apples", deadline=0.5, trace=trace) == 'select("apple",2).'
+    assert 0 < solve.call_args.kwargs["timeout"] <= 0.5
+    assert all(0 < c.kwargs["timeout"] <= 0.5 for c in llm.call.call_args_list)
+    assert trace.attributes["deadline"] == 0.5
+    assert trace.attributes["degraded"] == ["postprocessing", "summarize"]
+    assert llmasp.run("two apples", deadline=0) is None
+
+def test_solving_never_uses_the_reserve_of_later_stages(tmp_path):
+    solver = MagicMock(spec=Solver)
+    solver.accepts_symbols = True
+    llmasp = make_llmasp(tmp_path, MagicMock(spec=LLMHandler), solver)
+    clock = SimpleNamespace(now=0.0)
+    deadline = Deadline(10, clock=lambda: clock.now)
+    clock.now = 7.5
+    with pytest.raises(DeadlineExceeded):
+        llmasp._solve([], deadline=deadline)
+    assert not solver.solve.called
+
+    assert _timed_out(APITimeoutError(request=None))
+    assert _timed_out(TimeoutError()) and not _timed_out(type("ReadTimeoutLike", (Exception,), {})())
+
+def test_asp_to_natural_renders_templated_predicates(tmp_path):
+    llm = MagicMock(spec=LLMHandler)
+    llm.call.side_effect = lambda messages, max_tokens=None: (messages[-1]["content"], None)
+    template = """- select("product", quantity).:
+    template: 'Buy {quantity} of {product}.'
+"""
+    application = APPLICATION_SPEC.replace("postprocessing:\n", "postprocessing:\n" + template)
+    application += "- budget(amount).: Mention the budget.\n"
+    llmasp = make_llmasp(tmp_path, llm, application=application)
+    trace = Trace()
+    response, _ = llmasp.asp_to_natural(['select("apple",2).', 'select("pear",1).', "budget(10)."], [], trace=trace)
+    assert response == "Summarize: Buy 2 of apple.\nBuy 1 of pear.\n[FACTS]budget(10).[/FACTS] budget(amount).: Mention the budget."
+    assert [span.attributes["stage"] for span in trace.spans if span.name == "llm_call"] == ["postprocessing", "summarize"]
+
+    llm.call.reset_mock()
+    llmasp = make_llmasp(tmp_path, llm, application=application + "summarize_templates: false\n")
+    facts = AnswerSet.of_symbols([parse_term('select("apple",2)')])
+    assert llmasp.asp_to_natural(facts, []) == ("Buy 2 of apple.", None)
+    assert list(llmasp.stream_asp_to_natural(facts, [])) == ["Buy 2 of apple."]
+    assert asyncio.run(llmasp.aasp_to_natural(facts, [])) == ("Buy 2 of apple.", None)
+    assert not llm.call.called
+
 # --- Solver tests ---
 def test_solver_solve_simple():
     solver = Solver()
@@ -63,6 +277,44 @@ def test_solver_solve_empty():
     result, interrupted, satisfiable = solver.solve(program)
     assert result == []
 
+def test_solver_structured_result():
+    program = 'b(2). a("x y",1). a(10). c. b(a(1)). a(-1). b("z").'
+    result, _, _ = Solver().solve(program, structured=True)
+    assert isinstance(result, AnswerSet)
+    assert result.predicates == [("a", 1), ("a", 2), ("b", 1), ("c", 0)]
+    assert [args[0].number for args in result.arguments("a", 1)] == [-1, 10]
+    assert result.to_facts() == ['a(-1).', 'a(10).', 'a("x y",1).', 'b(2).', 'b("z").', 'b(a(1)).', 'c.']
+    assert result.group_facts()["a"] == ['a(-1).', 'a(10).', 'a("x y",1).']
+    assert Solver().solve(program)[0] == result.to_facts()
+
+def test_solver_returns_optimal_model():
+    program = "{a(1..20)} = 2. :~ a(X). [X@1]"
+    assert Solver().solve(program) == (["a(1).", "a(2)."], False, True)
+
+def test_solver_enumerate():
+    solver = Solver()
+    assert len(list(solver.enumerate("{a;b;c}."))) == 8
+    assert len(list(solver.enumerate("{a;b;c}.", models=3))) == 3
+    optimal = list(solver.enumerate("{a;b;c} = 2. :~ a. [1@1]", optimal=True, structured=True))
+    assert sorted(model.to_facts() for model in optimal) == [["b.", "c."]]
+
+def test_incremental_solver_reuses_static_program():
+    solver = IncrementalSolver(max_steps=2)
+    solver.load("item(1..3). price(1,5). price(2,7).")
+    program = "{pick(X) : request(X), price(X,_)} = 1. :~ pick(X), price(X,P). [P@1] #show pick/1."
+    assert solver.solve(f"request(1). request(2). {program}") == (["pick(1)."], False, True)
+    assert solver.solve(f"request(2). request(3). {program}") == (["pick(2)."], False, True)
+    assert solver.solve("request(3). item(4).")[0] == ["item(1).", "item(2).", "item(3).", "item(4).", "price(1,5).", "price(2,7).", "request(3)."]
+    assert solver.solve("a. :- a.")[2] is False
+
+def test_llmasp_with_incremental_solver(tmp_path):
+    (tmp_path / "db.yml").write_text("database: |\n  stock(\"apple\").\n")
+    solver = IncrementalSolver()
+    application = APPLICATION_SPEC + f"database: {tmp_path / 'db.yml'}\n"
+    llmasp = make_llmasp(tmp_path, MagicMock(spec=LLMHandler), solver, application)
+    assert solver.static_programs == ['stock("apple").\n']
+    assert llmasp._asp_input('product_request("apple",2).') == f'product_request("apple",2).\n{llmasp.config["knowledge_base"]}'
+
 # --- LLMHandler tests ---
 def test_llmhandler_init():
     with patch("llmasp.llm.llm_handler.OpenAI") as mock_openai:
@@ -82,3 +334,122 @@ def test_llmhandler_call():
         completion, meta = handler.call([{"role": "user", "content": "hi"}])
         assert completion == "result"
         assert meta == {"tokens": 10}
+
+def test_llmhandler_stream():
+    with patch("llmasp.llm.llm_handler.OpenAI") as mock_openai:
+        mock_client = MagicMock()
+        mock_openai.return_value = mock_client
+        handler = LLMHandler()
+        chunks = [MagicMock(choices=[MagicMock(delta=MagicMock(content=c))]) for c in ["a", None, "b", ""]]
+        mock_client.chat.completions.create.return_value = iter(chunks)
+        assert list(handler.stream([{"role": "user", "content": "hi"}])) == ["a", "b"]
+
+def test_llmhandler_stream_usage_and_call():
+    with patch("llmasp.llm.llm_handler.OpenAI") as mock_openai:
+        mock_client = MagicMock()
+        mock_openai.return_value = mock_client
+        handler = LLMHandler()
+        usage = SimpleNamespace(prompt_tokens=3, completion_tokens=2)
+        chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=c), finish_reason=None)], usage=None)
+            for c in ["a", "b"]
+        ] + [SimpleNamespace(choices=[], usage=usage)]
+        mock_client.chat.completions.create.side_effect = lambda **kwargs: iter(chunks)
+        stream = handler.stream([{"role": "user", "content": "hi"}])
+        assert list(stream) == ["a", "b"]
+        assert (stream.completion, stream.usage) == ("ab", usage)
+        assert mock_client.chat.completions.create.call_args.kwargs["stream_options"] == {"include_usage": True}
+        assert handler.call([{"role": "user", "content": "hi"}], stream=True) == ("ab", usage)
+
+def test_natural_to_asp_drops_invalid_atoms(tmp_path):
+    llm = MagicMock(spec=LLMHandler)
+    llm.call.return_value = ('[OUTPUT]product_request("apple", 2). select("apple",1). product_request(X).[/OUTPUT]', None)
+    llmasp = make_llmasp(tmp_path, llm)
+    trace = Trace()
+    facts, asp_input, _, _ = llmasp.natural_to_asp("two apples", single_pass=True, trace=trace)
+    assert facts == 'product_request("apple",2).'
+    assert [span.attributes.get("dropped") for span in trace.spans if span.name == "fact_extraction"] == [2]
+    for solver in (Solver(), IncrementalSolver()):
+        result, _, _ = make_llmasp(tmp_path, llm, solver)._solve([parse_term('product_request("apple",2)')])
+        assert result.to_facts() == ['select("apple",2).']
+
+def test_fact_stream_stops_at_output_marker():
+    parser = FactStream()
+    deltas = ['[OUTPUT]product_req', 'uest("apple"', ',2). budget(', '10).[/OUT', 'PUT] extra(1).']
+    collected = [parser.feed(delta) for delta in deltas]
+    assert collected == [[], [], ['product_request("apple",2).'], ['budget(10).'], []]
+    assert parser.done
+
+def test_natural_to_asp_streaming_extraction_with_async_handler(tmp_path):
+    answers = {
+        'product_request("product")': ["[OUTPUT]product_request(", '"apple").[/OUTPUT]', ' product_request("pear").'],
+        'product_request("product", quantity)': ['[OUTPUT]product_request("apple",2).', "[/OUTPUT]"],
+        'budget(amount)': ["[OUTPUT][/OUTPUT]"],
+    }
+    closed = []
+
+    class Stream:
+        def __init__(self, deltas):
+            self.deltas = iter(deltas)
+            self.usage = {"prompt_tokens": 5}
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            for delta in self.deltas:
+                return delta
+            raise StopAsyncIteration
+
+        async def aclose(self):
+            closed.append(True)
+
+    def stream(messages, max_tokens=None):
+        atom = messages[-1]["content"].split("[OUTPUT]")[1].split("[/OUTPUT]")[0][:-1]
+        return Stream(answers[atom])
+
+    llm = MagicMock(spec=AsyncLLMHandler)
+    llm.stream.side_effect = stream
+    llmasp = make_llmasp(tmp_path, llm, stream_extraction=True)
+    trace = Trace()
+    facts, _, history, meta = asyncio.run(llmasp.anatural_to_asp("two apples", trace=trace))
+    assert facts == 'product_request("apple").\nproduct_request("apple",2).'
+    assert history[0][-1] == {"role": "assistant", "content": 'product_request("apple").'}
+    assert len(closed) == 3 and trace.prompt_tokens == 15
+    assert all(span.attributes["early_stop"] for span in trace.spans if span.name == "llm_call")
+
+def test_natural_to_asp_streaming_extraction_with_mock_server(tmp_path):
+    responder = lambda messages: '[OUTPUT]budget(10).[/OUTPUT] ' + "padding " * 50
+    with MockOpenAIServer(responder) as server:
+        llmasp = make_llmasp(tmp_path, LLMHandler("mock", server.url, api_key="mock", max_retries=0), stream_extraction=True)
+        facts, _, _, _ = llmasp.natural_to_asp("ten euros", single_pass=True)
+    assert facts == "budget(10)."
+
+def test_async_llmhandler_call():
+    with patch("llmasp.llm.async_llm_handler.AsyncOpenAI") as mock_openai:
+        mock_client = MagicMock()
+        mock_openai.return_value = mock_client
+        handler = AsyncLLMHandler(model_name="test-model")
+        mock_response = MagicMock()
+        mock_response.choices = [MagicMock(message=MagicMock(content="result"))]
+        mock_response.usage = {"tokens": 10}
+
+        async def create(**kwargs):
+            return mock_response
+
+        mock_client.chat.completions.create.side_effect = create
+        completion, meta = asyncio.run(handler.call([{"role": "user", "content": "hi"}]))
+        assert (completion, meta) == ("result", {"tokens": 10})
+        assert AsyncLLMHandler(client=mock_client).client is mock_client
+
+def test_async_llmhandler_stream_with_mock_server():
+    async def consume(url):
+        handler = AsyncLLMHandler("mock", url, api_key="mock", max_retries=0)
+        stream = handler.stream([{"role": "user", "content": "one two"}])
+        deltas = [delta async for delta in stream]
+        completion = await handler.call([{"role": "user", "content": "one two"}])
+        await handler.close()
+        return deltas, stream.usage.prompt_tokens, completion[0]
+
+    with MockOpenAIServer(lambda messages: "three four") as server:
+        assert asyncio.run(consume(server.url)) == (["three ", "four"], 2, "three four")
@@ -0,0 +1,46 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+from clingo import parse_term
+from llmasp.asp.answer_set import AnswerSet
+from llmasp.asp.pool import SolverPool, SolverPoolError
+from llmasp.llm.llm_handler import LLMHandler
+from llmasp.tracing import Trace
+from tests.test_llmasp import make_llmasp
+
+def test_solver_pool_solves_and_recycles():
+    with SolverPool(size=2, max_solves=2) as pool:
+        pool.load("price(1,5). price(2,7).")
+        program = "{pick(X) : request(X), price(X,_)} = 1. :~ pick(X), price(X,P). [P@1] #show pick/1."
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(pool.solve, [f"request(1). request(2). {program}"] * 5))
+        assert all(result == (["pick(1)."], False, True) for result in results)
+        assert pool.solve("a. :- a.") == ([], False, False)
+        assert len(pool._workers) == 2
+
+def test_solver_pool_reports_errors():
+    with SolverPool(size=1) as pool:
+        with pytest.raises(SolverPoolError):
+            pool.solve("a(")
+        assert pool.solve("a.") == (["a."], False, True)
+
+def test_solver_pool_discards_workers_of_a_previous_generation():
+    with SolverPool(size=1) as pool:
+        worker = pool._checkout()
+        pool.load("b.")
+        pool._release(worker)
+        assert not worker.process.is_alive()
+        result, _, _ = pool.solve("a.")
+        assert sorted(result) == ["a.", "b."]
+        assert [w.generation for w in pool._workers] == [pool._generation]
+
+def test_llmasp_solves_with_a_solver_pool(tmp_path):
+    facts = [parse_term('product_request("apple",2)')]
+    expected, _, _ = make_llmasp(tmp_path, MagicMock(spec=LLMHandler))._solve(facts)
+    with SolverPool(size=1) as pool:
+        llmasp = make_llmasp(tmp_path, MagicMock(spec=LLMHandler), pool)
+        trace = Trace()
+        result, interrupted, satisfiable = llmasp._solve(facts, trace)
+        assert isinstance(result, AnswerSet) and result == expected
+        assert result.to_facts() == expected.to_facts() and not interrupted and satisfiable
+        assert any(span.name == "solving" for span in trace.spans)
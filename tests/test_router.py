@@ -0,0 +1,84 @@
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+from benchmarks.mock_server import MockOpenAIServer
+from llmasp.llm.llm_handler import LLMHandler
+from llmasp.llm.router import RouterLLMHandler, RouterError
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+def test_router_balances_least_outstanding():
+    with MockOpenAIServer(latency=0.1) as first, MockOpenAIServer(latency=0.1) as second:
+        router = RouterLLMHandler.from_urls([first.url, second.url], hedge=False)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: router.call(MESSAGES)[0], range(8)))
+        assert results == ["ok"] * 8
+        assert (first.requests, second.requests) == (4, 4)
+        assert all(stat["outstanding"] == 0 and stat["latency"] > 0 for stat in router.stats())
+
+def test_router_hedges_slow_endpoint():
+    with MockOpenAIServer(lambda m: "slow", latency=1.0) as slow, MockOpenAIServer(lambda m: "fast") as fast:
+        router = RouterLLMHandler.from_urls([slow.url, fast.url], hedge_delay=0.05)
+        start = time.perf_counter()
+        assert router.call(MESSAGES)[0] == "fast"
+        assert time.perf_counter() - start < 0.8
+        assert (slow.requests, fast.requests) == (1, 1)
+
+def test_router_ejects_failing_endpoint():
+    dead = MockOpenAIServer()
+    url = dead.url
+    dead.stop()
+    with MockOpenAIServer() as live:
+        router = RouterLLMHandler.from_urls([url, live.url], hedge=False, failure_threshold=2, reset_timeout=0.2)
+        for _ in range(4):
+            assert router.call(MESSAGES)[0] == "ok"
+        assert [stat["ejected"] for stat in router.stats()] == [True, False]
+        assert router.stats()[0]["failures"] == 2
+        time.sleep(0.3)
+        assert router.call(MESSAGES)[0] == "ok"
+        assert router.stats()[0]["failures"] == 3
+        assert live.requests == 5
+
+def test_router_without_available_endpoint():
+    dead = MockOpenAIServer()
+    url = dead.url
+    dead.stop()
+    router = RouterLLMHandler.from_urls([url], failure_threshold=1, reset_timeout=60)
+    with pytest.raises(Exception):
+        router.call(MESSAGES)
+    with pytest.raises(RouterError):
+        router.call(MESSAGES)
+
+def mock_handler():
+    handler = MagicMock(spec=LLMHandler)
+    handler.client = None
+    return handler
+
+def test_router_closes_circuit_on_trial_only():
+    router = RouterLLMHandler([mock_handler(), mock_handler()], hedge=False, failure_threshold=1, reset_timeout=0)
+    first, other = router.endpoints
+    stale, trial = router._acquire([])
+    assert stale is first and not trial
+    router._release(router._acquire([other])[0], None)
+    assert router.stats()[0]["ejected"]
+    probe, trial = router._acquire([other])
+    assert probe is first and trial
+    # A request sent before the ejection does not readmit the endpoint
+    router._release(stale, 0.1)
+    assert router.stats()[0]["ejected"] and first.trial
+    router._release(probe, 0.1, trial)
+    assert not router.stats()[0]["ejected"] and not first.trial
+
+def test_router_cancels_losing_hedges_not_started():
+    spare = mock_handler()
+    router = RouterLLMHandler([mock_handler(), spare], max_workers=1)
+    busy = threading.Event()
+    router._executor.submit(busy.wait, 5)
+    endpoint, trial = router._acquire([router.endpoints[0]])
+    router._cancel([router._submit(endpoint, trial, MESSAGES, {})])
+    busy.set()
+    router.close()
+    time.sleep(0.05)
+    assert not spare.call.called and router.stats()[1]["outstanding"] == 0
@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from unittest.mock import MagicMock
+from llmasp.asp.solver import IncrementalSolver
+from llmasp.llm.llm_handler import LLMHandler
+from llmasp.server import LLMASPServer
+from tests.test_llmasp import make_llmasp
+from tests.test_session import extraction_answer
+
+
+def request(url, payload=None):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_server_coalesces_and_batches_concurrent_requests(tmp_path):
+    release = threading.Event()
+
+    def call(messages, max_tokens=None):
+        release.wait(5)
+        return extraction_answer(messages), None
+
+    llm = MagicMock(spec=LLMHandler)
+    llm.call.side_effect = call
+    built = threading.Event()
+
+    def factory():
+        built.wait(5)
+        return make_llmasp(tmp_path, llm, IncrementalSolver())
+
+    with LLMASPServer(factory, port=0, batch_wait=2) as server:
+        assert request(f"{server.url}/ready")[0] == 503
+        assert request(f"{server.url}/run", {"input": "two apples"})[0] == 503
+        built.set()
+        assert server.wait_ready(5)
+        assert request(f"{server.url}/ready") == (200, {"ready": True, "error": None})
+
+        inputs = ["two apples", "two apples", "and one pear"]
+        results = [None] * len(inputs)
+
+        def post(index):
+            results[index] = request(f"{server.url}/run", {"input": inputs[index]})
+
+        threads = [threading.Thread(target=post, args=(i,)) for i in range(len(inputs))]
+        for thread in threads:
+            thread.start()
+        while server.stats()["coalesced"] < 1 or server.stats()["in_flight"] < 2:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(10)
+
+        assert [status for status, _ in results] == [200, 200, 200]
+        assert results[0][1]["facts"] == results[1][1]["facts"] == 'product_request("apple",2).'
+        assert results[2][1]["facts"] == 'product_request("pear",1).'
+        assert sorted(result["coalesced"] for _, result in results) == [False, False, True]
+        assert request(f"{server.url}/run", {"text": "two apples"})[0] == 400
+
+        _, stats = request(f"{server.url}/stats")
+        assert stats["coalesced"] == 1 and stats["batches"] == 1 and stats["largest_batch"] == 2
+        assert stats["endpoints"]["POST /run"]["requests"] == 5
+        assert stats["endpoints"]["POST /run"]["errors"] == 2
+
+
+def test_server_runs_batches_concurrently_and_counts_queued_time(tmp_path):
+    release = threading.Event()
+
+    def call(messages, max_tokens=None):
+        if "slow" in str(messages):
+            release.wait(5)
+        return extraction_answer(messages), None
+
+    llm = MagicMock(spec=LLMHandler)
+    llm.call.side_effect = call
+    with LLMASPServer(lambda: make_llmasp(tmp_path, llm), port=0, max_batches=2) as server:
+        assert server.wait_ready(5)
+        slow, _ = server.submit("slow apples")
+        while server.stats()["batches"] < 1:
+            time.sleep(0.01)
+        # A request received after a slow one does not wait for it
+        assert server.submit("two apples")[0].result(5)["facts"] == 'product_request("apple",2).'
+        assert not slow.done()
+
+        # With every batch slot taken, the deadline runs while the request is queued
+        blocked, _ = server.submit("slow pears")
+        while server.stats()["batches"] < 3:
+            time.sleep(0.01)
+        queued, _ = server.submit("and one pear", deadline=0.1)
+        time.sleep(0.2)
+        release.set()
+        assert slow.result(5)["error"] is None and blocked.result(5)["error"] is None
+        assert "No time left" in queued.result(5)["error"]
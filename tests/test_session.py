@@ -0,0 +1,90 @@
+import asyncio
+from unittest.mock import MagicMock
+from clingo import parse_term
+from llmasp.asp.solver import Solver, IncrementalSolver
+from llmasp.llm import Session
+from llmasp.llm.llm_handler import LLMHandler
+from llmasp.llm.async_llm_handler import AsyncLLMHandler
+from llmasp.tracing import Trace
+from tests.test_llmasp import APPLICATION_SPEC, make_llmasp
+
+ANSWERS = {
+    "two apples": 'product_request("apple",2).',
+    "and one pear": 'product_request("pear",1).',
+    "make it 3 apples": 'product_request("apple",3).',
+}
+
+
+def extraction_answer(messages):
+    content = messages[-1]["content"]
+    if "[OUTPUT]product_request(\"product\", quantity)." in content:
+        return ANSWERS.get(content.split("[INPUT]")[1].split("[/INPUT]")[0], "")
+    if content.startswith("Summarize"):
+        return content
+    return ""
+
+
+def test_session_accumulates_facts_across_turns(tmp_path):
+    llm = MagicMock(spec=LLMHandler)
+    llm.call.side_effect = lambda messages, max_tokens=None: (extraction_answer(messages), None)
+    session = make_llmasp(tmp_path, llm, Solver()).session(max_history=1)
+    assert isinstance(session.solver, IncrementalSolver)
+
+    traces = [Trace(), Trace()]
+    assert session.turn("two apples", trace=traces[0]) == "Summarize: "
+    llm.call.reset_mock()
+    session.turn("and one pear", trace=traces[1])
+    extraction_prompts = [c.args[0][2]["content"] for c in llm.call.call_args_list[:3]]
+    assert all("[INPUT]and one pear[/INPUT]" in prompt for prompt in extraction_prompts)
+    postprocessing = llm.call.call_args_list[3].args[0]
+    assert not any("two apples" in m["content"] for m in postprocessing)
+    assert '[FACTS]select("apple",2).\nselect("pear",1).[/FACTS]' in postprocessing[-1]["content"]
+    assert [str(f) for f in session.facts] == ['product_request("apple",2)', 'product_request("pear",1)']
+    assert len(session.history) == 1 and traces[1].attributes["session_facts"] == 2
+    # The database is grounded once for the whole conversation
+    static = [s for t in traces for s in t.spans if s.name == "grounding" and s.attributes.get("static")]
+    assert len(static) == 1
+
+    assert session.retract(['product_request("apple",2).']) == [parse_term('product_request("apple",2)')]
+    result, _, _ = session.llmasp._solve([], solver=session.solver)
+    assert result.to_facts() == ['select("pear",1).']
+    session.add([parse_term('product_request("apple",2)')])
+    result, _, _ = session.llmasp._solve([], solver=session.solver)
+    assert result.to_facts() == ['select("apple",2).', 'select("pear",1).']
+
+
+def test_session_revises_facts_of_previous_turns(tmp_path):
+    llm = MagicMock(spec=LLMHandler)
+    llm.call.side_effect = lambda messages, max_tokens=None: (extraction_answer(messages), None)
+    application = APPLICATION_SPEC.replace("  #show select/2.\n", "  :- select(P,Q), select(P,R), Q != R.\n  #show select/2.\n")
+    for solver in (None, Solver()):
+        llmasp = make_llmasp(tmp_path, llm, Solver(), application)
+        session = Session(llmasp, solver=solver)
+        for utterance in ("two apples", "and one pear"):
+            session.turn(utterance)
+        assert session.turn("make it 3 apples") is not None
+        assert [str(f) for f in session.facts] == ['product_request("pear",1)', 'product_request("apple",3)']
+        result, _, satisfiable = llmasp._solve([] if solver is None else session.facts, solver=session.solver)
+        assert satisfiable and result.to_facts() == ['select("apple",3).', 'select("pear",1).']
+
+    session = Session(make_llmasp(tmp_path, llm, Solver()), keys={("product_request", 2): (0, 1)})
+    assert session.update(['product_request("apple",2).']) == ([parse_term('product_request("apple",2)')], [])
+    assert session.update(['product_request("apple",3).'])[1] == []
+    assert session.update(['product_request("apple",3).', "budget(10)."])[0] == [parse_term("budget(10)")]
+    assert session.update(["budget(20)."]) == ([parse_term("budget(20)")], [parse_term("budget(10)")])
+
+
+def test_session_with_stateless_solver_and_async_handler(tmp_path):
+    async def call(messages, max_tokens=None):
+        return extraction_answer(messages), None
+
+    llm = MagicMock(spec=AsyncLLMHandler)
+    llm.call.side_effect = call
+    solver = Solver()
+    session = Session(make_llmasp(tmp_path, llm, solver), solver=solver)
+    asyncio.run(session.aturn("two apples"))
+    response = asyncio.run(session.aturn("and one pear"))
+    assert response == 'Summarize: '
+    assert session.turns == 2 and len(session.facts) == 2
+    session.reset()
+    assert session.facts == [] and session.turns == 0
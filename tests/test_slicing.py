@@ -0,0 +1,77 @@
+from unittest.mock import MagicMock
+from clingo import parse_term
+from llmasp.asp.slicing import DatabaseSlicer
+from llmasp.asp.solver import Solver
+from llmasp.llm.llm_handler import LLMHandler
+from llmasp.tracing import Trace
+from tests.test_llmasp import make_llmasp
+
+DATABASE = """
+price(apple,w1,2). price(apple,w2,3). price(pear,w2,4). price(fig,w3,9).
+stock(apple,w1). stock(apple,w2). stock(pear,w2). stock(fig,w3).
+warehouse(w1). warehouse(w2). warehouse(w3). closed(w3).
+ingredient(pie,apple). ingredient(pie,fig). ingredient(jam,pear).
+label(w1,"north"). unused(1).
+"""
+
+KNOWLEDGE_BASE = """
+offer(P,W,C) :- request(P), stock(P,W), price(P,W,C), warehouse(W), not closed(W).
+{ buy(P,W) : offer(P,W,_) } = 1 :- request(P).
+:~ buy(P,W), price(P,W,C). [C@1,P]
+recipe(R) :- ingredient(R,P), request(P), stock(Q,W) : ingredient(R,Q).
+total(T) :- T = #sum{ C,P : buy(P,W), price(P,W,C) }.
+#show buy/2.
+#show recipe/1.
+#show total/1.
+#show label/2.
+"""
+
+
+def solve(program, facts):
+    result, _, _ = Solver().solve(program, facts=facts, timeout=10)
+    return sorted(result)
+
+
+def test_slice_keeps_the_answer_set(tmp_path):
+    slicer = DatabaseSlicer(DATABASE, KNOWLEDGE_BASE)
+    assert slicer.sliceable and slicer.size == 17
+    for request in (["request(apple)"], ["request(pear)"], ["request(fig)"], []):
+        facts = [parse_term(fact) for fact in request]
+        kept = slicer.slice(facts)
+        assert solve(KNOWLEDGE_BASE, facts + kept) == solve(DATABASE + KNOWLEDGE_BASE, facts)
+        # Shown facts are always kept, unused ones never
+        assert parse_term('label(w1,"north")') in kept and parse_term("unused(1)") not in kept
+    kept = {str(fact) for fact in slicer.slice([parse_term("request(pear)")])}
+    assert "price(apple,w1,2)" not in kept and "ingredient(pie,fig)" not in kept
+    assert {"price(pear,w2,4)", "stock(pear,w2)", "warehouse(w2)", "ingredient(jam,pear)"} <= kept
+
+    assert DatabaseSlicer("warehouse(w1). {warehouse(w2)}.", KNOWLEDGE_BASE).slice([]) is None
+
+
+def test_slice_several_requests():
+    slicer = DatabaseSlicer(DATABASE, KNOWLEDGE_BASE)
+    for request in (["request(apple)", "request(pear)"], ["request(pear)", "request(fig)"], ["request(apple)", "request(fig)", "request(pear)"]):
+        facts = [parse_term(fact) for fact in request]
+        assert solve(KNOWLEDGE_BASE, facts + slicer.slice(facts)) == solve(DATABASE + KNOWLEDGE_BASE, facts)
+
+
+def test_llmasp_solves_the_sliced_database(tmp_path):
+    application = f"""
+preprocessing:
+- _: A marketplace.
+- request(product).: The requested products.
+database: {tmp_path / 'db.yml'}
+knowledge_base: |
+{''.join('  ' + line + chr(10) for line in KNOWLEDGE_BASE.strip().splitlines())}
+postprocessing:
+- _: You are a shop assistant.
+"""
+    (tmp_path / "db.yml").write_text("database: |\n" + "".join(f"  {line}\n" for line in DATABASE.strip().splitlines()))
+    facts = [parse_term("request(apple)")]
+    expected, _, _ = make_llmasp(tmp_path, MagicMock(spec=LLMHandler), application=application)._solve(facts)
+    llmasp = make_llmasp(tmp_path, MagicMock(spec=LLMHandler), application=application, slice_database=True)
+    trace = Trace()
+    result, _, _ = llmasp._solve(facts, trace)
+    assert result.to_facts() == expected.to_facts()
+    span = next(span for span in trace.spans if span.name == "slicing")
+    assert span.attributes["database_facts"] == 17 and span.attributes["kept"] < 17
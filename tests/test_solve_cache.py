@@ -0,0 +1,67 @@
+from unittest.mock import MagicMock
+from clingo import parse_term
+from llmasp.asp.solver import Solver
+from llmasp.cache import LRUCache, SQLiteCache
+from llmasp.llm.llm_handler import LLMHandler
+from llmasp.tracing import Trace
+from tests.test_llmasp import APPLICATION_SPEC, make_llmasp
+
+
+def counting_solver():
+    solver = Solver()
+    solver.solve = MagicMock(wraps=solver.solve)
+    return solver
+
+
+def test_solve_cache_ignores_fact_order(tmp_path):
+    solver = counting_solver()
+    llmasp = make_llmasp(tmp_path, MagicMock(spec=LLMHandler), solver, solve_cache=LRUCache(max_size=8))
+    facts = [parse_term('product_request("apple",2)'), parse_term('product_request("pear",1)')]
+    expected, _, satisfiable = llmasp._solve(facts)
+    trace = Trace()
+    result, interrupted, cached_satisfiable = llmasp._solve(facts[::-1] + facts[:1], trace)
+    assert result.to_facts() == expected.to_facts() and not interrupted and cached_satisfiable == satisfiable
+    assert solver.solve.call_count == 1
+    assert [span.attributes["hit"] for span in trace.spans if span.name == "solve_cache"] == [True]
+
+    llmasp._solve(facts[:1])
+    assert solver.solve.call_count == 2
+
+
+def test_solve_cache_stores_only_completed_searches(tmp_path):
+    solver = MagicMock(spec=Solver)
+    solver.accepts_symbols = True
+    solver.solve.return_value = (None, True, None)
+    llmasp = make_llmasp(tmp_path, MagicMock(spec=LLMHandler), solver, solve_cache=LRUCache())
+    facts = [parse_term('product_request("apple",2)')]
+    llmasp._solve(facts)
+    llmasp._solve(facts)
+    assert solver.solve.call_count == 2
+
+
+def test_persistent_solve_cache(tmp_path):
+    path = str(tmp_path / "solve.db")
+    facts = [parse_term('product_request("apple",2)')]
+    cache = SQLiteCache(path)
+    cache.set = MagicMock(wraps=cache.set)
+    expected, _, _ = make_llmasp(tmp_path, MagicMock(spec=LLMHandler), solve_cache=cache)._solve(facts)
+    # Answer sets are stored as text, valid in any process
+    assert cache.set.call_args.args[1] == (['select("apple",2)'], True)
+    solver = counting_solver()
+    result, _, _ = make_llmasp(tmp_path, MagicMock(spec=LLMHandler), solver, solve_cache=SQLiteCache(path))._solve(facts)
+    assert result.to_facts() == expected.to_facts() and solver.solve.call_count == 0
+
+
+def test_solve_cache_is_invalidated_by_database_file_changes(tmp_path):
+    path = str(tmp_path / "solve.db")
+    (tmp_path / "db.lp").write_text('product("pear").\n')
+    application = APPLICATION_SPEC.replace(
+        "select(P,Q) :- product_request(P,Q).", 'select(P,Q) :- product_request(P,Q), product(P).'
+    ) + f"database: {tmp_path / 'db.lp'}\n"
+    facts = [parse_term('product_request("apple",2)')]
+    result, _, _ = make_llmasp(tmp_path, MagicMock(spec=LLMHandler), application=application, solve_cache=SQLiteCache(path))._solve(facts)
+    assert result.to_facts() == []
+    (tmp_path / "db.lp").write_text('product("pear").\nproduct("apple").\n')
+    solver = counting_solver()
+    result, _, _ = make_llmasp(tmp_path, MagicMock(spec=LLMHandler), solver, application, solve_cache=SQLiteCache(path))._solve(facts)
+    assert result.to_facts() == ['select("apple",2).'] and solver.solve.call_count == 1
@@ -0,0 +1,97 @@
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from llmasp.cache import SQLiteCache
+from llmasp.llm import LLMASP, CompiledSpec
+from llmasp.llm import spec as spec_module
+import pickle
+from llmasp.llm.spec import FactTemplate, Template
+from llmasp.llm.llm_handler import LLMHandler
+from llmasp.asp.solver import Solver
+from tests.test_llmasp import APPLICATION_SPEC, BEHAVIOR_SPEC
+
+def write_spec(tmp_path, database='database: |\n  product("apple").\n'):
+    (tmp_path / "db.yml").write_text(database)
+    config_file = tmp_path / "application.yml"
+    behavior_file = tmp_path / "behavior.yml"
+    config_file.write_text(APPLICATION_SPEC + f"database: {tmp_path / 'db.yml'}\n")
+    behavior_file.write_text(BEHAVIOR_SPEC)
+    return str(config_file), str(behavior_file)
+
+def test_template_fill_and_render():
+    template = Template("[{a}] {b} {unknown}")
+    filled = template.fill(a="x")
+    assert filled.parts == ("[x] ", "b", " ", "unknown", "")
+    assert filled.render(b="\\d y") == "[x] \\d y {unknown}"
+
+def test_compiled_prompts(tmp_path):
+    spec = CompiledSpec.from_files(*write_spec(tmp_path))
+    assert spec.database == 'product("apple").\n'
+    assert [atom for atom, _ in spec.extraction] == ['product_request("product").', 'product_request("product", quantity).', 'budget(amount).']
+    messages = spec.extraction_messages(spec.extraction[2][1], "ten euros")
+    assert messages == [
+        {"role": "system", "content": "init"},
+        {"role": "system", "content": "context: A marketplace of food products."},
+        {"role": "user", "content": "[INPUT]ten euros[/INPUT] The budget of the customer. [OUTPUT]budget(amount).[/OUTPUT]"},
+    ]
+    assert spec.fact_group_messages("select", ['select("apple",2).'])[-1]["content"] == \
+        '[FACTS]select("apple",2).[/FACTS] select("product", "quantity").: Suggest to buy "quantity" of "product".'
+    assert spec.summary_messages(["a", "b"]) == [
+        {"role": "system", "content": "context: You are a shop assistant."},
+        {"role": "user", "content": "Summarize: a\nb"},
+    ]
+
+def test_fact_templates_bind_arguments(tmp_path):
+    application = APPLICATION_SPEC + """- budget(amount).:
+    template: 'Budget: {amount} ({0}, {missing}).'
+- select_for_recipe("recipe", "product").:
+    instructions: Suggest "product" for "recipe".
+"""
+    config_file, behavior_file = tmp_path / "application.yml", tmp_path / "behavior.yml"
+    config_file.write_text(application)
+    behavior_file.write_text(BEHAVIOR_SPEC)
+    spec = CompiledSpec.from_files(str(config_file), str(behavior_file))
+    assert list(spec.fact_renderers) == ["budget"]
+    assert spec.render_facts("budget", ["budget(10).", 'budget("ten")']) == "Budget: 10 (10, {missing}).\nBudget: ten (ten, {missing})."
+    assert spec.render_facts("select", ['select("apple",2).']) is None
+    assert spec.fact_templates["select_for_recipe"].render(facts="f").endswith('Suggest "product" for "recipe".')
+    renderer = FactTemplate(("product", "quantity"), Template("{quantity} x {product}"))
+    assert pickle.loads(pickle.dumps(renderer)) == renderer
+    assert renderer.render('select("apple",2).') == "2 x apple"
+
+def test_instances_share_spec(tmp_path):
+    config_file, behavior_file = write_spec(tmp_path)
+    first = LLMASP(config_file, behavior_file, MagicMock(spec=LLMHandler), Solver())
+    second = LLMASP(config_file, behavior_file, MagicMock(spec=LLMHandler), Solver())
+    third = LLMASP.from_spec(first.spec, MagicMock(spec=LLMHandler), Solver())
+    assert first.spec is second.spec is third.spec
+    assert third.database == 'product("apple").\n'
+
+def test_load_from_cache_file_and_database_change(tmp_path):
+    config_file, behavior_file = write_spec(tmp_path)
+    cache = SQLiteCache(str(tmp_path / "specs.db"))
+    spec = CompiledSpec.load(config_file, behavior_file, cache=cache)
+    spec_module._COMPILED.clear()
+    cached = CompiledSpec.load(config_file, behavior_file, cache=cache)
+    assert cached is not spec and cached == spec
+    assert cache.hits == 1
+
+    (tmp_path / "db.yml").write_text('database: |\n  product("pear").\n')
+    os.utime(tmp_path / "db.yml", ns=(0, 0))
+    assert CompiledSpec.load(config_file, behavior_file, cache=cache).database == 'product("pear").\n'
+
+def test_compiled_spec_is_read_only(tmp_path):
+    spec = CompiledSpec.from_files(*write_spec(tmp_path))
+    for mapping in (spec.config, spec.behavior["preprocessing"], spec.fact_templates, spec.preprocessing_messages[0]):
+        with pytest.raises(TypeError):
+            mapping["key"] = "value"
+    assert isinstance(spec.config["preprocessing"], tuple)
+    messages = spec.extraction_messages(spec.extraction[0][1], "apples")
+    messages[0]["content"] = "changed"
+    assert spec.extraction_messages(spec.extraction[0][1], "apples")[0]["content"] == "init"
+    assert pickle.loads(pickle.dumps(spec)) == spec
+
+    calls = []
+    with patch.object(spec_module, "_validate", side_effect=lambda *args: calls.append(args)):
+        CompiledSpec.from_files(*write_spec(tmp_path))
+    assert len(calls) == 1
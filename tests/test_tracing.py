@@ -0,0 +1,40 @@
+import io
+import json
+from unittest.mock import MagicMock
+from llmasp.cache import LRUCache
+from llmasp.llm.llm_handler import LLMHandler
+from llmasp.tracing import Trace, CallbackExporter, JSONLinesExporter, PrometheusExporter
+from tests.test_llmasp import make_llmasp
+
+def test_run_records_trace_and_exports(tmp_path):
+    def call(messages, max_tokens=None):
+        content = messages[-1]["content"]
+        if "[OUTPUT]product_request(\"product\", quantity)." in content:
+            return 'product_request("apple",2).', {"prompt_tokens": 10, "completion_tokens": 5}
+        return "ok", {"prompt_tokens": 3, "completion_tokens": 1}
+
+    llm = MagicMock(spec=LLMHandler)
+    llm.call.side_effect = call
+    llm.cache = LRUCache()
+    traces = []
+    stream = io.StringIO()
+    prometheus = PrometheusExporter()
+    llmasp = make_llmasp(tmp_path, llm)
+    llmasp.exporters = [CallbackExporter(traces.append), JSONLinesExporter(stream), prometheus]
+    trace = Trace()
+    assert llmasp.run("two apples", trace=trace) == "ok"
+
+    assert traces == [trace]
+    names = [span.name for span in trace.spans]
+    for name in ("prompt_construction", "llm_call", "fact_extraction", "grounding", "solving", "postprocessing"):
+        assert name in names
+    assert [s.attributes["stage"] for s in trace.spans if s.name == "llm_call"].count("extraction") == 3
+    assert (trace.prompt_tokens, trace.completion_tokens) == (10 + 3 * 4, 5 + 4)
+    solving = next(s for s in trace.spans if s.name == "solving")
+    assert solving.attributes["satisfiable"] is True and solving.attributes["interrupted"] is False
+    assert trace.attributes["cache_hits"] == 0
+    assert json.loads(stream.getvalue())["spans"][0]["name"] == "prompt_construction"
+    metrics = prometheus.render()
+    assert "llmasp_runs_total 1\n" in metrics
+    assert "llmasp_prompt_tokens_total 22\n" in metrics
+    assert 'llmasp_span_count{span="llm_call"} 5\n' in metrics
@@ -0,0 +1,49 @@
+import pytest
+import yaml
+from unittest.mock import MagicMock
+from llmasp.asp.solver import Solver
+from llmasp.asp.tuning import SolverSettings, TuningResult, best_settings, tune, write_settings
+from llmasp.llm import CompiledSpec
+from llmasp.llm.errors import LLMASPError
+from llmasp.llm.llm_handler import LLMHandler
+from tests.test_llmasp import APPLICATION_SPEC, BEHAVIOR_SPEC, make_llmasp
+
+
+def test_solver_section_sets_clingo_arguments(tmp_path):
+    application = APPLICATION_SPEC + "solver:\n  threads: 2\n  configuration: many\n  opt_strategy: bb\n  opt_usc_shrink: null\n  timeout: 3\n"
+    solver = MagicMock(spec=Solver)
+    solver.accepts_symbols = True
+    solver.solve.return_value = (None, False, True)
+    llmasp = make_llmasp(tmp_path, MagicMock(spec=LLMHandler), solver, application=application)
+    llmasp._solve([])
+    options = solver.solve.call_args.kwargs
+    assert options["arguments"] == ["--opt-strategy=bb", "--configuration=many", "--parallel-mode=2,compete"]
+    assert options["timeout"] == 3
+    result, interrupted, _ = Solver().solve('product_request("apple",2).\n' + llmasp.spec.knowledge_base, arguments=options["arguments"])
+    assert result == ['select("apple",2).'] and not interrupted
+
+    with pytest.raises(LLMASPError):
+        make_llmasp(tmp_path, MagicMock(spec=LLMHandler), application=APPLICATION_SPEC + "solver:\n  parallel_mode: race\n")
+
+
+def test_tune_ranks_settings_and_writes_the_best(tmp_path):
+    program = "{a(1..N)} :- n(N). :~ a(X). [-X@1,X]"
+    candidates = [SolverSettings(), SolverSettings(opt_strategy="bb", opt_usc_shrink=None)]
+    results = tune(program, ["n(5).", "n(8)."], candidates, timeout=5)
+    assert {r.settings for r in results} == set(candidates)
+    assert all(r.runs == 2 and r.timeout_rate == 0 for r in results)
+
+    slow = TuningResult(candidates[0], runs=2, timeouts=1, times=[1.0, 1.0], timeout=1.0)
+    fast = TuningResult(candidates[1], runs=2, times=[0.98, 1.0], timeout=1.0)
+    assert slow.score == 1.5
+    assert best_settings([fast, slow], candidates[0]) == candidates[1]
+    slow.timeouts = 0
+    assert best_settings([fast, slow], candidates[0]) == candidates[0]
+
+    config_file = tmp_path / "application.yml"
+    config_file.write_text(APPLICATION_SPEC + "solver:\n  threads: 2\ndatabase: db.yml\n")
+    write_settings(str(config_file), candidates[1])
+    text = config_file.read_text()
+    assert text.startswith(APPLICATION_SPEC) and text.endswith("database: db.yml\n")
+    spec = CompiledSpec.compile(yaml.safe_load(text), yaml.safe_load(BEHAVIOR_SPEC))
+    assert spec.solver_settings == candidates[1]